@@ -0,0 +1,139 @@
+# aggregate.py
+# Incremental group aggregate over the latest submission of every expert.
+#
+# Same maths as the "Laporan Final Gabungan Pakar" page (AIJ on the main
+# pairwise matrices, AIP on the main weights, geometric mean of local weights
+# per group), but kept as running sums of logs so a new or deleted submission
+# updates the aggregate without re-reading every expert.
+
+import numpy as np
+
+from ahp_batch import consistency_metrics, geometric_mean_weights
+from hierarchy import HIERARCHY, MAIN_BLOCK
+from judgment_codec import code_ratios
+
+
+def main_matrix(main_pairs, criteria):
+    """Main-criteria matrix from stored "A ||| B" pairs (unknown labels ignored)."""
+    n = len(criteria)
+    M = np.ones((n, n), dtype=float)
+    idx = {c: i for i, c in enumerate(criteria)}
+    for k, v in (main_pairs or {}).items():
+        try:
+            a, b = [s.strip() for s in k.split("|||")]
+            i, j, v = idx[a], idx[b], float(v)
+        except Exception:
+            continue
+        if v > 0:
+            M[i, j] = v
+            M[j, i] = 1.0 / v
+    return M
+
+
+class IncrementalAggregate:
+    def __init__(self, hierarchy=HIERARCHY):
+        self.hierarchy = hierarchy
+        self.members = {}  # user_id -> (submission_id, contribution)
+        n = len(hierarchy.criteria)
+        self._log_mat = np.zeros((n, n))
+        self._main_i, self._main_j = np.array(hierarchy.pairs[MAIN_BLOCK]).T
+        self._log_w = np.zeros(n)
+        self._w_count = 0
+        self._log_local = {g: np.zeros(len(hierarchy.subcriteria[g])) for g in hierarchy.criteria}
+        self._local_count = {g: 0 for g in hierarchy.criteria}
+
+    def __len__(self):
+        return len(self.members)
+
+    def _contribution(self, row):
+        h = self.hierarchy
+        compact = getattr(row, "compact", {})
+        main_c = compact.get("main_pairs")
+        if main_c and main_c["h"] == h.version:
+            # log matrix straight from the stored codes (no label parsing)
+            log_r = np.log(code_ratios(main_c["c"]))
+            log_mat = np.zeros_like(self._log_mat)
+            log_mat[self._main_i, self._main_j] = log_r
+            log_mat[self._main_j, self._main_i] = -log_r
+        else:
+            log_mat = np.log(main_matrix(row.get("main_pairs"), h.criteria))
+        contrib = {"log_mat": log_mat, "log_w": None, "log_local": {}}
+        if hasattr(row, "weight_arrays"):
+            weights = row.weight_arrays(h)
+        else:
+            res = row.get("result_json") or {}
+            weights = [np.asarray(res.get("main", {}).get("weights", []), dtype=float)]
+            weights += [np.asarray(res.get("local", {}).get(g, {}).get("weights", []), dtype=float)
+                        for g in h.criteria]
+        for (block, items), w in zip(h.blocks, weights):
+            if w.shape != (len(items),) or not (w > 0).all():
+                continue
+            if block == MAIN_BLOCK:
+                contrib["log_w"] = np.log(w)
+            else:
+                contrib["log_local"][block] = np.log(w)
+        return contrib
+
+    def _apply(self, contrib, sign):
+        self._log_mat += sign * contrib["log_mat"]
+        if contrib["log_w"] is not None:
+            self._log_w += sign * contrib["log_w"]
+            self._w_count += sign
+        for g, ll in contrib["log_local"].items():
+            self._log_local[g] += sign * ll
+            self._local_count[g] += sign
+
+    def add(self, user_id, row):
+        """Use `row` as this expert's submission unless a newer one is already in."""
+        current = self.members.get(user_id)
+        if current is not None:
+            if current[0] > row["id"]:
+                return False
+            self._apply(current[1], -1)
+        contrib = self._contribution(row)
+        self._apply(contrib, +1)
+        self.members[user_id] = (row["id"], contrib)
+        return True
+
+    def remove(self, user_id):
+        current = self.members.pop(user_id, None)
+        if current is not None:
+            self._apply(current[1], -1)
+
+    def result(self):
+        """AIJ / AIP weights and combined global rows, or None without experts."""
+        if not self.members:
+            return None
+        h = self.hierarchy
+        GM = np.exp(self._log_mat / len(self.members))[None]
+        weights_aij = geometric_mean_weights(GM)
+        lambda_max, ci, cr = consistency_metrics(GM, weights_aij)
+        weights_aij = weights_aij[0]
+        weights_aip = None
+        if self._w_count:
+            weights_aip = np.exp(self._log_w / self._w_count)
+            weights_aip = weights_aip / weights_aip.sum()
+        local_combined = {}
+        global_rows = []
+        for main_idx, g in enumerate(h.criteria):
+            if not self._local_count[g]:
+                continue
+            gm_loc = np.exp(self._log_local[g] / self._local_count[g])
+            gm_loc = gm_loc / gm_loc.sum()
+            local_combined[g] = gm_loc
+            for sk, lw in zip(h.subcriteria[g], gm_loc):
+                global_rows.append({
+                    "Kriteria": g,
+                    "SubKriteria": sk,
+                    "LocalWeight": float(lw),
+                    "MainWeight": float(weights_aij[main_idx]),
+                    "GlobalWeight": float(lw * weights_aij[main_idx])
+                })
+        return {
+            "n_experts": len(self.members),
+            "weights_aij": weights_aij,
+            "cons_aij": {"lambda_max": float(lambda_max[0]), "CI": float(ci[0]), "CR": float(cr[0])},
+            "weights_aip": weights_aip,
+            "local_combined": local_combined,
+            "global_rows": global_rows
+        }
@@ -0,0 +1,134 @@
+# ahp_batch.py
+# Vectorised AHP for many respondents at once.
+#
+# Judgments are arrays in the compiled pair order (hierarchy.CompiledHierarchy):
+# judgments[block] has shape (N, n_pairs) and holds the ratio a_ij for each pair.
+# Results are built in the same shape the apps store in result_json.
+
+import numpy as np
+
+import json_codec
+from hierarchy import MAIN_BLOCK, RI_DICT
+
+
+def build_matrices(judgments, n, pairs):
+    """(N, P) ratios -> (N, n, n) reciprocal comparison matrices."""
+    judgments = np.asarray(judgments, dtype=float)
+    mats = np.ones((judgments.shape[0], n, n), dtype=float)
+    if pairs:
+        rows, cols = np.array(pairs).T
+        mats[:, rows, cols] = judgments
+        mats[:, cols, rows] = 1.0 / judgments
+    return mats
+
+
+def geometric_mean_weights(mats):
+    """Row geometric means normalised to 1, for a stack of matrices."""
+    gm = np.exp(np.mean(np.log(mats), axis=2))
+    return gm / gm.sum(axis=1, keepdims=True)
+
+
+def consistency_metrics(mats, weights):
+    """lambda_max, CI and CR arrays for a stack of matrices."""
+    n = mats.shape[1]
+    aw = np.einsum("kij,kj->ki", mats, weights)
+    lambda_max = np.mean(aw / weights, axis=1)
+    ci = (lambda_max - n) / (n - 1) if n > 1 else np.zeros_like(lambda_max)
+    ri = RI_DICT.get(n, 1.49)
+    cr = ci / ri if ri != 0 else np.zeros_like(ci)
+    return lambda_max, ci, cr
+
+
+def _cons(lambda_max, ci, cr, k):
+    return {"lambda_max": float(lambda_max[k]), "CI": float(ci[k]), "CR": float(cr[k])}
+
+
+def compute_results(hierarchy, judgments):
+    """Run AHP for every respondent in one pass and return result_json dicts."""
+    computed = {}
+    for block, items in hierarchy.blocks:
+        mats = build_matrices(judgments[block], len(items), hierarchy.pairs[block])
+        w = geometric_mean_weights(mats)
+        computed[block] = (mats, w, consistency_metrics(mats, w))
+
+    main_mats, main_w, main_cons = computed[MAIN_BLOCK]
+    results = []
+    for k in range(main_w.shape[0]):
+        local = {}
+        global_rows = []
+        for i, group in enumerate(hierarchy.criteria):
+            _, w, cons = computed[group]
+            keys = hierarchy.subcriteria[group]
+            local[group] = {"keys": keys, "weights": [float(x) for x in w[k]], "cons": _cons(*cons, k)}
+            mw = float(main_w[k, i])
+            for sk, lw in zip(keys, w[k]):
+                global_rows.append({
+                    "Kriteria": group,
+                    "SubKriteria": sk,
+                    "LocalWeight": float(lw),
+                    "MainWeight": mw,
+                    "GlobalWeight": float(mw * lw)
+                })
+        results.append({
+            "main": {"keys": hierarchy.criteria, "weights": [float(x) for x in main_w[k]],
+                     "cons": _cons(*main_cons, k), "mat": main_mats[k].tolist()},
+            "local": local,
+            "global": global_rows
+        })
+    return results
+
+
+def compute_result(hierarchy, main_pairs, sub_pairs):
+    """result_json for one respondent (the questionnaire save path).
+
+    main_pairs is keyed by (a, b) tuples or "a ||| b" strings, sub_pairs by "a ||| b" per group.
+    """
+    main_pairs = {k if isinstance(k, str) else f"{k[0]} ||| {k[1]}": v for k, v in main_pairs.items()}
+    judgments = judgments_from_pairs(hierarchy, main_pairs, sub_pairs)
+    return compute_results(hierarchy, {block: ratios[None] for block, ratios in judgments.items()})[0]
+
+
+def pairs_payload(hierarchy, judgments, k):
+    """Label-keyed main_pairs / sub_pairs dicts for respondent k (storage format)."""
+    main_pairs = {f"{a} ||| {b}": float(v)
+                  for (a, b), v in zip(hierarchy.pair_labels(MAIN_BLOCK), judgments[MAIN_BLOCK][k])}
+    sub_pairs = {}
+    for group in hierarchy.criteria:
+        sub_pairs[group] = {f"{a} ||| {b}": float(v)
+                            for (a, b), v in zip(hierarchy.pair_labels(group), judgments[group][k])}
+    return main_pairs, sub_pairs
+
+
+def _pair_lookup(stored):
+    if isinstance(stored, str):
+        stored = json_codec.loads(stored)
+    lookup = {}
+    for k, v in (stored or {}).items():
+        a, b = [x.strip() for x in k.split("|||")]
+        lookup[(a, b)] = float(v)
+    return lookup
+
+
+def judgments_from_pairs(hierarchy, main_pairs, sub_pairs):
+    """Inverse of pairs_payload: {block: (P,) ratios} for one stored submission.
+
+    Raises ValueError when a pair is missing or not a positive ratio.
+    """
+    if isinstance(sub_pairs, str):
+        sub_pairs = json_codec.loads(sub_pairs)
+    out = {}
+    for block, _ in hierarchy.blocks:
+        lookup = _pair_lookup(main_pairs if block == MAIN_BLOCK else (sub_pairs or {}).get(block))
+        values = []
+        for a, b in hierarchy.pair_labels(block):
+            if (a, b) in lookup:
+                v = lookup[(a, b)]
+            elif (b, a) in lookup and lookup[(b, a)] > 0:
+                v = 1.0 / lookup[(b, a)]
+            else:
+                raise ValueError(f"pasangan '{a} ||| {b}' tidak ada")
+            if not v > 0:
+                raise ValueError(f"nilai pasangan '{a} ||| {b}' tidak valid: {v}")
+            values.append(v)
+        out[block] = np.array(values, dtype=float)
+    return out
@@ -0,0 +1,185 @@
+# artifact_cache.py
+# Bounded on-disk cache of computed results and rendered files, addressed by content.
+#
+# Keys are SHA-256 hashes of the canonical judgment vector (signed scale codes
+# in compiled pair order, judgment_codec.py) plus the hierarchy version, so
+# identical answers map to the same key whoever submits them and however the
+# ratios were written (0.333.. and 1/3 are the same code). Rendered files
+# (PDF, Excel) also depend on what they print besides the weights, so their
+# keys add those fields: render_key(judgment_key, username, timestamp, ...).
+#
+# Entries are files under AHP_CACHE_DIR (default .ahp_cache); the least
+# recently used are removed once the total size exceeds AHP_CACHE_MAX_MB.
+# Several processes (app, job workers) share the directory: each keeps its own
+# running total and re-reads the directory when it evicts, and files still
+# being written (*.tmp) are left alone unless they are older than TMP_GRACE.
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import streamlit as st
+
+import json_codec
+from ahp_batch import judgments_from_pairs
+from hierarchy import HIERARCHY
+from judgment_codec import ratio_codes
+
+DEFAULT_DIR = ".ahp_cache"
+DEFAULT_MAX_MB = 256
+TMP_GRACE = 3600  # seconds; older *.tmp files are leftovers of crashed writers
+
+
+def judgment_key(judgments, hierarchy=HIERARCHY):
+    """Stable hash of a {block: ratios} judgment vector and the hierarchy version."""
+    parts = [hierarchy.version]
+    for block, _ in hierarchy.blocks:
+        ratios = np.asarray(judgments[block], dtype=float)
+        try:
+            parts.append(",".join(map(str, ratio_codes(ratios).tolist())))
+        except ValueError:
+            # off-scale ratios (bulk imports): hash the values rounded to 12 digits
+            parts.append(",".join(repr(round(float(r), 12)) for r in ratios))
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def judgment_key_from_pairs(main_pairs, sub_pairs, hierarchy=HIERARCHY):
+    return judgment_key(judgments_from_pairs(hierarchy, main_pairs, sub_pairs), hierarchy)
+
+
+def submission_key(row, hierarchy=HIERARCHY):
+    """Judgment key of a stored submission; rows without complete pairs are keyed by their result."""
+    try:
+        if hasattr(row, "judgments"):
+            return judgment_key(row.judgments(hierarchy), hierarchy)
+        return judgment_key_from_pairs(row.get("main_pairs"), row.get("sub_pairs"), hierarchy)
+    except (ValueError, TypeError, AttributeError):
+        return render_key("result", row.get("result_json"))
+
+
+def render_key(*parts):
+    """Key of an artifact built from the given (JSON-serialisable) inputs."""
+    blob = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ArtifactCache:
+    def __init__(self, root=DEFAULT_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.by_kind = defaultdict(lambda: {"hits": 0, "misses": 0})
+        self._size = None  # total bytes on disk, computed on first write
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key, kind):
+        return os.path.join(self.root, key[:2], f"{key}.{kind}")
+
+    def get(self, key, kind):
+        path = self._path(key, kind)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            with self.lock:
+                self.misses += 1
+                self.by_kind[kind]["misses"] += 1
+            return None
+        try:
+            os.utime(path)  # mtime doubles as last-use time for eviction
+        except OSError:
+            pass
+        with self.lock:
+            self.hits += 1
+            self.by_kind[kind]["hits"] += 1
+        return data
+
+    def contains(self, key, kind):
+        return os.path.exists(self._path(key, kind))
+
+    def put(self, key, kind, data):
+        """Store bytes, a BytesIO or a readable binary file (copied in chunks); returns what was given."""
+        if hasattr(data, "getvalue"):
+            data = data.getvalue()
+        path = self._path(key, kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            if hasattr(data, "read"):
+                shutil.copyfileobj(data, f)
+            else:
+                f.write(data)
+            size = f.tell()
+        try:
+            replaced = os.stat(path).st_size  # overwriting an entry
+        except OSError:
+            replaced = 0
+        os.replace(tmp, path)  # atomic: readers never see a partial file
+        with self.lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += size - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+        return data
+
+    def get_or_create(self, key, kind, build):
+        """Cached bytes for (key, kind); build() (bytes or BytesIO) runs only on a miss."""
+        data = self.get(key, kind)
+        if data is None:
+            data = self.put(key, kind, build())
+        return data
+
+    def get_or_create_json(self, key, kind, build):
+        data = self.get_or_create(key, kind, lambda: json_codec.dumps_bytes(build()))
+        return json_codec.loads(data)
+
+    def _entries(self):
+        now = time.time()
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                if name.endswith(".tmp") and now - info.st_mtime < TMP_GRACE:
+                    continue  # another process is still writing it
+                yield path, info.st_size, info.st_mtime
+
+    def _evict(self):
+        # drop least recently used entries until usage is back under 80% of the budget
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.8
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes": self._size, "max_bytes": self.max_bytes,
+                    "by_kind": {kind: dict(counts) for kind, counts in self.by_kind.items()}}
+
+
+@st.cache_resource
+def get_cache():
+    """Process-wide artifact cache (AHP_CACHE_DIR / AHP_CACHE_MAX_MB)."""
+    root = os.getenv("AHP_CACHE_DIR", DEFAULT_DIR)
+    max_mb = float(os.getenv("AHP_CACHE_MAX_MB", DEFAULT_MAX_MB))
+    return ArtifactCache(root, int(max_mb * 1024 * 1024))
@@ -0,0 +1,86 @@
+# benchmarks/bench_excel_export.py
+# "Download Semua Data" export: previous in-memory writer vs the streaming writer.
+#
+# Builds N synthetic submissions (see bench_json_codec.py) and times the
+# all-submissions workbook with the old openpyxl writer (normal Workbook, one
+# ws.append per row, saved to a BytesIO), the write-only writer in the wide
+# layout (three sheets per submission) and in the long layout. Peak Python
+# memory is measured with tracemalloc in a separate pass.
+#
+# Run from the repository root: python benchmarks/bench_excel_export.py [--sizes 100 500]
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_json_codec import synthetic_rows  # noqa: E402
+from excel_export import all_submissions_sheets, to_excel_bytes  # noqa: E402
+from storage import SQLiteStorage  # noqa: E402
+
+
+def previous_to_excel_bytes(df_dict):
+    # the apps' writer before excel_export.py
+    wb = Workbook()
+    wb.remove(wb.active)
+    for sheet_name, df in df_dict.items():
+        if not isinstance(df, pd.DataFrame):
+            df = pd.DataFrame(df)
+        ws = wb.create_sheet(sheet_name[:31])
+        ws.append(list(df.columns))
+        for row in df.itertuples(index=False, name=None):
+            ws.append(list(row))
+    output = BytesIO()
+    wb.save(output)
+    output.seek(0)
+    return output
+
+
+def submissions(n):
+    rows = []
+    for raw in synthetic_rows(n, compact=True):
+        row = dict(SQLiteStorage._row(raw))
+        row["username"] = f"pakar{row['user_id']:05d}"
+        row["job_items"] = "Perencana"
+        rows.append(row)
+    summary = pd.DataFrame([{"ID": r["id"], "User": r["username"], "Timestamp": r["timestamp"]} for r in rows])
+    return summary, rows
+
+
+def writers(summary, rows):
+    return {
+        "previous": lambda: previous_to_excel_bytes(dict(all_submissions_sheets(summary, rows))).getvalue(),
+        "stream-wide": lambda: to_excel_bytes(all_submissions_sheets(summary, rows)),
+        "stream-long": lambda: to_excel_bytes(all_submissions_sheets(summary, rows, long_format=True)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500])
+    args = parser.parse_args()
+
+    print(f"{'rows':>6} {'writer':>12} {'seconds':>8} {'peak MB':>8} {'file KB':>8}")
+    for n in args.sizes:
+        summary, rows = submissions(n)
+        for name, build in writers(summary, rows).items():
+            start = time.perf_counter()
+            data = build()
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            build()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{n:>6} {name:>12} {elapsed:>8.2f} {peak / 2**20:>8.1f} {len(data) / 1024:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
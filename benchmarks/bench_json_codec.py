@@ -0,0 +1,81 @@
+# benchmarks/bench_json_codec.py
+# Decode time of the aggregate page ("Laporan Final Gabungan Pakar") per JSON backend.
+#
+# Builds N synthetic submissions stored the way the SQLite backend stores them
+# (JSON text columns, legacy label-keyed and compact format), then times what
+# the page does for every expert: parse the columns, decode the row and add it
+# to the incremental aggregate.
+#
+# Run from the repository root: python benchmarks/bench_json_codec.py [--sizes 1000 10000]
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json_codec  # noqa: E402
+from aggregate import IncrementalAggregate  # noqa: E402
+from ahp_batch import compute_results, pairs_payload  # noqa: E402
+from hierarchy import HIERARCHY  # noqa: E402
+from judgment_codec import encode_submission  # noqa: E402
+from storage import JSON_COLUMNS, SQLiteStorage  # noqa: E402
+
+SCALE = np.array([1 / 9, 1 / 7, 1 / 5, 1 / 3, 1, 3, 5, 7, 9])
+
+
+def synthetic_rows(n, compact, seed=0):
+    rng = np.random.default_rng(seed)
+    judgments = {block: rng.choice(SCALE, size=(n, len(HIERARCHY.pairs[block]))) for block, _ in HIERARCHY.blocks}
+    results = compute_results(HIERARCHY, judgments)
+    rows = []
+    for k in range(n):
+        main_pairs, sub_pairs = pairs_payload(HIERARCHY, judgments, k)
+        row = encode_submission({"id": k + 1, "user_id": k + 1, "timestamp": "2025-01-01T00:00:00",
+                                 "main_pairs": main_pairs, "sub_pairs": sub_pairs, "result_json": results[k]},
+                                compact=compact)
+        rows.append({col: json.dumps(v) if col in JSON_COLUMNS else v for col, v in row.items()})
+    return rows
+
+
+def decode_and_aggregate(rows):
+    agg = IncrementalAggregate()
+    for raw in rows:
+        row = SQLiteStorage._row(raw)
+        agg.add(row["user_id"], row)
+    return agg.result()
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    backends = [b for b in json_codec.BACKENDS if json_codec.set_backend(b) == b]
+    print(f"{'rows':>6} {'format':>8} {'backend':>8} {'total ms':>10} {'us/row':>8}")
+    for n in args.sizes:
+        for fmt in ("legacy", "compact"):
+            rows = synthetic_rows(n, compact=fmt == "compact")
+            for b in backends:
+                json_codec.set_backend(b)
+                t = best_of(lambda: decode_and_aggregate(rows), args.repeat)
+                print(f"{n:>6} {fmt:>8} {b:>8} {t * 1000:>10.1f} {t / n * 1e6:>8.1f}")
+    json_codec.set_backend(os.getenv("AHP_JSON_BACKEND", "orjson").lower())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# benchmarks/bench_report_templates.py
+# Per-report render time of the PDF generators in reports.py.
+#
+# canvas:   generate_canvas_pdf_bytes (one-page summary of app_ahp / hadiahp)
+# platypus: generate_pdf_bytes (rafka per-expert report), once with the
+#           template compiled for every report (as before it was cached) and
+#           once with the template compiled once per process.
+#
+# Run from the repository root: python benchmarks/bench_report_templates.py [--experts 100]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import reports  # noqa: E402
+from bench_reports import expert_rows  # noqa: E402
+
+
+def _platypus_cold(row):
+    reports.template.cache_clear()
+    return reports.generate_pdf_bytes(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--experts", type=int, default=100)
+    args = parser.parse_args()
+
+    rows = expert_rows(args.experts)
+    generators = [
+        ("canvas", reports.generate_canvas_pdf_bytes),
+        ("platypus (compiled per report)", _platypus_cold),
+        ("platypus (precompiled)", reports.generate_pdf_bytes),
+    ]
+    for name, generate in generators:
+        reports.template.cache_clear()
+        generate(rows[0])  # warm-up: imports, fonts, the compiled template
+        start = time.perf_counter()
+        size = sum(len(generate(r).getvalue()) for r in rows)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>32} {elapsed / len(rows) * 1000:>7.1f} ms/report {size / len(rows) / 1024:>6.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# benchmarks/bench_reports.py
+# Per-expert PDF batch: serial rendering vs reports.render_reports in a process pool.
+#
+# Renders N synthetic expert reports (see bench_json_codec.py) once in the
+# calling process and once per worker count through the pool (pool start-up
+# included), and prints the pickled size of a full row vs the report payload.
+#
+# Run from the repository root: python benchmarks/bench_reports.py [--experts 200] [--workers 2 4]
+
+import argparse
+import os
+import pickle
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import reports  # noqa: E402
+from bench_json_codec import synthetic_rows  # noqa: E402
+from storage import SQLiteStorage  # noqa: E402
+
+
+def expert_rows(n):
+    rows = []
+    for raw in synthetic_rows(n, compact=True):
+        row = SQLiteStorage._row(raw)
+        rows.append({"id": row["id"], "username": f"pakar{row['id']:05d}", "timestamp": row["timestamp"],
+                     "result": row["result_json"], "job_items": "Perencana"})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--experts", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    args = parser.parse_args()
+
+    rows = expert_rows(args.experts)
+    payloads = {r["id"]: reports.report_payload(r) for r in rows}
+    print(f"pickled row: {len(pickle.dumps(rows[0])) / 1024:.1f} KB, payload: {len(pickle.dumps(payloads[1])) / 1024:.1f} KB")
+    print(f"cpus: {os.cpu_count()}")
+
+    start = time.perf_counter()
+    for r in rows:
+        reports.generate_pdf_bytes(r)
+    print(f"{'serial':>10} {time.perf_counter() - start:>8.2f} s")
+
+    for workers in args.workers:
+        reports._reset_pool()
+        reports.MAX_WORKERS = workers
+        start = time.perf_counter()
+        done = sum(1 for _, data in reports.render_reports(payloads) if not isinstance(data, Exception))
+        print(f"{f'pool x{workers}':>10} {time.perf_counter() - start:>8.2f} s ({done} PDFs)")
+    reports._reset_pool()
+
+
+if __name__ == "__main__":
+    main()
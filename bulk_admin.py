@@ -0,0 +1,91 @@
+# bulk_admin.py
+# Bulk admin operations on submissions.
+#
+# delete_submissions() removes the selected submissions with one request and
+# recompute_submissions() re-derives result_json (and the summary columns) for
+# the selected submissions in a single batched AHP pass (ahp_batch), written
+# back with one upsert. Both keep the admin change feed (change_feed.py) in
+# step, so the pages do not need a full reload afterwards.
+
+import numpy as np
+
+from ahp_batch import compute_results
+from hierarchy import HIERARCHY
+from summaries import submission_summary
+
+
+def delete_submissions(storage, submission_ids, feed=None):
+    """Delete the given submissions; returns the deleted rows."""
+    ids = sorted({int(i) for i in submission_ids})
+    if not ids:
+        return []
+    deleted = storage.delete_submissions(ids)
+    if feed is not None:
+        feed.forget([r["id"] for r in deleted])
+    return deleted
+
+
+def recompute_submissions(storage, submission_ids, hierarchy=HIERARCHY, feed=None):
+    """Recompute result_json for the given submissions from their stored pairs.
+
+    Returns {"updated": n, "errors": [...]}; rows whose pairs cannot be read are skipped.
+    """
+    ids = sorted({int(i) for i in submission_ids})
+    rows, vectors, errors = [], [], []
+    for row in storage.get_submissions(ids) if ids else []:
+        try:
+            vectors.append(row.judgments(hierarchy))
+        except Exception as e:
+            errors.append(f"Submission #{row['id']}: {e}")
+            continue
+        rows.append(row)
+    if not rows:
+        return {"updated": 0, "errors": errors}
+
+    judgments = {block: np.vstack([v[block] for v in vectors]) for block, _ in hierarchy.blocks}
+    updated = []
+    for row, result in zip(rows, compute_results(hierarchy, judgments)):
+        updated.append(dict(row, result_json=result, **submission_summary(result)))
+    storage.upsert_submissions(updated)
+    if feed is not None:
+        feed.replace(updated)
+    return {"updated": len(updated), "errors": errors}
+
+
+def render_bulk_section(storage, submission_ids, feed=None):
+    import streamlit as st
+
+    def run_delete():
+        if not st.session_state.get("bulk_confirm"):
+            st.session_state["bulk_msg"] = ("warning", "Centang konfirmasi sebelum menghapus.")
+            return
+        try:
+            deleted = delete_submissions(storage, st.session_state.get("bulk_ids") or [], feed=feed)
+        except Exception as e:
+            st.session_state["bulk_msg"] = ("error", f"Gagal menghapus: {e}")
+            return
+        st.session_state["bulk_ids"] = []
+        st.session_state["bulk_confirm"] = False
+        st.session_state["bulk_msg"] = ("success", f"{len(deleted)} submission dihapus.")
+
+    def run_recompute():
+        try:
+            summary = recompute_submissions(storage, st.session_state.get("bulk_ids") or [], feed=feed)
+        except Exception as e:
+            st.session_state["bulk_msg"] = ("error", f"Gagal menghitung ulang: {e}")
+            return
+        st.session_state["bulk_msg"] = ("success", f"{summary['updated']} submission dihitung ulang.")
+        st.session_state["bulk_errors"] = summary["errors"]
+
+    st.subheader("🗂 Operasi Massal Submission")
+    selected = st.multiselect("Pilih submission (ID)", options=list(submission_ids), key="bulk_ids")
+    st.checkbox("Konfirmasi hapus submission terpilih", key="bulk_confirm")
+    col1, col2 = st.columns(2)
+    col1.button("🗑 Hapus terpilih", key="bulk_delete", on_click=run_delete, disabled=not selected)
+    col2.button("♻️ Hitung ulang hasil", key="bulk_recompute", on_click=run_recompute, disabled=not selected)
+
+    msg = st.session_state.pop("bulk_msg", None)
+    if msg is not None:
+        getattr(st, msg[0])(msg[1])
+    for err in st.session_state.pop("bulk_errors", [])[:50]:
+        st.warning(err)
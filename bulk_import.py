@@ -0,0 +1,234 @@
+# bulk_import.py
+# Bulk import of paper / Excel questionnaire judgments.
+#
+# Sheet layout (CSV or xlsx, one row per respondent):
+#   username | job_items (optional) | timestamp (optional) | A-B | A-C | ... | A1-A2 | ...
+# Pair columns use the item codes from hierarchy.py, in any order. A value n
+# means the left item is n times more important; -n (or "1/n") means the
+# right item is. 1 means equal importance.
+#
+# Usage: python bulk_import.py judgments.xlsx [--batch-size 200] [--create-users]
+
+import argparse
+import os
+from datetime import datetime
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+
+from ahp_batch import compute_results, pairs_payload
+from hierarchy import HIERARCHY
+
+META_COLUMNS = ["username", "job_items", "timestamp"]
+DEFAULT_BATCH_SIZE = 100
+
+
+def parse_judgment(value):
+    """Cell value -> ratio a_ij, or None when the value is not on the 1–9 scale."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    text = str(value).strip().replace(",", ".")
+    if not text:
+        return None
+    try:
+        num = Fraction(text)
+    except (ValueError, ZeroDivisionError):
+        return None
+    if num < 0:
+        num = 1 / -num
+    if num == 0:
+        return None
+    # accept 1..9 and their reciprocals (decimals like 0.333 are snapped to 1/3)
+    scale = num if num >= 1 else 1 / num
+    snapped = round(float(scale))
+    if snapped < 1 or snapped > 9 or abs(float(scale) - snapped) > 0.01:
+        return None
+    return float(snapped) if num >= 1 else 1.0 / snapped
+
+
+def read_sheet(path_or_buffer, name=None):
+    """Read a CSV or xlsx judgment sheet into a DataFrame of strings."""
+    name = (name or getattr(path_or_buffer, "name", None) or str(path_or_buffer)).lower()
+    if name.endswith(".csv"):
+        return pd.read_csv(path_or_buffer, dtype=str, keep_default_na=False)
+    return pd.read_excel(path_or_buffer, dtype=str, keep_default_na=False)
+
+
+def template_frame(hierarchy=HIERARCHY):
+    """Empty sheet with all expected columns, for transcribing paper forms."""
+    cols = list(META_COLUMNS)
+    for block, _ in hierarchy.blocks:
+        cols += hierarchy.pair_columns(block)
+    return pd.DataFrame(columns=cols)
+
+
+def validate_frame(df, hierarchy=HIERARCHY):
+    """Check a sheet against the hierarchy.
+
+    Returns (judgments, meta, errors): judgments[block] is an (N, P) array for the
+    valid rows, meta the matching list of row dicts, errors a list of messages.
+    """
+    errors = []
+    df = df.rename(columns=lambda c: str(c).strip())
+    missing = [c for block, _ in hierarchy.blocks for c in hierarchy.pair_columns(block) if c not in df.columns]
+    if "username" not in df.columns:
+        missing.insert(0, "username")
+    if missing:
+        shown = ", ".join(missing[:10]) + (" ..." if len(missing) > 10 else "")
+        return None, [], [f"Kolom tidak ditemukan ({len(missing)}): {shown}"]
+
+    parsed = {}
+    bad = np.zeros(len(df), dtype=bool)
+    for block, _ in hierarchy.blocks:
+        cols = hierarchy.pair_columns(block)
+        values = np.ones((len(df), len(cols)), dtype=float)
+        for c, col in enumerate(cols):
+            for r, cell in enumerate(df[col].tolist()):
+                v = parse_judgment(cell)
+                if v is None:
+                    # row numbers as shown in the spreadsheet (header is row 1)
+                    errors.append(f"Baris {r + 2}: nilai tidak valid di kolom {col} ({cell!r})")
+                    bad[r] = True
+                else:
+                    values[r, c] = v
+        parsed[block] = values
+
+    usernames = df["username"].astype(str).str.strip()
+    for r in np.nonzero(usernames.eq("").to_numpy())[0]:
+        errors.append(f"Baris {r + 2}: username kosong")
+        bad[r] = True
+
+    # timestamps go into a timestamptz column: one bad cell would fail the whole insert batch
+    timestamps = [None] * len(df)
+    if "timestamp" in df.columns:
+        for r, cell in enumerate(df["timestamp"].tolist()):
+            if pd.isna(cell) or not str(cell).strip():
+                continue
+            try:
+                ts = pd.Timestamp(str(cell).strip())
+            except (ValueError, TypeError, OverflowError):
+                ts = pd.NaT
+            if pd.isna(ts):
+                errors.append(f"Baris {r + 2}: timestamp tidak valid ({cell!r})")
+                bad[r] = True
+            else:
+                timestamps[r] = ts.isoformat()
+
+    keep = ~bad
+    judgments = {block: parsed[block][keep] for block in parsed}
+    meta = []
+    for r in np.nonzero(keep)[0]:
+        row = df.iloc[r]
+        meta.append({
+            "username": usernames.iloc[r],
+            "job_items": str(row.get("job_items", "") or "").strip(),
+            "timestamp": timestamps[r] or datetime.now().isoformat()
+        })
+    return judgments, meta, errors
+
+
+def _ensure_users(storage, usernames, job_items, create_missing):
+    users = {u["username"]: u["id"] for u in storage.list_users()}
+    missing = [u for u in dict.fromkeys(usernames) if u not in users]
+    if missing and create_missing:
+        # imported respondents get an unusable password; an admin can reset it later
+        payloads = [{
+            "username": u,
+            "pw_salt": os.urandom(16).hex(),
+            "pw_hash": os.urandom(32).hex(),
+            "is_admin": False,
+            "job_items": job_items.get(u, "")
+        } for u in missing]
+        for row in storage.insert_users(payloads):
+            users[row["username"]] = row["id"]
+    return users
+
+
+def import_frame(storage, df, hierarchy=HIERARCHY, batch_size=DEFAULT_BATCH_SIZE, create_missing=False, progress=None):
+    """Validate, compute and insert all rows of a judgment sheet.
+
+    Returns a summary dict: {"inserted", "skipped", "errors"}.
+    """
+    judgments, meta, errors = validate_frame(df, hierarchy)
+    if not meta:
+        return {"inserted": 0, "skipped": len(df), "errors": errors}
+
+    results = compute_results(hierarchy, judgments)
+    users = _ensure_users(storage, [m["username"] for m in meta],
+                          {m["username"]: m["job_items"] for m in meta}, create_missing)
+
+    payloads = []
+    for k, m in enumerate(meta):
+        if m["username"] not in users:
+            errors.append(f"User '{m['username']}' belum terdaftar (gunakan opsi buat user baru).")
+            continue
+        main_pairs, sub_pairs = pairs_payload(hierarchy, judgments, k)
+        payloads.append({
+            "user_id": users[m["username"]],
+            "timestamp": m["timestamp"],
+            "main_pairs": main_pairs,
+            "sub_pairs": sub_pairs,
+            "result_json": results[k]
+        })
+
+    inserted = 0
+    batch_size = max(1, int(batch_size))
+    for start in range(0, len(payloads), batch_size):
+        inserted += len(storage.insert_submissions(payloads[start:start + batch_size]))
+        if progress is not None:
+            progress(inserted, len(payloads))
+    return {"inserted": inserted, "skipped": len(df) - inserted, "errors": errors}
+
+
+# ------------------------------
+# Admin Panel section
+# ------------------------------
+def render_import_section(storage):
+    import streamlit as st
+
+    st.subheader("📤 Import Massal Kuesioner (Excel/CSV)")
+    st.write("Satu baris per responden. Nilai n = item kiri n kali lebih penting, -n atau 1/n = item kanan lebih penting.")
+    st.download_button("Template kosong (CSV)", data=template_frame().to_csv(index=False).encode("utf-8"),
+                       file_name="template_import_ahp.csv", mime="text/csv", key="import_template")
+    upload = st.file_uploader("File penilaian", type=["xlsx", "csv"], key="import_file")
+    create_missing = st.checkbox("Buat user baru untuk username yang belum terdaftar", key="import_create_users")
+    batch_size = st.number_input("Ukuran batch insert", min_value=1, max_value=1000, value=DEFAULT_BATCH_SIZE, step=50,
+                                 key="import_batch_size")
+    if upload is not None and st.button("Import", key="btn_import"):
+        bar = st.progress(0.0)
+        try:
+            summary = import_frame(storage, read_sheet(upload, upload.name), batch_size=batch_size,
+                                   create_missing=create_missing,
+                                   progress=lambda done, total: bar.progress(done / max(total, 1)))
+        except Exception as e:
+            st.error(f"Import gagal: {e}")
+            return
+        st.success(f"{summary['inserted']} submission diimport, {summary['skipped']} baris dilewati.")
+        for msg in summary["errors"][:50]:
+            st.warning(msg)
+
+
+def main():
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Bulk import of AHP questionnaire judgments.")
+    parser.add_argument("path", help="xlsx or csv file, one row per respondent")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--create-users", action="store_true", help="create users that do not exist yet")
+    parser.add_argument("--template", action="store_true", help="write an empty template to PATH and exit")
+    args = parser.parse_args()
+
+    if args.template:
+        template_frame().to_csv(args.path, index=False)
+        print(f"Template written to {args.path}")
+        return
+    summary = import_frame(create_storage(), read_sheet(args.path), batch_size=args.batch_size,
+                           create_missing=args.create_users)
+    for msg in summary["errors"]:
+        print(msg)
+    print(f"Inserted {summary['inserted']} submissions, skipped {summary['skipped']} rows.")
+
+
+if __name__ == "__main__":
+    main()
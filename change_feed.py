@@ -0,0 +1,165 @@
+# change_feed.py
+# Poll-by-max-id change feed for the admin pages.
+#
+# The first load reads the latest submission of every expert; after that each
+# refresh asks only for rows with id > last seen id (usually an empty result)
+# and merges them into the cached latest-per-user rows and the incremental
+# aggregate. Pages that list every submission ask for summaries(): the summary
+# columns of all rows are read once, on first use, and kept up to date the
+# same way. The feed is shared by all sessions of the Streamlit process.
+#
+# Deletes are not visible to an id feed: code paths that delete submissions
+# call forget(ids) with the deleted ids. Deletes made elsewhere (another
+# process or app) are noticed by counting: each refresh also asks for the
+# number of rows with id <= last seen id, and when it differs from what the
+# feed has seen the feed resyncs. The count also catches rows that commit out
+# of id order (concurrent inserts): a row that appears below the last seen id
+# after a refresh raises the count. resync() rebuilds everything from scratch.
+
+import threading
+
+import streamlit as st
+
+from aggregate import IncrementalAggregate
+from summaries import row_summary
+
+
+class SubmissionFeed:
+    def __init__(self, storage):
+        self.storage = storage
+        self.lock = threading.RLock()
+        self.version = 0  # bumped whenever the cached data changes; never goes back (memo key)
+        self._reset()
+
+    def _reset(self):
+        self.loaded = False
+        self.last_id = 0
+        self.version += 1
+        self.users = {}
+        self.latest = {}  # user_id -> latest submission row
+        self.known = 0  # rows with id <= last_id that the feed knows exist
+        self.aggregate = IncrementalAggregate()
+        self._summaries = None  # id -> summary row of every submission, loaded by summaries()
+
+    def _load_users(self):
+        self.users = {u["id"]: u for u in self.storage.list_users()}
+
+    def _merge(self, row):
+        self.last_id = max(self.last_id, row["id"])
+        if self._summaries is not None:
+            self._summaries[row["id"]] = _summary_row(row)
+        uid = row["user_id"]
+        current = self.latest.get(uid)
+        if current is None or row["id"] > current["id"]:
+            self.latest[uid] = row
+            self.aggregate.add(uid, row)
+            return True
+        return False
+
+    def refresh(self):
+        """Pull new submissions; returns the number of rows merged."""
+        with self.lock:
+            if not self.loaded:
+                self._load_users()
+                for u, row in self.storage.get_latest_submissions_per_user():
+                    self.users[u["id"]] = u
+                    self._merge(row)
+                self.known = self.storage.get_submission_count(self.last_id)
+                self.loaded = True
+                self.version += 1
+                return len(self.latest)
+            rows = self.storage.list_submissions_since(self.last_id)
+            if any(r["user_id"] not in self.users for r in rows):
+                self._load_users()
+            merged = sum(self._merge(r) for r in rows)
+            count = self.storage.get_submission_count(self.last_id)
+            if count != self.known + len(rows):
+                # fewer: rows were deleted by someone else, and their experts' previous submissions are
+                # unknown here; more: a row committed late with an id below last_id and was skipped
+                self._reset()
+                return self.refresh()
+            self.known = count
+            if rows:
+                self.version += 1
+            return merged
+
+    def forget(self, submission_ids):
+        """Drop deleted submissions; affected experts fall back to their previous submission."""
+        ids = set(submission_ids)
+        with self.lock:
+            self.known -= sum(1 for sid in ids if sid <= self.last_id)
+            if self._summaries is not None:
+                for sid in ids:
+                    self._summaries.pop(sid, None)
+            for uid, row in list(self.latest.items()):
+                if row["id"] not in ids:
+                    continue
+                prev = self.storage.get_latest_submission_by_user(uid)
+                self.aggregate.remove(uid)
+                if prev is None:
+                    del self.latest[uid]
+                else:
+                    self.latest[uid] = prev
+                    self.aggregate.add(uid, prev)
+            self.version += 1
+
+    def replace(self, rows):
+        """Merge rewritten rows (same ids, new content) into the cache."""
+        with self.lock:
+            for row in rows:
+                if self._summaries is not None and row["id"] in self._summaries:
+                    self._summaries[row["id"]] = _summary_row(row)
+                current = self.latest.get(row["user_id"])
+                if current is not None and current["id"] == row["id"]:
+                    self.latest[row["user_id"]] = row
+                    self.aggregate.remove(row["user_id"])
+                    self.aggregate.add(row["user_id"], row)
+            self.version += 1
+
+    def resync(self):
+        with self.lock:
+            self._reset()
+        return self.refresh()
+
+    def latest_per_user(self):
+        """[(user_row, submission_row), ...] ordered by username, like Storage.get_latest_submissions_per_user."""
+        with self.lock:
+            pairs = [(self.users[uid], row) for uid, row in self.latest.items() if uid in self.users]
+        return sorted(pairs, key=lambda us: us[0]["username"])
+
+    def usernames(self):
+        with self.lock:
+            return {uid: u["username"] for uid, u in self.users.items()}
+
+    def summaries(self, min_cr=None):
+        """Summary rows of all submissions, newest first, like Storage.list_submission_summaries.
+
+        Call refresh() first. Rows saved before the summary columns existed are
+        backfilled once, when the summaries are first loaded.
+        """
+        with self.lock:
+            if self._summaries is None:
+                self._load_summaries()
+            rows = sorted(self._summaries.values(), key=lambda r: r["id"], reverse=True)
+        return [r for r in rows if min_cr is None or r["cr_max"] > min_cr]
+
+    def _load_summaries(self):
+        rows = self.storage.list_submission_summaries()
+        # computed from one fetch and stored, same as `python summaries.py backfill`
+        missing = [r["id"] for r in rows if r.get("cr_max") is None]
+        if missing:
+            backfill = {r["id"]: row_summary(r) for r in self.storage.get_submissions(missing)}
+            self.storage.update_submissions(backfill)
+            rows = [dict(r, **backfill.get(r["id"], {})) for r in rows]
+        # rows that arrived since the last refresh are picked up by the next one
+        self._summaries = {r["id"]: r for r in rows if r["id"] <= self.last_id}
+
+
+def _summary_row(row):
+    return dict({k: row.get(k) for k in ("id", "user_id", "timestamp")}, **row_summary(row))
+
+
+@st.cache_resource
+def get_feed(_storage):
+    """Process-wide feed for the given storage backend."""
+    return SubmissionFeed(_storage)
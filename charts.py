@@ -0,0 +1,89 @@
+# charts.py
+# Vega-Lite specs of the result charts, built once per data version.
+#
+# Building an Altair chart (DataFrame, encoding, schema validation, to_dict) on
+# every rerun costs far more than drawing it. The spec functions below are
+# memoized with st.cache_data on a version value the page passes in (the
+# judgment key of a submission, feed.version for the group result); the data
+# arguments start with "_" so they are not hashed. Pages draw the returned dict
+# with st.vega_lite_chart.
+#
+# Charts: top-k global weights (the data slice is cut before the spec is built),
+# global weight per criterion stacked by sub-criterion, and a CR heatmap
+# (expert x comparison block).
+
+import pandas as pd
+import streamlit as st
+
+from hierarchy import CRITERIA, item_code
+from summaries import CR_THRESHOLD, submission_summary
+
+try:
+    import altair as alt
+except ImportError:
+    alt = None
+
+TOP_K = 20
+MAX_ENTRIES = 256
+
+
+def _require_altair():
+    if alt is None:
+        raise RuntimeError("altair not installed. Install with `pip install altair` to enable charts.")
+
+
+def _global_frame(global_rows):
+    df = pd.DataFrame(list(global_rows), columns=["Kriteria", "SubKriteria", "GlobalWeight"])
+    df["GlobalWeight"] = df["GlobalWeight"].astype(float)
+    return df.sort_values("GlobalWeight", ascending=False)
+
+
+@st.cache_data(max_entries=MAX_ENTRIES, show_spinner=False)
+def global_top_spec(version, _global_rows, k=TOP_K, height=500):
+    """Bar chart of the k largest global weights (height=None: sized by the bars)."""
+    _require_altair()
+    top = _global_frame(_global_rows).head(k)
+    chart = alt.Chart(top).mark_bar().encode(
+        x="GlobalWeight:Q",
+        y=alt.Y("SubKriteria:N", sort="-x"),
+        tooltip=["SubKriteria", "Kriteria", alt.Tooltip("GlobalWeight:Q", format=".4f")]
+    )
+    if height is not None:
+        chart = chart.properties(height=height)
+    return chart.to_dict()
+
+
+@st.cache_data(max_entries=MAX_ENTRIES, show_spinner=False)
+def group_contribution_spec(version, _global_rows):
+    """Global weight per criterion, stacked by the sub-criteria contributing to it."""
+    _require_altair()
+    df = _global_frame(_global_rows)
+    df["Kode"] = df["SubKriteria"].map(item_code)
+    df["Grup"] = df["Kriteria"].map(item_code)
+    return alt.Chart(df).mark_bar().encode(
+        x=alt.X("sum(GlobalWeight):Q", title="Bobot global"),
+        y=alt.Y("Grup:N", sort=[item_code(g) for g in CRITERIA], title="Kriteria"),
+        color=alt.Color("Kode:N", legend=None),
+        order=alt.Order("GlobalWeight:Q", sort="descending"),
+        tooltip=["Kriteria", "SubKriteria", alt.Tooltip("GlobalWeight:Q", format=".4f")]
+    ).properties(height=40 * len(CRITERIA)).to_dict()
+
+
+@st.cache_data(max_entries=MAX_ENTRIES, show_spinner=False)
+def consistency_heatmap_spec(version, _experts):
+    """CR of every comparison block per expert; _experts is [(name, result_json)]."""
+    _require_altair()
+    blocks = ["Utama"] + [item_code(g) for g in CRITERIA]
+    rows = []
+    for name, result in _experts:
+        summ = submission_summary(result)
+        for block, cr in zip(blocks, [summ["cr_main"]] + summ["cr_groups"]):
+            rows.append({"Pakar": name, "Blok": block, "CR": cr})
+    df = pd.DataFrame(rows, columns=["Pakar", "Blok", "CR"])
+    scale = alt.Scale(domain=[0, CR_THRESHOLD, 2 * CR_THRESHOLD], range=["#2e7d32", "#fbc02d", "#c62828"], clamp=True)
+    return alt.Chart(df).mark_rect().encode(
+        x=alt.X("Blok:N", sort=blocks),
+        y=alt.Y("Pakar:N"),
+        color=alt.Color("CR:Q", scale=scale),
+        tooltip=["Pakar", "Blok", alt.Tooltip("CR:Q", format=".3f")]
+    ).properties(height=max(120, 18 * len(_experts))).to_dict()
@@ -0,0 +1,272 @@
+# columnar_export.py
+# Analytical export of all submissions as columnar files (Parquet or Arrow IPC).
+#
+# Three tables, streamed from the database in id-ordered chunks:
+#   judgments    one row per (submission, pair): block, items, scale code, ratio
+#   weights      one row per (submission, sub-criterion): main, local and global weight
+#   consistency  one row per (submission, block): lambda_max, CI, CR
+# Labels (blocks, items, usernames) are dictionary-encoded against fixed
+# dictionaries, so every chunk shares one dictionary and the files stay small.
+#
+# Needs pyarrow (installed with streamlit; otherwise `pip install pyarrow`).
+# CLI: python columnar_export.py OUT_DIR [--format parquet|arrow] [--chunk-size 500]
+
+import argparse
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+from hierarchy import HIERARCHY, MAIN_BLOCK, item_code
+from judgment_codec import ratio_codes
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+TABLES = ("judgments", "weights", "consistency")
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+DEFAULT_CHUNK_SIZE = 500
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("pyarrow not installed. Install with `pip install pyarrow` to enable the columnar export.")
+
+
+class _Layout:
+    """Fixed dictionaries and per-pair index arrays of a compiled hierarchy."""
+
+    def __init__(self, hierarchy, usernames):
+        h = hierarchy
+        self.hierarchy = h
+        self.block_names = [MAIN_BLOCK] + [item_code(g) for g in h.criteria]
+        labels = list(h.criteria) + [sk for g in h.criteria for sk in h.subcriteria[g]]
+        label_idx = {label: i for i, label in enumerate(labels)}
+        self.labels = pa.array(labels, pa.string())
+        self.blocks = pa.array(self.block_names, pa.string())
+        self.pair_names = pa.array([c for block, _ in h.blocks for c in h.pair_columns(block)], pa.string())
+        self.user_ids = np.array(sorted(usernames), dtype=np.int64)
+        self.usernames = pa.array([usernames[u] for u in self.user_ids], pa.string())
+
+        pair_block, pair_a, pair_b = [], [], []
+        for b, (block, items) in enumerate(h.blocks):
+            for i, j in h.pairs[block]:
+                pair_block.append(b)
+                pair_a.append(label_idx[items[i]])
+                pair_b.append(label_idx[items[j]])
+        self.pair_block = np.array(pair_block, dtype=np.int8)
+        self.pair_a = np.array(pair_a, dtype=np.int16)
+        self.pair_b = np.array(pair_b, dtype=np.int16)
+        self.n_pairs = len(pair_block)
+
+        # weights table: one row per sub-criterion
+        self.sub_group = np.array([gi for gi, g in enumerate(h.criteria) for _ in h.subcriteria[g]], dtype=np.int16)
+        self.sub_label = np.array([label_idx[sk] for g in h.criteria for sk in h.subcriteria[g]], dtype=np.int16)
+        self.n_sub = len(self.sub_label)
+
+        dict_type = lambda index: pa.dictionary(index, pa.string())
+        meta = [("submission_id", pa.int64()), ("user_id", pa.int64()), ("username", dict_type(pa.int32())),
+                ("timestamp", pa.string())]
+        self.schemas = {
+            "judgments": pa.schema(meta + [("block", dict_type(pa.int8())), ("pair", dict_type(pa.int16())),
+                                           ("item_a", dict_type(pa.int16())), ("item_b", dict_type(pa.int16())),
+                                           ("code", pa.int8()), ("ratio", pa.float64())]),
+            "weights": pa.schema(meta + [("criterion", dict_type(pa.int16())), ("subcriterion", dict_type(pa.int16())),
+                                         ("main_weight", pa.float64()), ("local_weight", pa.float64()),
+                                         ("global_weight", pa.float64())]),
+            "consistency": pa.schema(meta + [("block", dict_type(pa.int8())), ("lambda_max", pa.float64()),
+                                             ("ci", pa.float64()), ("cr", pa.float64())]),
+        }
+
+    def meta_columns(self, rows, repeat):
+        sids = np.repeat(np.array([r["id"] for r in rows], dtype=np.int64), repeat)
+        uids = np.repeat(np.array([r["user_id"] for r in rows], dtype=np.int64), repeat)
+        pos = np.searchsorted(self.user_ids, uids)
+        pos = np.minimum(pos, max(len(self.user_ids) - 1, 0))
+        known = (self.user_ids[pos] == uids) if len(self.user_ids) else np.zeros(len(uids), bool)
+        user_idx = pa.array(pos.astype(np.int32), mask=~known)
+        ts = np.repeat(np.array([str(r.get("timestamp") or "") for r in rows], dtype=object), repeat)
+        return [pa.array(sids), pa.array(uids), pa.DictionaryArray.from_arrays(user_idx, self.usernames),
+                pa.array(ts, pa.string())]
+
+
+def _result_arrays(row, hierarchy):
+    """(weights per block, [lambda_max, CI, CR] per block) or None when the result does not fit the hierarchy."""
+    compact = getattr(row, "compact", {}).get("result_json")
+    if compact is not None and compact.get("h") == hierarchy.version:
+        return compact["w"], compact["cons"]
+    res = row.get("result_json") or {}
+    try:
+        parts = [res["main"]] + [res["local"][g] for g in hierarchy.criteria]
+        weights = [list(map(float, p["weights"])) for p in parts]
+        cons = [[float(p["cons"][k]) for k in ("lambda_max", "CI", "CR")] for p in parts]
+    except (KeyError, TypeError, ValueError):
+        return None
+    if [len(w) for w in weights] != [len(items) for _, items in hierarchy.blocks]:
+        return None
+    return weights, cons
+
+
+def _chunk_batches(layout, rows):
+    """Record batches of the three tables for one chunk of submissions (rows that do not fit are skipped)."""
+    h = layout.hierarchy
+    with_judgments, ratios = [], []
+    with_results, weights, cons = [], [], []
+    for row in rows:
+        try:
+            j = row.judgments(h)
+            ratios.append(np.concatenate([j[block] for block, _ in h.blocks]))
+            with_judgments.append(row)
+        except (ValueError, TypeError, AttributeError):
+            pass
+        arrays = _result_arrays(row, h)
+        if arrays is not None:
+            with_results.append(row)
+            weights.append(arrays[0])
+            cons.append(arrays[1])
+
+    batches = {}
+    n = len(with_judgments)
+    if n:
+        ratio = np.concatenate(ratios)
+        try:
+            code = ratio_codes(ratio).astype(np.int8)
+            code_arr = pa.array(code)
+        except ValueError:
+            # off-scale ratios (bulk imports): codes only where the ratio is on the scale
+            code_arr = pa.array([_safe_code(r) for r in ratio], pa.int8())
+        cols = layout.meta_columns(with_judgments, layout.n_pairs) + [
+            pa.DictionaryArray.from_arrays(pa.array(np.tile(layout.pair_block, n)), layout.blocks),
+            pa.DictionaryArray.from_arrays(pa.array(np.tile(np.arange(layout.n_pairs, dtype=np.int16), n)),
+                                           layout.pair_names),
+            pa.DictionaryArray.from_arrays(pa.array(np.tile(layout.pair_a, n)), layout.labels),
+            pa.DictionaryArray.from_arrays(pa.array(np.tile(layout.pair_b, n)), layout.labels),
+            code_arr,
+            pa.array(ratio),
+        ]
+        batches["judgments"] = pa.RecordBatch.from_arrays(cols, schema=layout.schemas["judgments"])
+
+    m = len(with_results)
+    if m:
+        main_w = np.array([w[0] for w in weights])                                   # (m, n_criteria)
+        local_w = np.array([np.concatenate(w[1:]) for w in weights])                 # (m, n_sub)
+        main_per_sub = main_w[:, layout.sub_group]
+        cols = layout.meta_columns(with_results, layout.n_sub) + [
+            pa.DictionaryArray.from_arrays(pa.array(np.tile(layout.sub_group, m)), layout.labels),
+            pa.DictionaryArray.from_arrays(pa.array(np.tile(layout.sub_label, m)), layout.labels),
+            pa.array(main_per_sub.ravel()),
+            pa.array(local_w.ravel()),
+            pa.array((main_per_sub * local_w).ravel()),
+        ]
+        batches["weights"] = pa.RecordBatch.from_arrays(cols, schema=layout.schemas["weights"])
+
+        c = np.array(cons)                                                           # (m, n_blocks, 3)
+        n_blocks = len(h.blocks)
+        cols = layout.meta_columns(with_results, n_blocks) + [
+            pa.DictionaryArray.from_arrays(pa.array(np.tile(np.arange(n_blocks, dtype=np.int8), m)), layout.blocks),
+            pa.array(c[:, :, 0].ravel()),
+            pa.array(c[:, :, 1].ravel()),
+            pa.array(c[:, :, 2].ravel()),
+        ]
+        batches["consistency"] = pa.RecordBatch.from_arrays(cols, schema=layout.schemas["consistency"])
+    return batches, len(rows) - n
+
+
+def _safe_code(ratio):
+    try:
+        return int(ratio_codes([ratio])[0])
+    except ValueError:
+        return None
+
+
+def export_submissions(storage, out_dir, fmt="parquet", chunk_size=DEFAULT_CHUNK_SIZE, hierarchy=HIERARCHY,
+                       progress=None):
+    """Write the three tables to out_dir; returns {"paths": {table: path}, "submissions": n, "skipped": k}."""
+    _require_pyarrow()
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format {fmt!r}, expected one of {sorted(FORMATS)}")
+    os.makedirs(out_dir, exist_ok=True)
+    layout = _Layout(hierarchy, {u["id"]: u["username"] for u in storage.list_users()})
+    paths = {t: os.path.join(out_dir, f"submissions_{t}{FORMATS[fmt]}") for t in TABLES}
+    if fmt == "parquet":
+        writers = {t: pq.ParquetWriter(paths[t], layout.schemas[t], compression="zstd") for t in TABLES}
+    else:
+        options = pa.ipc.IpcWriteOptions(compression="zstd")
+        writers = {t: pa.ipc.new_file(paths[t], layout.schemas[t], options=options) for t in TABLES}
+
+    last_id, total, skipped = 0, 0, 0
+    try:
+        while True:
+            rows = storage.list_submissions_after(last_id, limit=chunk_size)
+            if not rows:
+                break
+            batches, chunk_skipped = _chunk_batches(layout, rows)
+            for table, batch in batches.items():
+                writers[table].write_batch(batch)
+            total += len(rows)
+            skipped += chunk_skipped
+            last_id = rows[-1]["id"]
+            if progress is not None:
+                progress(total)
+    finally:
+        for w in writers.values():
+            w.close()
+    return {"paths": paths, "submissions": total, "skipped": skipped}
+
+
+def export_zip_bytes(storage, fmt="parquet", chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """The three tables zipped together (for a download button)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        summary = export_submissions(storage, tmp, fmt=fmt, chunk_size=chunk_size, progress=progress)
+        zip_path = os.path.join(tmp, "export.zip")
+        # the columnar files are already compressed
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED) as zf:
+            for path in summary["paths"].values():
+                zf.write(path, os.path.basename(path))
+        with open(zip_path, "rb") as f:
+            return f.read(), summary
+
+
+def render_export_section(storage):
+    import streamlit as st
+
+    st.subheader("🧮 Ekspor Analitik (Parquet / Arrow)")
+    st.write("Tiga tabel kolumnar untuk notebook: penilaian berpasangan (long format), bobot, dan konsistensi.")
+    if pa is None:
+        st.info("pyarrow belum terpasang; ekspor kolumnar dinonaktifkan.")
+        return
+    fmt = st.radio("Format", list(FORMATS), horizontal=True, key="columnar_format")
+    if st.button("Buat file ekspor", key="btn_columnar_export"):
+        status = st.empty()
+        data, summary = export_zip_bytes(storage, fmt=fmt, progress=lambda n: status.caption(f"{n} submission diproses..."))
+        status.empty()
+        st.session_state["columnar_export"] = (fmt, data, summary)
+    if "columnar_export" in st.session_state:
+        fmt, data, summary = st.session_state["columnar_export"]
+        st.caption(f"{summary['submissions']} submission diekspor, {summary['skipped']} dilewati (pasangan tidak lengkap).")
+        st.download_button(f"📥 Download ekspor {fmt} (ZIP)", data=data, file_name=f"ahp_submissions_{fmt}.zip",
+                           mime="application/zip", key="dl_columnar_export")
+
+
+def main():
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Columnar export of all submissions.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+    summary = export_submissions(create_storage(), args.out_dir, fmt=args.format, chunk_size=args.chunk_size,
+                                 progress=lambda n: print(f"{n} submissions"))
+    for table, path in summary["paths"].items():
+        print(f"{table}: {path}")
+    print(f"Exported {summary['submissions']} submissions ({summary['skipped']} without complete judgments).")
+
+
+if __name__ == "__main__":
+    main()
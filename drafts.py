@@ -0,0 +1,121 @@
+# drafts.py
+# Autosaved questionnaire drafts, restored when the expert comes back.
+#
+# A draft is the compact answer vector of questionnaire.py (signed Saaty codes
+# in the compiled pair order) plus the wizard step:
+#
+#   {"v": 1, "h": "<hierarchy version>", "c": [codes], "step": 0}
+#
+# stored in the drafts table, one row per user. Writes are debounced per user:
+# the first change is written at once, later changes within AHP_DRAFT_INTERVAL
+# seconds (default 3) only replace the pending draft, which a timer writes at the
+# end of the interval. Rapid clicking therefore costs at most one write per
+# interval. The writer is shared by all sessions of the Streamlit process.
+
+import atexit
+import os
+import threading
+import time
+
+import streamlit as st
+
+from hierarchy import HIERARCHY
+from judgment_codec import FORMAT_VERSION
+
+DEFAULT_INTERVAL = 3.0
+
+
+def make_draft(codes, step=0, hierarchy=HIERARCHY):
+    return {"v": FORMAT_VERSION, "h": hierarchy.version, "c": list(codes), "step": step}
+
+
+def draft_codes(draft, hierarchy=HIERARCHY):
+    """(codes, step) of a stored draft, or None if it does not fit the current hierarchy."""
+    if not isinstance(draft, dict) or draft.get("h") != hierarchy.version:
+        return None
+    codes = draft.get("c") or []
+    if len(codes) != hierarchy.n_pairs or not all(isinstance(c, int) and 1 <= abs(c) <= 9 for c in codes):
+        return None
+    return list(codes), int(draft.get("step") or 0)
+
+
+class DraftWriter:
+    def __init__(self, storage, interval=DEFAULT_INTERVAL):
+        self.storage = storage
+        self.interval = interval
+        self.lock = threading.Lock()
+        self._io_lock = threading.Lock()  # a delete never overtakes a write in flight
+        self._pending = {}  # user_id -> draft not written yet
+        self._timers = {}
+        self._last_write = {}  # user_id -> time.monotonic() of the last write
+        self.writes = 0
+        self.errors = 0
+
+    def put(self, user_id, draft):
+        """Schedule a write of the user's draft (coalesced with any pending one)."""
+        with self.lock:
+            self._pending[user_id] = draft
+            if user_id in self._timers:
+                return  # the scheduled write will take this draft
+            delay = max(0.0, self._last_write.get(user_id, float("-inf")) + self.interval - time.monotonic())
+            timer = threading.Timer(delay, self._write, (user_id,))
+            timer.daemon = True
+            self._timers[user_id] = timer
+            timer.start()
+
+    def _write(self, user_id):
+        with self._io_lock:
+            with self.lock:
+                self._timers.pop(user_id, None)
+                draft = self._pending.pop(user_id, None)
+                self._last_write[user_id] = time.monotonic()
+            if draft is None:
+                return
+            try:
+                self.storage.save_draft(user_id, draft)
+                self.writes += 1
+            except Exception:
+                self.errors += 1  # the next change schedules another write
+
+    def load(self, user_id):
+        """The user's latest draft: the pending one, else the stored one (None if there is none)."""
+        with self.lock:
+            if user_id in self._pending:
+                return self._pending[user_id]
+        try:
+            return self.storage.get_draft(user_id)
+        except Exception:
+            return None
+
+    def discard(self, user_id):
+        """Drop the user's draft (after the questionnaire was submitted)."""
+        with self.lock:
+            self._pending.pop(user_id, None)
+            timer = self._timers.pop(user_id, None)
+        if timer is not None:
+            timer.cancel()
+        with self._io_lock:
+            try:
+                self.storage.delete_draft(user_id)
+            except Exception:
+                self.errors += 1
+
+    def flush(self):
+        """Write every pending draft now (process exit)."""
+        with self.lock:
+            users = list(self._pending)
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+        for user_id in users:
+            self._write(user_id)
+
+
+@st.cache_resource
+def get_drafts():
+    """Process-wide draft writer on the shared storage."""
+    from storage import get_storage
+
+    writer = DraftWriter(get_storage(), float(os.getenv("AHP_DRAFT_INTERVAL", DEFAULT_INTERVAL)))
+    atexit.register(writer.flush)
+    return writer
@@ -0,0 +1,125 @@
+# excel_export.py
+# Excel export shared by the apps (openpyxl, no pandas.ExcelWriter).
+#
+# Workbooks are written in openpyxl's write-only mode: rows are streamed from
+# the DataFrame column lists straight into the sheet XML and the finished file
+# is built in a spooled temporary file, which moves to disk once it is larger
+# than SPILL_BYTES instead of growing a BytesIO.
+#
+# "Download Semua Data" can use the wide layout (Meta_/Main_/Global_<id>, three
+# sheets per submission) or the long layout (one sheet per table, one row per
+# submission and item), which stays at three sheets however many experts answer.
+
+import tempfile
+
+import pandas as pd
+from openpyxl import Workbook
+
+SPILL_BYTES = 8 * 1024 * 1024
+MAX_SHEET_NAME = 31
+
+
+def _frame(df):
+    if isinstance(df, pd.DataFrame):
+        return df
+    try:
+        return pd.DataFrame(df)
+    except Exception:
+        return pd.DataFrame([df])
+
+
+def _sheet_name(name, used):
+    # Excel limits names to 31 chars; truncated names must stay unique
+    base = str(name)[:MAX_SHEET_NAME]
+    candidate, n = base, 1
+    while candidate.lower() in used:
+        n += 1
+        suffix = f"~{n}"
+        candidate = base[:MAX_SHEET_NAME - len(suffix)] + suffix
+    used.add(candidate.lower())
+    return candidate
+
+
+def write_excel(sheets, fileobj):
+    """Write {name: DataFrame} (or an iterable of (name, DataFrame) pairs) to a binary file object."""
+    wb = Workbook(write_only=True)
+    used = set()
+    for sheet_name, df in (sheets.items() if isinstance(sheets, dict) else sheets):
+        df = _frame(df)
+        ws = wb.create_sheet(_sheet_name(sheet_name, used))
+        ws.append([str(c) for c in df.columns])
+        # tolist() converts a whole column to Python scalars in one call
+        columns = [df[c].tolist() for c in df.columns]
+        for row in zip(*columns):
+            ws.append(row)
+        ws.close()  # finish the sheet now; open sheets each keep a temp file and writer until save
+    wb.save(fileobj)
+
+
+def to_excel_bytes(sheets):
+    """Excel file for {sheet name: DataFrame or dict/list} as bytes."""
+    with tempfile.SpooledTemporaryFile(max_size=SPILL_BYTES) as f:
+        write_excel(sheets, f)
+        f.seek(0)
+        return f.read()
+
+
+def _submission_frames(row):
+    res = row.get("result_json") or {}
+    main = res.get("main", {}) or {}
+    df_main = pd.DataFrame({"Kriteria": main.get("keys", []), "Bobot": main.get("weights", [])})
+    df_global = pd.DataFrame(res.get("global", []))
+    if "GlobalWeight" in df_global:
+        df_global = df_global.sort_values("GlobalWeight", ascending=False)
+    return df_main, df_global
+
+
+def _meta(row):
+    return {"ID": row.get("id"), "User": row.get("username"), "Job Items": row.get("job_items", ""),
+            "Timestamp": row.get("timestamp")}
+
+
+def _wide_sheets(rows):
+    for r in rows:
+        sid = r.get("id")
+        df_main, df_global = _submission_frames(r)
+        meta = _meta(r)
+        meta.pop("ID")
+        yield f"Meta_{sid}", pd.DataFrame([meta])
+        yield f"Main_{sid}", df_main
+        yield f"Global_{sid}", df_global
+
+
+def _long_sheets(rows):
+    meta, main, glob = [], [], []
+    for r in rows:
+        m = _meta(r)
+        meta.append(m)
+        df_main, df_global = _submission_frames(r)
+        ids = {"ID": m["ID"], "User": m["User"]}
+        main.append(df_main.assign(**ids))
+        glob.append(df_global.assign(**ids))
+    yield "Meta", pd.DataFrame(meta, columns=["ID", "User", "Job Items", "Timestamp"])
+    for name, parts in (("Main", main), ("Global", glob)):
+        if parts:
+            df = pd.concat(parts, ignore_index=True)
+            yield name, df[["ID", "User"] + [c for c in df.columns if c not in ("ID", "User")]]
+        else:
+            yield name, pd.DataFrame(columns=["ID", "User"])
+
+
+def all_submissions_sheets(summary, rows, long_format=False):
+    """Sheets of the "Download Semua Data" export: the admin summary plus every submission.
+
+    rows are submission rows with username (and job_items) filled in.
+    """
+    yield "Ringkasan_Admin", summary
+    yield from (_long_sheets(rows) if long_format else _wide_sheets(rows))
+
+
+def all_submissions_excel(job, summary, rows, long_format=False):
+    """Background-job task (jobs.py): the "Download Semua Data" workbook as a spooled file."""
+    f = tempfile.SpooledTemporaryFile(max_size=SPILL_BYTES)
+    write_excel(all_submissions_sheets(summary, job.track(rows, "Submission"), long_format), f)
+    f.seek(0)
+    return f
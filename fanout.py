@@ -0,0 +1,59 @@
+# fanout.py
+# Run independent backend requests concurrently.
+#
+# The Supabase client is synchronous, so requests are issued from a small
+# thread pool. Concurrency is bounded and every request gets its own timeout,
+# measured from the moment it starts running (not from when it was queued).
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT = 15.0
+
+
+class FanOutTimeout(TimeoutError):
+    pass
+
+
+def fan_out(calls, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT):
+    """Run zero-argument callables concurrently and return their results in order.
+
+    The first exception (or a request exceeding `timeout` seconds) is raised and
+    requests that have not started yet are cancelled.
+    """
+    calls = list(calls)
+    if len(calls) <= 1 or max_workers <= 1:
+        return [call() for call in calls]
+
+    started = {}
+
+    def run(i, call):
+        started[i] = time.monotonic()
+        return call()
+
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(calls)), thread_name_prefix="fanout")
+    futures = {pool.submit(run, i, call): i for i, call in enumerate(calls)}
+    results = [None] * len(calls)
+    pending = set(futures)
+    try:
+        while pending:
+            now = time.monotonic()
+            running = [started[futures[f]] for f in pending if futures[f] in started]
+            wait_for = max(0.0, min(running) + timeout - now) if running else timeout
+            done, pending = wait(pending, timeout=max(0.01, min(wait_for, 0.25)), return_when=FIRST_COMPLETED)
+            for f in done:
+                results[futures[f]] = f.result()
+            now = time.monotonic()
+            for f in pending:
+                i = futures[f]
+                if i in started and now - started[i] > timeout:
+                    raise FanOutTimeout(f"request {i} exceeded {timeout:.1f}s")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+def fan_out_map(fn, items, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT):
+    """fan_out(fn(item) for item in items)."""
+    return fan_out([lambda item=item: fn(item) for item in items], max_workers=max_workers, timeout=timeout)
@@ -0,0 +1,201 @@
+# hierarchy.py
+# AHP hierarchy shared by the apps, the bulk importer and the batch jobs.
+#
+# compile_hierarchy() turns the label lists into a fixed block/pair order with
+# short item codes ("A", "A1", ...) and a version id, so judgments can be
+# validated and processed as arrays instead of label-keyed dicts.
+#
+# Compact rows (judgment_codec.py) store codes plus the version id, so every
+# hierarchy that has been used to store them is frozen as a label snapshot in
+# hierarchies/<version>.json and loaded into HIERARCHIES; old rows keep decoding
+# against the labels they were written with. After editing CRITERIA or
+# SUBCRITERIA run `python hierarchy.py freeze` and commit the new snapshot;
+# until then the codec writes label-keyed rows.
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+
+CRITERIA = [
+    "A. Penataan Area Drop-off, Pick-up, dan Manajemen Moda",
+    "B. Penataan Sirkulasi Kendaraan dan Pengendalian Kemacetan",
+    "C. Keamanan dan Keselamatan Ruang Publik",
+    "D. Kenyamanan Ruang Publik dan Lingkungan",
+    "E. Kebersihan dan Pemeliharaan Fasilitas",
+    "F. Aksesibilitas dan Konektivitas",
+    "G. Aktivitas dan Fasilitas Pendukung"
+]
+
+SUBCRITERIA = {
+    "A. Penataan Area Drop-off, Pick-up, dan Manajemen Moda": [
+        "A1. Sediakan zona drop-off/pick-up resmi yang tertata",
+        "A2. Bangun zona khusus drop-off untuk ojek online",
+        "A3. Sediakan ruang drop-off terpisah untuk taksi dan mobil pribadi",
+        "A4. Perbesar kapasitas ruang drop-off sesuai volume kendaraan",
+        "A5. Pisahkan zona antarmoda secara tegas",
+        "A6. Sediakan tempat mangkal resmi untuk ojek online dan ojek pangkalan",
+        "A7. Tata alur sirkulasi kendaraan dengan pola yang terarah",
+        "A8. Integrasikan manajemen transit dalam satu sistem zonasi",
+        "A9. Kendalikan aktivitas moda pada jam sibuk",
+        "A10. Sediakan area parkir resmi yang teratur dan mudah diakses"
+    ],
+    "B. Penataan Sirkulasi Kendaraan dan Pengendalian Kemacetan": [
+        "B1. Susun sirkulasi kendaraan agar tidak bergantung pada satu koridor",
+        "B2. Hilangkan titik parkir liar melalui desain fisik dan pengawasan",
+        "B3. Tambahkan kapasitas sirkulasi untuk moda kecil dan ojol",
+        "B4. Atur perilaku lalu lintas melalui desain preventif",
+        "B5. Pisahkan jalur kendaraan dari area pejalan kaki"
+    ],
+    "C. Keamanan dan Keselamatan Ruang Publik": [
+        "C1. Sediakan titik penyeberangan aman dan terlindungi",
+        "C2. Kurangi titik konflik kendaraan–pejalan kaki melalui pemisahan fisik",
+        "C3. Sediakan penerangan merata di seluruh koridor",
+        "C4. Tingkatkan keamanan dengan CCTV, patroli, dan desain yang aktif"
+    ],
+    "D. Kenyamanan Ruang Publik dan Lingkungan": [
+        "D1. Sediakan area teduh dan pelindung cuaca pada jalur pejalan kaki",
+        "D2. Tambahkan ruang terbuka hijau dan vegetasi",
+        "D3. Lebarkan area pejalan kaki agar terasa lapang",
+        "D4. Sediakan tempat duduk di titik beristirahat strategis",
+        "D5. Bangun ruang tunggu yang luas, teduh, dan nyaman",
+        "D6. Tingkatkan kualitas estetika kawasan",
+        "D7. Kendalikan kebisingan melalui buffer fisik atau vegetasi"
+    ],
+    "E. Kebersihan dan Pemeliharaan Fasilitas": [
+        "E1. Tingkatkan standar kebersihan toilet, lantai, dan fasilitas dasar",
+        "E2. Sediakan sistem pengelolaan sampah yang memadai",
+        "E3. Lakukan pemeliharaan fasilitas secara berkala"
+    ],
+    "F. Aksesibilitas dan Konektivitas": [
+        "F1. Sediakan jalur akses yang dekat dan tidak melelahkan",
+        "F2. Bangun ramp dan fasilitas akses ramah difabel",
+        "F3. Pastikan eskalator dan lift berfungsi baik setiap saat",
+        "F4. Tingkatkan konektivitas antarmoda melalui jalur direct link",
+        "F5. Sediakan jalur pejalan kaki yang aman, rata, dan tidak licin",
+        "F6. Sediakan parkir sepeda yang aman dan memadai"
+    ],
+    "G. Aktivitas dan Fasilitas Pendukung": [
+        "G1. Sediakan fasilitas komersial dasar yang mudah dijangkau",
+        "G2. Sediakan fasilitas makan dan minum yang layak dan terjangkau",
+        "G3. Sediakan ruang istirahat dan fasilitas transit yang memadai",
+        "G4. Tata zona aktivitas agar tidak mengganggu sirkulasi utama",
+        "G5. Sediakan sistem informasi dan signage yang jelas dan konsisten"
+    ]
+}
+
+# Random Index for CI/CR
+RI_DICT = {1:0.0,2:0.0,3:0.58,4:0.90,5:1.12,6:1.24,7:1.32,8:1.41,9:1.45,10:1.49}
+
+# ------------------------------
+# Compiled hierarchy
+# ------------------------------
+MAIN_BLOCK = "main"
+
+
+def item_code(label):
+    """Short code of a criterion/sub-criterion label: "A1. Sediakan ..." -> "A1"."""
+    return label.split(".", 1)[0].strip()
+
+
+class CompiledHierarchy:
+    """Fixed comparison order for the questionnaire.
+
+    blocks: [(block_name, items)] with "main" first, then one block per criterion.
+    pairs[block_name]: list of (i, j) index pairs in itertools.combinations order,
+    the same order pairwise_inputs renders them.
+    """
+
+    def __init__(self, criteria, subcriteria):
+        self.criteria = list(criteria)
+        self.subcriteria = {g: list(subcriteria[g]) for g in self.criteria}
+        self.blocks = [(MAIN_BLOCK, self.criteria)] + [(g, self.subcriteria[g]) for g in self.criteria]
+        self.items = dict(self.blocks)
+        self.pairs = {name: list(itertools.combinations(range(len(items)), 2)) for name, items in self.blocks}
+        self.n_pairs = sum(len(p) for p in self.pairs.values())
+        # split points of the concatenated per-block weight vectors
+        self.weight_offsets = list(itertools.accumulate(len(items) for _, items in self.blocks))[:-1]
+        self.code_to_label = {}
+        for _, items in self.blocks:
+            for label in items:
+                self.code_to_label[item_code(label)] = label
+        canonical = json.dumps(self.blocks, ensure_ascii=False, separators=(",", ":"))
+        self.version = hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:12]
+        self._pair_keys = {}
+
+    def pair_labels(self, block):
+        items = self.items[block]
+        return [(items[i], items[j]) for i, j in self.pairs[block]]
+
+    def pair_keys(self, block):
+        """Storage keys of the pairs, "<label a> ||| <label b>" (cached)."""
+        if block not in self._pair_keys:
+            self._pair_keys[block] = [f"{a} ||| {b}" for a, b in self.pair_labels(block)]
+        return self._pair_keys[block]
+
+    def pair_columns(self, block):
+        """Column names used by the bulk import sheet, e.g. "A-B" or "A1-A2"."""
+        return [f"{item_code(a)}-{item_code(b)}" for a, b in self.pair_labels(block)]
+
+
+def compile_hierarchy(criteria=None, subcriteria=None):
+    return CompiledHierarchy(criteria or CRITERIA, subcriteria or SUBCRITERIA)
+
+
+HIERARCHY = compile_hierarchy()
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hierarchies")
+
+
+def load_snapshots(directory=SNAPSHOT_DIR):
+    """{version: CompiledHierarchy} of the frozen label snapshots in directory."""
+    out = {}
+    if not os.path.isdir(directory):
+        return out
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".json"):
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                snap = json.load(f)
+            h = CompiledHierarchy(snap["criteria"], snap["subcriteria"])
+            out[h.version] = h
+    return out
+
+
+def freeze(hierarchy=HIERARCHY, directory=SNAPSHOT_DIR):
+    """Write the label snapshot of a hierarchy; returns its path."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{hierarchy.version}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"criteria": hierarchy.criteria, "subcriteria": hierarchy.subcriteria}, f,
+                  ensure_ascii=False, indent=2)
+        f.write("\n")
+    return path
+
+
+# frozen versions: stored codes can be resolved against these
+HIERARCHIES = load_snapshots()
+FROZEN = frozenset(HIERARCHIES)
+HIERARCHIES.setdefault(HIERARCHY.version, HIERARCHY)
+
+
+def get_hierarchy(version):
+    try:
+        return HIERARCHIES[version]
+    except KeyError:
+        raise ValueError(f"unknown hierarchy version {version!r}") from None
+
+
+def is_frozen(hierarchy):
+    return hierarchy.version in FROZEN
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AHP hierarchy snapshots.")
+    parser.add_argument("command", choices=["freeze"])
+    parser.parse_args()
+    print(f"Hierarchy {HIERARCHY.version} frozen in {freeze()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+# jobs.py
+# Background jobs for heavy exports (all-data Excel, per-expert PDF ZIP).
+#
+# A page submits a job under a key built from everything the result depends on
+# (e.g. feed.version and the filters) and polls for it instead of building the
+# file inside the rerun. Jobs run in a local process pool; their
+# state (queued / running / done / failed, progress, message) lives in a SQLite
+# table, so every session and rerun sees the same job, and submitting a key
+# that is already queued, running or done does nothing. The result is written
+# to the artifact cache under the job key.
+#
+# A task is a picklable module-level function task(job, *args) returning bytes
+# or a binary file object; job is a JobContext with progress() and the cache.
+# A task that finishes with partial results calls job.warn(): the job is done,
+# and the warning is kept in its error column and shown next to the download.
+#
+# Several servers (the three apps, or several workers of one app) may share the
+# table. Each JobQueue is an owner that renews a heartbeat in job_owners while
+# its process lives; queued or running jobs whose owner has not renewed it for
+# LEASE_SECONDS are marked failed, by whichever queue notices first.
+#
+# Settings: AHP_JOBS_DB (default ahp_jobs.db), AHP_JOB_WORKERS (2).
+
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import streamlit as st
+
+from artifact_cache import ArtifactCache, get_cache, render_key
+from procpool import SpawnPool
+
+ACTIVE = ("queued", "running")
+DEFAULT_DB = "ahp_jobs.db"
+DEFAULT_WORKERS = 2
+POLL_SECONDS = 1.5
+PROGRESS_INTERVAL = 0.5  # seconds between progress writes from a worker
+KEEP_DAYS = 7
+HEARTBEAT_SECONDS = 30
+LEASE_SECONDS = 120  # an owner silent for longer is gone, with the workers running its jobs
+
+JOBS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT DEFAULT '',
+    error TEXT,
+    owner TEXT,
+    created_at REAL,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS job_owners (
+    owner TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+"""
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def _update(conn, key, **fields):
+    fields["updated_at"] = time.time()
+    cols = ", ".join(f"{c} = ?" for c in fields)
+    conn.execute(f"UPDATE jobs SET {cols} WHERE key = ?", (*fields.values(), key))
+
+
+class JobContext:
+    """What a task sees inside the worker: progress reporting and the artifact cache."""
+
+    def __init__(self, db_path, key, cache):
+        self.key = key
+        self.cache = cache
+        self._conn = _connect(db_path)
+        self._last = 0.0
+        self.warnings = []
+
+    def progress(self, fraction, message=""):
+        now = time.monotonic()
+        if now - self._last >= PROGRESS_INTERVAL or fraction >= 1:
+            _update(self._conn, self.key, progress=float(min(max(fraction, 0.0), 1.0)), message=message)
+            self._last = now
+
+    def warn(self, message):
+        """Record a problem that does not fail the job (e.g. some reports could not be rendered)."""
+        self.warnings.append(message)
+
+    def track(self, items, message):
+        """Yield from a sized iterable, reporting progress as "message i/n"."""
+        n = max(len(items), 1)
+        for i, item in enumerate(items, start=1):
+            yield item
+            self.progress(i / n, f"{message} {i}/{len(items)}")
+
+
+def _run_job(db_path, cache_root, cache_max_bytes, key, kind, task, args):
+    # runs in a worker process
+    job = JobContext(db_path, key, ArtifactCache(cache_root, cache_max_bytes))
+    _update(job._conn, key, status="running", message="Dimulai...")
+    try:
+        result = task(job, *args)
+        job.cache.put(key, kind, result)
+        warning = " ".join(job.warnings) or None
+        _update(job._conn, key, status="done", progress=1.0, error=warning,
+                message="Selesai dengan peringatan" if warning else "Selesai")
+    except Exception as e:
+        _update(job._conn, key, status="failed", error=f"{type(e).__name__}: {e}", message="Gagal")
+    finally:
+        job._conn.close()
+
+
+class JobQueue:
+    def __init__(self, db_path, cache, max_workers=DEFAULT_WORKERS):
+        self.db_path = db_path
+        self.cache = cache
+        self.max_workers = max_workers
+        self.owner = uuid.uuid4().hex  # this server process, stored on each job it submits
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self._pool = None
+        conn = self._conn()
+        conn.executescript(JOBS_SCHEMA)
+        self._beat()
+        self.fail_orphans()
+        conn.execute("DELETE FROM jobs WHERE updated_at < ?", (time.time() - KEEP_DAYS * 86400,))
+        threading.Thread(target=self._heartbeat, name="ahp-jobs-heartbeat", daemon=True).start()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.db_path)
+        return conn
+
+    def _beat(self):
+        self._conn().execute("INSERT INTO job_owners (owner, heartbeat) VALUES (?, ?)"
+                             " ON CONFLICT(owner) DO UPDATE SET heartbeat = excluded.heartbeat",
+                             (self.owner, time.time()))
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(HEARTBEAT_SECONDS)
+            try:
+                self._beat()
+                self.fail_orphans()
+            except sqlite3.OperationalError:
+                pass  # database busy: try again at the next beat, well within the lease
+
+    def fail_orphans(self):
+        """Mark queued / running jobs of owners whose lease expired as failed; returns their number."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("DELETE FROM job_owners WHERE heartbeat < ?", (now - LEASE_SECONDS,))
+        cur = conn.execute(
+            "UPDATE jobs SET status = 'failed', error = 'Dihentikan: server pemilik job berhenti', updated_at = ? "
+            "WHERE status IN ('queued', 'running') AND (owner IS NULL OR owner NOT IN (SELECT owner FROM job_owners))",
+            (now,))
+        return cur.rowcount
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = SpawnPool(self.max_workers)
+        return self._pool
+
+    def get(self, key):
+        """Job row as a dict (status, progress, message, error, ...) or None."""
+        row = self._conn().execute("SELECT * FROM jobs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job["status"] == "done" and not self.cache.contains(key, job["kind"]):
+            return None  # result evicted from the cache: the job has to run again
+        return job
+
+    def submit(self, key, kind, task, *args):
+        """Queue task(job, *args) under key unless a job with that key is queued, running or done."""
+        with self.lock:
+            job = self.get(key)
+            if job is not None and job["status"] != "failed":
+                return job
+            now = time.time()
+            self._conn().execute(
+                "INSERT OR REPLACE INTO jobs (key, kind, status, progress, message, error, owner, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', 0, 'Menunggu giliran...', NULL, ?, ?, ?)",
+                (key, kind, self.owner, now, now))
+            try:
+                future = self._get_pool().submit(_run_job, self.db_path, self.cache.root, self.cache.max_bytes,
+                                                 key, kind, task, args)
+            except Exception as e:
+                self._fail(key, e)
+                self._pool = None
+            else:
+                future.add_done_callback(lambda f, key=key: self._finished(key, f))
+            return self.get(key)
+
+    def _finished(self, key, future):
+        # the worker records its own result; this catches what it could not (pickling, a crashed pool)
+        exc = future.exception() if not future.cancelled() else RuntimeError("dibatalkan")
+        if exc is not None:
+            self._fail(key, exc)
+            with self.lock:
+                self._pool = None
+
+    def _fail(self, key, exc):
+        _update(self._conn(), key, status="failed", error=f"{type(exc).__name__}: {exc}")
+
+    def result(self, key, kind):
+        """Result bytes of a finished job, or None."""
+        return self.cache.get(key, kind)
+
+
+@st.cache_resource
+def get_jobs():
+    """Process-wide job queue writing results to the artifact cache."""
+    return JobQueue(os.getenv("AHP_JOBS_DB", DEFAULT_DB), get_cache(), int(os.getenv("AHP_JOB_WORKERS", DEFAULT_WORKERS)))
+
+
+def render_job_download(label, kind, task, args, version, file_name, mime, key):
+    """Download button for task(job, *args()) run as a background job (cf. lazy_download.render_lazy_download).
+
+    A button submits the job, the page then polls its progress until the file is
+    ready. args is a zero-argument callable, evaluated only on submit. version is
+    any value that changes whenever the file contents would; it is scoped to this
+    server process, like feed.version.
+    """
+    jobs = get_jobs()
+    job_key = render_key("job", key, jobs.owner, version)
+    job = jobs.get(job_key)
+    if job is None or job["status"] == "failed":
+        if job is not None:
+            st.error(f"Gagal menyiapkan {file_name}: {job['error']}")
+        if not st.button(f"⚙️ Siapkan {file_name}", key=f"job_{key}_build"):
+            return
+        job = jobs.submit(job_key, kind, task, *args())
+
+    if job["status"] in ACTIVE:
+        _render_job_progress(job_key, file_name)
+        return
+    data = jobs.result(job_key, kind)
+    if job["error"]:
+        st.warning(f"{file_name}: {job['error']}")
+    if data is not None:
+        st.download_button(label, data=data, file_name=file_name, mime=mime, key=f"job_{key}_button")
+
+
+def _render_job_progress(job_key, file_name):
+    @st.fragment(run_every=POLL_SECONDS)
+    def poll():
+        job = get_jobs().get(job_key)
+        if job is None or job["status"] not in ACTIVE:
+            st.rerun()  # finished (or failed): redraw the page with the result
+        st.progress(job["progress"], text=f"{file_name}: {job['message'] or job['status']}")
+
+    poll()
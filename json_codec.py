@@ -0,0 +1,66 @@
+# json_codec.py
+# JSON encode/decode used by the storage layer and the caches.
+#
+# Uses orjson when it is installed (several times faster on the submission
+# columns, and serialises NumPy arrays natively) and the standard library
+# otherwise. AHP_JSON_BACKEND=json forces the standard library.
+#
+# Note: hashes (artifact_cache.render_key) keep using the standard library so
+# cache keys do not depend on which backend is installed.
+
+import json
+import os
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKENDS = ("orjson", "json")
+
+
+def _default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def set_backend(name):
+    """Select "orjson" or "json"; "orjson" falls back to json when not installed. Returns the active name."""
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"unknown JSON backend {name!r}, expected one of {BACKENDS}")
+    _backend = "orjson" if name == "orjson" and orjson is not None else "json"
+    return _backend
+
+
+def backend():
+    return _backend
+
+
+def loads(data):
+    """Parse JSON text (str or bytes)."""
+    if _backend == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_bytes(obj):
+    """UTF-8 JSON of obj; NumPy arrays and scalars are written as lists and numbers."""
+    if _backend == "orjson":
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_default, ensure_ascii=False).encode("utf-8")
+
+
+def dumps(obj):
+    if _backend == "orjson":
+        return dumps_bytes(obj).decode("utf-8")
+    return json.dumps(obj, default=_default, ensure_ascii=False)
+
+
+_backend = None
+set_backend(os.getenv("AHP_JSON_BACKEND", "orjson").lower())
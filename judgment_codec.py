@@ -0,0 +1,301 @@
+# judgment_codec.py
+# Compact, versioned encoding of the submission JSON columns.
+#
+# Legacy rows key every judgment by two full labels ("A. ... ||| B. ...") and
+# repeat the labels again in result_json. Compact rows store only numbers in
+# the compiled pair/block order of hierarchy.py, plus the hierarchy version:
+#
+#   main_pairs  {"v": 1, "h": "<version>", "c": [codes of the main block]}
+#   sub_pairs   {"v": 1, "h": "<version>", "c": [codes of groups A..G, concatenated]}
+#   result_json {"v": 1, "h": "<version>", "w": [[weights per block]], "cons": [[lambda_max, CI, CR] per block]}
+#
+# A code is the Saaty scale value as a signed integer: n means the left item is
+# n times more important, -n means the right item is (ratio 1/n); 1 is equal.
+#
+# This is the single codec of the storage backends: encode_submission() on
+# every write (always native JSON objects, never JSON strings), and
+# decode_submission() exactly once per fetched row, which returns a Submission
+# whose JSON columns are in the label-keyed shape the pages use. Rows written
+# by older versions (JSON strings, label-keyed dicts) are still read;
+# `python judgment_codec.py migrate` rewrites them in batches.
+#
+# Codes are decoded against the frozen hierarchy they were written with
+# (hierarchy.HIERARCHIES). A column whose version this build does not know is
+# left undecoded (stored_as "unknown") instead of failing the whole read, and
+# compact columns are only written for frozen hierarchies.
+
+import argparse
+import logging
+from collections import Counter
+
+import numpy as np
+
+import json_codec
+from ahp_batch import judgments_from_pairs
+from hierarchy import HIERARCHY, MAIN_BLOCK, get_hierarchy, is_frozen
+
+FORMAT_VERSION = 1
+
+log = logging.getLogger(__name__)
+# columns written label-keyed because compact encoding failed, per column name
+FALLBACKS = Counter()
+
+
+def _load(value):
+    return json_codec.loads(value) if isinstance(value, str) else value
+
+
+def is_compact(value):
+    return isinstance(value, dict) and "v" in value and "h" in value
+
+
+def ratio_codes(ratios):
+    """Ratios on the 1-9 scale -> signed integer codes; ValueError for other values."""
+    ratios = np.asarray(ratios, dtype=float)
+    codes = np.where(ratios >= 1, np.rint(ratios), -np.rint(1.0 / ratios)).astype(int)
+    codes[codes == -1] = 1
+    if np.any(np.abs(codes) < 1) or np.any(np.abs(codes) > 9) or not np.allclose(code_ratios(codes), ratios):
+        raise ValueError("judgment not on the 1-9 scale")
+    return codes
+
+
+def code_ratios(codes):
+    codes = np.asarray(codes, dtype=float)
+    return np.where(codes > 0, codes, -1.0 / codes)
+
+
+def _ratio_list(codes):
+    # plain-Python variant of code_ratios for the read path (faster for one row)
+    return [float(c) if c > 0 else -1.0 / c for c in codes]
+
+
+def _header(hierarchy):
+    return {"v": FORMAT_VERSION, "h": hierarchy.version}
+
+
+def _judgments(hierarchy, main_pairs=None, sub_pairs=None):
+    # judgments_from_pairs needs both columns; fill the missing one with equal judgments
+    main = _load(main_pairs) if main_pairs is not None else {}
+    sub = _load(sub_pairs) if sub_pairs is not None else {}
+    if main_pairs is None:
+        main = {f"{a} ||| {b}": 1.0 for a, b in hierarchy.pair_labels(MAIN_BLOCK)}
+    if sub_pairs is None:
+        sub = {g: {f"{a} ||| {b}": 1.0 for a, b in hierarchy.pair_labels(g)} for g in hierarchy.criteria}
+    return judgments_from_pairs(hierarchy, main, sub)
+
+
+def encode_main_pairs(main_pairs, hierarchy=HIERARCHY):
+    codes = ratio_codes(_judgments(hierarchy, main_pairs=main_pairs)[MAIN_BLOCK])
+    return dict(_header(hierarchy), c=codes.tolist())
+
+
+def encode_sub_pairs(sub_pairs, hierarchy=HIERARCHY):
+    judgments = _judgments(hierarchy, sub_pairs=sub_pairs)
+    codes = np.concatenate([ratio_codes(judgments[g]) for g in hierarchy.criteria])
+    return dict(_header(hierarchy), c=codes.tolist())
+
+
+def encode_result(result, hierarchy=HIERARCHY):
+    result = _load(result)
+    main = result["main"]
+    if list(main.get("keys", hierarchy.criteria)) != hierarchy.criteria:
+        raise ValueError("result_json does not match the hierarchy")
+    parts = [main] + [result["local"][g] for g in hierarchy.criteria]
+    for part, (_, items) in zip(parts, hierarchy.blocks):
+        if len(part["weights"]) != len(items):
+            raise ValueError("result_json does not match the hierarchy")
+    return dict(_header(hierarchy),
+                w=[[float(x) for x in part["weights"]] for part in parts],
+                cons=[[float(part["cons"][k]) for k in ("lambda_max", "CI", "CR")] for part in parts])
+
+
+def decode_main_pairs(compact):
+    h = get_hierarchy(compact["h"])
+    return dict(zip(h.pair_keys(MAIN_BLOCK), _ratio_list(compact["c"])))
+
+
+def decode_sub_pairs(compact):
+    h = get_hierarchy(compact["h"])
+    ratios = _ratio_list(compact["c"])
+    out, start = {}, 0
+    for g in h.criteria:
+        keys = h.pair_keys(g)
+        out[g] = dict(zip(keys, ratios[start:start + len(keys)]))
+        start += len(keys)
+    return out
+
+
+def decode_result(compact, main_pairs=None):
+    """Legacy-shaped result_json; the main matrix is rebuilt when compact main_pairs are given."""
+    h = get_hierarchy(compact["h"])
+    cons = [dict(zip(("lambda_max", "CI", "CR"), c)) for c in compact["cons"]]
+    main_w = compact["w"][0]
+    main = {"keys": list(h.criteria), "weights": list(main_w), "cons": cons[0]}
+    if is_compact(main_pairs) and main_pairs["h"] == compact["h"]:
+        n = len(h.criteria)
+        mat = [[1.0] * n for _ in range(n)]
+        for (i, j), v in zip(h.pairs[MAIN_BLOCK], _ratio_list(main_pairs["c"])):
+            mat[i][j] = v
+            mat[j][i] = 1.0 / v
+        main["mat"] = mat
+    local = {}
+    global_rows = []
+    for i, g in enumerate(h.criteria):
+        keys = h.subcriteria[g]
+        weights = compact["w"][i + 1]
+        local[g] = {"keys": list(keys), "weights": list(weights), "cons": cons[i + 1]}
+        for sk, lw in zip(keys, weights):
+            global_rows.append({
+                "Kriteria": g,
+                "SubKriteria": sk,
+                "LocalWeight": lw,
+                "MainWeight": main_w[i],
+                "GlobalWeight": main_w[i] * lw
+            })
+    return {"main": main, "local": local, "global": global_rows}
+
+
+_ENCODERS = (("main_pairs", encode_main_pairs), ("sub_pairs", encode_sub_pairs), ("result_json", encode_result))
+CODEC_COLUMNS = tuple(col for col, _ in _ENCODERS)
+
+
+class Submission(dict):
+    """A submissions row decoded once at fetch time.
+
+    Behaves like the plain row dict. `compact` holds the stored compact columns
+    (if any) for array consumers, `stored_as` records how each JSON column was
+    stored: "compact", "labels" (label-keyed dict), "string" (JSON text) or
+    "unknown" (compact, written by a hierarchy version this build does not
+    know; the column is left undecoded).
+    """
+
+    def __init__(self, row, compact=None, stored_as=None):
+        super().__init__(row)
+        self.compact = compact or {}
+        self.stored_as = stored_as or {}
+
+    @property
+    def result(self):
+        return self.get("result_json") or {}
+
+    def needs_migration(self, compact=True):
+        kinds = set(self.stored_as.values())
+        return "string" in kinds or (compact and "labels" in kinds)
+
+    def judgments(self, hierarchy=HIERARCHY):
+        """{block: ratios} in compiled pair order; taken from the stored codes when possible."""
+        main, sub = self.compact.get("main_pairs"), self.compact.get("sub_pairs")
+        if main and sub and main["h"] == sub["h"] == hierarchy.version:
+            out, start = {MAIN_BLOCK: code_ratios(main["c"])}, 0
+            sub_ratios = code_ratios(sub["c"])
+            for g in hierarchy.criteria:
+                n = len(hierarchy.pairs[g])
+                out[g] = sub_ratios[start:start + n]
+                start += n
+            return out
+        return judgments_from_pairs(hierarchy, self.get("main_pairs"), self.get("sub_pairs"))
+
+    def weight_arrays(self, hierarchy=HIERARCHY):
+        """[weights per block] as float arrays in hierarchy.blocks order (main first).
+
+        Taken from the stored compact result in one conversion when possible;
+        blocks missing from a legacy result come back as empty arrays.
+        """
+        res = self.compact.get("result_json")
+        if res and res["h"] == hierarchy.version:
+            flat = np.array([x for w in res["w"] for x in w], dtype=float)
+            return np.split(flat, hierarchy.weight_offsets)
+        res = self.result
+        parts = [res.get("main") or {}] + [(res.get("local") or {}).get(g) or {} for g in hierarchy.criteria]
+        return [np.asarray(p.get("weights", []), dtype=float) for p in parts]
+
+
+def encode_submission(payload, compact=True, hierarchy=HIERARCHY):
+    """Copy of a submission payload ready to write: native JSON, compact format when enabled.
+
+    Columns that cannot be encoded compactly (labels not in the hierarchy,
+    ratios off the 1-9 scale) are written label-keyed and counted in FALLBACKS;
+    so is everything while the hierarchy is not frozen yet.
+    """
+    out = dict(payload)
+    compact = compact and is_frozen(hierarchy)
+    for col, encode in _ENCODERS:
+        value = _load(out.get(col))
+        if value is not None and compact and not is_compact(value):
+            try:
+                value = encode(value, hierarchy)
+            except (ValueError, KeyError, TypeError) as e:
+                FALLBACKS[col] += 1
+                log.warning("%s written label-keyed: %s", col, e)
+        if col in out:
+            out[col] = value
+    return out
+
+
+def decode_submission(row):
+    """Submission for a fetched row (rows without JSON columns are returned unchanged)."""
+    if row is None or not any(col in row for col in CODEC_COLUMNS + ("result",)):
+        return row
+    out = dict(row)
+    if out.get("result_json") is None and out.get("result") is not None:
+        out["result_json"] = out["result"]  # column name of early versions
+    compact, stored_as = {}, {}
+    for col in CODEC_COLUMNS:
+        value = out.get(col)
+        if value is None:
+            continue
+        if isinstance(value, str):
+            stored_as[col] = "string"
+            try:
+                value = json_codec.loads(value)
+            except ValueError:
+                value = {}
+        if is_compact(value):
+            stored_as[col] = "compact"
+            compact[col] = value
+        else:
+            stored_as.setdefault(col, "labels")
+        out[col] = value
+    decoders = {"main_pairs": decode_main_pairs, "sub_pairs": decode_sub_pairs,
+                "result_json": lambda value: decode_result(value, compact.get("main_pairs"))}
+    for col, value in compact.items():
+        try:
+            out[col] = decoders[col](value)
+        except ValueError:
+            stored_as[col] = "unknown"  # left as stored
+    return Submission(out, compact, stored_as)
+
+
+def migrate_submissions(storage, batch_size=200, progress=None):
+    """Rewrite rows stored as JSON strings (and label-keyed rows when the storage
+    writes compact) in batches of `batch_size`. Returns (scanned, rewritten)."""
+    compact = getattr(storage, "compact", True)
+    last_id, scanned, rewritten = 0, 0, 0
+    while True:
+        rows = storage.list_submissions_after(last_id, limit=batch_size)
+        if not rows:
+            return scanned, rewritten
+        stale = [dict(r) for r in rows if isinstance(r, Submission) and r.needs_migration(compact)]
+        if stale:
+            storage.upsert_submissions(stale)
+        scanned += len(rows)
+        rewritten += len(stale)
+        last_id = rows[-1]["id"]
+        if progress is not None:
+            progress(scanned, rewritten)
+
+
+def main():
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Submission JSON column codec.")
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    scanned, rewritten = migrate_submissions(create_storage(), batch_size=args.batch_size,
+                                             progress=lambda s, r: print(f"{s} rows scanned, {r} rewritten"))
+    print(f"Migrated {rewritten} of {scanned} submissions.")
+
+
+if __name__ == "__main__":
+    main()
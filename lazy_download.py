@@ -0,0 +1,28 @@
+# lazy_download.py
+# Download buttons whose file is built only when the user asks for it.
+#
+# A "Siapkan" button runs build() once; the bytes are kept in the session with
+# the data version they were built from. Reruns (navigation, filters, radio
+# clicks) then show the download button straight away and rebuild only after
+# the version changes.
+
+import streamlit as st
+
+
+def render_lazy_download(label, build, version, file_name, mime, key):
+    """Download button for build() (bytes), built on demand and memoized per version.
+
+    version is any comparable value that changes whenever the file contents
+    would (e.g. (feed.version, filters)).
+    """
+    memo_key = f"lazy_dl_{key}"
+    memo = st.session_state.get(memo_key)
+    if memo is None or memo[0] != version:
+        if memo is not None:
+            st.caption("Data berubah sejak file terakhir disiapkan.")
+        if not st.button(f"⚙️ Siapkan {file_name}", key=f"{memo_key}_build"):
+            return
+        with st.spinner(f"Menyiapkan {file_name}..."):
+            memo = (version, build())
+        st.session_state[memo_key] = memo
+    st.download_button(label, data=memo[1], file_name=file_name, mime=mime, key=f"{memo_key}_button")
@@ -0,0 +1,12 @@
+-- Denormalised summary columns on submissions (see summaries.py).
+-- Run once in the Supabase SQL editor, then: python summaries.py backfill
+
+alter table submissions
+    add column if not exists cr_main double precision,
+    add column if not exists cr_groups double precision[],
+    add column if not exists main_weights double precision[],
+    add column if not exists cr_max double precision,
+    add column if not exists inconsistent boolean;
+
+create index if not exists idx_submissions_cr_max on submissions (cr_max);
+create index if not exists idx_submissions_inconsistent on submissions (inconsistent) where inconsistent;
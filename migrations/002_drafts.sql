@@ -0,0 +1,8 @@
+-- Questionnaire drafts, one row per user (see drafts.py).
+-- Run once in the Supabase SQL editor.
+
+create table if not exists drafts (
+    user_id bigint primary key references users (id) on delete cascade,
+    payload jsonb,
+    updated_at timestamptz
+);
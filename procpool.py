@@ -0,0 +1,84 @@
+# procpool.py
+# Process pools that can be started from a Streamlit page.
+#
+# Workers are started with "spawn": the Streamlit server is multi-threaded and
+# forking it can deadlock the children. A spawned worker normally re-imports
+# the parent's __main__ module, but Streamlit runs the page script as
+# sys.modules["__main__"], so every worker would run the whole app. While a
+# worker starts, __main__ is replaced by an empty module (nothing to
+# re-import); tasks must therefore be functions of importable modules, never
+# of the page.
+#
+# The executor starts a worker in a private method (_spawn_process, CPython
+# 3.9+), so __main__ is hidden only while a process is actually started: at
+# most max_workers short swaps per pool. Every use of that method is guarded;
+# an executor without it hides __main__ around each submit() instead, where
+# the public API starts workers. Swaps are serialized, and a page module a
+# rerun installs meanwhile is left in place.
+#
+# A pool may itself be started inside a worker (a background job rendering
+# reports, jobs.py). A worker process exits by joining its children before the
+# usual executor shutdown runs, so pools are also shut down from a
+# multiprocessing exit finalizer, which runs first.
+
+import multiprocessing
+import sys
+import threading
+import types
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing.util import Finalize
+
+_main_lock = threading.Lock()
+_pools = weakref.WeakSet()
+
+
+def _shutdown_pools():
+    for pool in list(_pools):
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+Finalize(None, _shutdown_pools, exitpriority=100)  # before the pools' own queues are closed (priority 10)
+
+
+@contextmanager
+def _main_hidden():
+    with _main_lock:
+        main = sys.modules.get("__main__")
+        if getattr(main, "__file__", None) is None:
+            yield
+            return
+        stub = types.ModuleType("__main__")
+        sys.modules["__main__"] = stub
+        try:
+            yield
+        finally:
+            # a rerun may have installed its own page module meanwhile
+            if sys.modules.get("__main__") is stub:
+                sys.modules["__main__"] = main
+
+
+# where ProcessPoolExecutor starts one worker process (an executor internal)
+_SPAWN_HOOK = "_spawn_process"
+_HAS_SPAWN_HOOK = callable(getattr(ProcessPoolExecutor, _SPAWN_HOOK, None))
+
+
+class SpawnPool(ProcessPoolExecutor):
+    def __init__(self, max_workers):
+        super().__init__(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        _pools.add(self)
+
+    def submit(self, fn, /, *args, **kwargs):
+        if _HAS_SPAWN_HOOK:
+            return super().submit(fn, *args, **kwargs)
+        with _main_hidden():
+            return super().submit(fn, *args, **kwargs)
+
+
+if _HAS_SPAWN_HOOK:
+    def _spawn_process(self):
+        with _main_hidden():
+            getattr(ProcessPoolExecutor, _SPAWN_HOOK)(self)
+
+    setattr(SpawnPool, _SPAWN_HOOK, _spawn_process)
@@ -0,0 +1,206 @@
+# questionnaire.py
+# The pairwise-comparison questionnaire ("Isi Kuesioner") shared by the apps.
+#
+# Every pair is a direction radio plus a 1–9 scale selectbox; with 131 pairs a
+# change to any of those 262 widgets reruns the whole script (sidebar, auth,
+# every widget). By default the questionnaire is drawn inside one st.form: the
+# answers are collected in the browser and the script runs once, when the form
+# is submitted.
+#
+# In "wizard" mode only one comparison block (main criteria, then groups A–G)
+# is drawn at a time, with a progress bar and back / next buttons, so a rerun
+# lays out at most the largest block (45 pairs) instead of all 131. Answers are
+# kept in the session as one vector of signed Saaty codes in the compiled pair
+# order of hierarchy.py (the compact format of judgment_codec.py).
+#
+# The same vector is autosaved as a draft (drafts.py, debounced) whenever the
+# answers reach the server: every change in "live" mode, every step in the
+# wizard, the "Simpan draf" button of the form. The first time the
+# questionnaire is drawn for a user in a session (i.e. after login) the draft
+# is restored into the widgets; it is dropped once the answers are submitted.
+#
+# Setting: AHP_QUESTIONNAIRE_MODE = "form" (default), "wizard", or "live"
+# (every change reruns, as before; the save button is an ordinary button).
+
+import hashlib
+import itertools
+import os
+
+import streamlit as st
+
+from drafts import draft_codes, get_drafts, make_draft
+from hierarchy import HIERARCHY, MAIN_BLOCK
+from judgment_codec import code_ratios, ratio_codes
+
+MODES = ("form", "wizard", "live")
+DEFAULT_MODE = "form"
+DEFAULT_CODE = 2  # the widgets' initial answer: left item, scale 2
+CODES_KEY = "questionnaire_codes"
+STEP_KEY = "questionnaire_step"
+USER_KEY = "questionnaire_user"
+RESTORED_KEY = "questionnaire_restored"
+
+
+def questionnaire_mode():
+    mode = os.getenv("AHP_QUESTIONNAIRE_MODE", DEFAULT_MODE).lower()
+    return mode if mode in MODES else DEFAULT_MODE
+
+
+def _short_key(prefix, a, b):
+    h = hashlib.sha1((prefix + "::" + a + "|||" + b).encode("utf-8")).hexdigest()
+    return h[:12]
+
+
+def pairwise_inputs(items, key_prefix, codes=None):
+    """
+    Render pairwise inputs for items.
+    Returns dict with keys (a,b) -> float where (a,b) indicates a/b = value.
+    codes: initial answer per pair as signed Saaty codes (default DEFAULT_CODE).
+    """
+    pairs = list(itertools.combinations(items, 2))
+    out = {}
+    for n, (a, b) in enumerate(pairs):
+        code = codes[n] if codes is not None else DEFAULT_CODE
+        col_l, col_mid, col_r, col_scale = st.columns([6, 1, 6, 2])
+        col_l.markdown(f"<div style='white-space:normal'>{a}</div>", unsafe_allow_html=True)
+        col_r.markdown(f"<div style='white-space:normal'>{b}</div>", unsafe_allow_html=True)
+        k = _short_key(key_prefix, a, b)
+        # direction radio: L means left more important
+        direction = col_mid.radio("", ["L", "R"], index=0 if code > 0 else 1, key=f"{k}_dir",
+                                  label_visibility="collapsed", horizontal=True)
+        val = col_scale.selectbox("", list(range(1, 10)), index=abs(code) - 1, key=f"{k}_scale",
+                                  label_visibility="collapsed")
+        if direction == "L":
+            out[(a, b)] = float(val)
+        else:
+            out[(a, b)] = float(1.0 / val)
+    return out
+
+
+def group_key_prefix(group):
+    return group[:12].replace(" ", "_")
+
+
+def _block_key_prefix(block):
+    return "MAIN" if block == MAIN_BLOCK else group_key_prefix(block)
+
+
+def _block_starts(hierarchy):
+    return list(itertools.accumulate((len(hierarchy.pairs[b]) for b, _ in hierarchy.blocks), initial=0))
+
+
+def pairs_from_codes(codes, hierarchy=HIERARCHY):
+    """(main_pairs, sub_pairs) as returned by render_questionnaire, from the compact code vector."""
+    h = hierarchy
+    ratios = [float(r) for r in code_ratios(codes)]
+    starts = _block_starts(h)
+    main_pairs = dict(zip(h.pair_labels(MAIN_BLOCK), ratios[:starts[1]]))
+    sub_pairs = {g: dict(zip(h.pair_keys(g), ratios[starts[i + 1]:starts[i + 2]])) for i, g in enumerate(h.criteria)}
+    return main_pairs, sub_pairs
+
+
+def _session_codes(user_id, hierarchy=HIERARCHY):
+    """The answer vector of this session; on the first call for a user, their draft if there is one."""
+    state = st.session_state
+    if state.get(USER_KEY) != user_id:
+        state[USER_KEY] = user_id
+        state[CODES_KEY], state[STEP_KEY] = [DEFAULT_CODE] * hierarchy.n_pairs, 0
+        restored = draft_codes(get_drafts().load(user_id), hierarchy)
+        if restored is not None:
+            state[CODES_KEY], state[STEP_KEY] = restored
+            state[RESTORED_KEY] = True
+    if state.pop(RESTORED_KEY, False):
+        st.info("Draf jawaban Anda sebelumnya dipulihkan.")
+    return state[CODES_KEY]
+
+
+def _remember(user_id, codes, step=0, autosave=True):
+    """Keep codes as the session's answers; schedule a draft write if they changed."""
+    state = st.session_state
+    changed = codes != state[CODES_KEY] or step != state[STEP_KEY]
+    state[CODES_KEY], state[STEP_KEY] = codes, step
+    if changed and autosave:
+        get_drafts().put(user_id, make_draft(codes, step))
+
+
+def discard_draft(user_id):
+    """Drop the user's draft once their answers are saved as a submission."""
+    get_drafts().discard(user_id)
+
+
+def _render_blocks(codes, hierarchy=HIERARCHY):
+    h = hierarchy
+    starts = _block_starts(h)
+    st.markdown("**1) Perbandingan Kriteria Utama (A–G)**")
+    main_pairs = pairwise_inputs(h.criteria, "MAIN", codes[:starts[1]])
+
+    st.markdown("---")
+    st.markdown("**2) Sub-Kriteria per Grup**")
+    sub_pairs = {}
+    new_codes = ratio_codes(list(main_pairs.values())).tolist()
+    for i, group in enumerate(h.criteria):
+        st.markdown(f"##### {group}")
+        sp = pairwise_inputs(h.subcriteria[group], group_key_prefix(group), codes[starts[i + 1]:starts[i + 2]])
+        sub_pairs[group] = {f"{a} ||| {b}": v for (a, b), v in sp.items()}
+        new_codes += ratio_codes(list(sp.values())).tolist()
+    return main_pairs, sub_pairs, new_codes
+
+
+def _render_wizard(save_label, user_id, hierarchy=HIERARCHY):
+    h = hierarchy
+    codes = list(_session_codes(user_id, h))
+    step = min(st.session_state[STEP_KEY], len(h.blocks) - 1)
+    block, items = h.blocks[step]
+    start = _block_starts(h)[step]
+    n = len(h.pairs[block])
+    last = step == len(h.blocks) - 1
+
+    title = "Perbandingan Kriteria Utama (A–G)" if block == MAIN_BLOCK else f"Sub-Kriteria: {block}"
+    st.progress((step + 1) / len(h.blocks), text=f"Blok {step + 1} dari {len(h.blocks)} — {n} perbandingan")
+    with st.form(f"questionnaire_{step}"):
+        st.markdown(f"**{title}**")
+        out = pairwise_inputs(items, _block_key_prefix(block), codes[start:start + n])
+        col_back, col_next = st.columns(2)
+        back = col_back.form_submit_button("⬅️ Kembali", disabled=step == 0)
+        forward = col_next.form_submit_button(save_label if last else "Lanjut ➡️")
+
+    if back or forward:
+        codes[start:start + n] = ratio_codes(list(out.values())).tolist()
+    if back or (forward and not last):
+        _remember(user_id, codes, step - 1 if back else step + 1)
+        st.rerun()
+    if forward:
+        _remember(user_id, codes, step, autosave=False)
+        return (True,) + pairs_from_codes(codes, h)
+    return False, None, None
+
+
+def render_questionnaire(save_label, user_id):
+    """Draw the questionnaire for a user; returns (saved, main_pairs, sub_pairs).
+
+    main_pairs is {(a, b): ratio}, sub_pairs {group: {"a ||| b": ratio}};
+    saved is True on the run in which the expert pressed save_label (in wizard
+    mode the pairs are None until then). Call discard_draft() once saved.
+    """
+    mode = questionnaire_mode()
+    if mode == "wizard":
+        return _render_wizard(save_label, user_id)
+    codes = _session_codes(user_id)
+    if mode == "live":
+        main_pairs, sub_pairs, codes = _render_blocks(codes)
+        saved = st.button(save_label, key="save_submission")
+        _remember(user_id, codes, autosave=not saved)
+        return saved, main_pairs, sub_pairs
+
+    with st.form("questionnaire"):
+        main_pairs, sub_pairs, codes = _render_blocks(codes)
+        st.caption("Jawaban dikirim ke server sekaligus saat tombol simpan ditekan; "
+                   "\"Simpan draf\" menyimpannya sementara untuk dilanjutkan nanti.")
+        col_save, col_draft = st.columns(2)
+        saved = col_save.form_submit_button(save_label)
+        draft = col_draft.form_submit_button("💾 Simpan draf")
+    if saved or draft:
+        _remember(user_id, codes, autosave=draft)
+    if draft:
+        st.success("Draf tersimpan. Jawaban akan dipulihkan saat Anda login kembali.")
+    return saved, main_pairs, sub_pairs
@@ -3,22 +3,26 @@
 # Requirements: streamlit==1.38.0, supabase==2.3.3, httpx==0.25.2, numpy, pandas, openpyxl, reportlab, altair
 
 import streamlit as st
-import json
-import itertools
-import numpy as np
 import pandas as pd
-from io import BytesIO
 from datetime import datetime
 import hashlib
 import os
-import zipfile  # <-- baru: untuk mengemas PDF ke ZIP
-from reportlab.lib.utils import simpleSplit
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
 
-
-from supabase import create_client
+from storage import get_storage
+from bulk_admin import render_bulk_section
+from ahp_batch import compute_result
+from artifact_cache import get_cache, judgment_key_from_pairs, render_key, submission_key
+from bulk_import import render_import_section
+from columnar_export import render_export_section
+from stream_export import render_stream_export_section
+from excel_export import all_submissions_excel, to_excel_bytes
+from jobs import render_job_download
+from questionnaire import discard_draft, render_questionnaire
+from report_book import BOOK_VERSION, book_pdf
+from reports import PLATYPUS_VERSION, TOP_GLOBAL, generate_pdf_bytes, report_payload, zip_reports
+from summaries import SUMMARY_COLUMNS, row_summary
+from change_feed import get_feed
+from charts import consistency_heatmap_spec, global_top_spec, group_contribution_spec
 
 # PDF libs (optional)
 try:
@@ -30,112 +34,27 @@ except Exception:
     A4 = None
     mm = None
 
-from openpyxl import Workbook
-
 st.set_page_config(page_title="AHP Multi-User (Supabase)", layout="wide")
 
 # -------------------------
-# Supabase setup & check
+# Storage setup & check (AHP_STORAGE = "supabase" | "sqlite")
 # -------------------------
-if "SUPABASE_URL" not in st.secrets or "SUPABASE_KEY" not in st.secrets:
-    st.warning("Supabase secrets belum dikonfigurasi. Tambahkan SUPABASE_URL dan SUPABASE_KEY (service_role) di Streamlit Secrets.")
+try:
+    storage = get_storage()
+except RuntimeError:
+    st.warning("Supabase secrets belum dikonfigurasi. Tambahkan SUPABASE_URL dan SUPABASE_KEY (service_role) di Streamlit Secrets, atau set AHP_STORAGE = \"sqlite\" untuk database lokal.")
     st.stop()
 
-SUPABASE_URL = st.secrets["SUPABASE_URL"]
-SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# ------------------------------
-# Utility: Excel writer (openpyxl)
-# ------------------------------
-def to_excel_bytes(df_dict):
-    wb = Workbook()
-    # remove default sheet
-    default = wb.active
-    wb.remove(default)
-    for sheet_name, df in df_dict.items():
-        if not isinstance(df, pd.DataFrame):
-            df = pd.DataFrame(df)
-        ws = wb.create_sheet(sheet_name[:31])
-        ws.append(list(df.columns))
-        for row in df.itertuples(index=False, name=None):
-            ws.append(list(row))
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return output
+# latest-per-expert rows + incremental aggregate, refreshed by max id
+feed = get_feed(storage)
+# computed results and rendered files, shared by identical answers
+artifacts = get_cache()
 
 # ------------------------------
 # Config / Data
 # ------------------------------
-CRITERIA = [
-    "A. Penataan Area Drop-off, Pick-up, dan Manajemen Moda",
-    "B. Penataan Sirkulasi Kendaraan dan Pengendalian Kemacetan",
-    "C. Keamanan dan Keselamatan Ruang Publik",
-    "D. Kenyamanan Ruang Publik dan Lingkungan",
-    "E. Kebersihan dan Pemeliharaan Fasilitas",
-    "F. Aksesibilitas dan Konektivitas",
-    "G. Aktivitas dan Fasilitas Pendukung"
-]
-
-SUBCRITERIA = {
-    "A. Penataan Area Drop-off, Pick-up, dan Manajemen Moda": [
-        "A1. Sediakan zona drop-off/pick-up resmi yang tertata",
-        "A2. Bangun zona khusus drop-off untuk ojek online",
-        "A3. Sediakan ruang drop-off terpisah untuk taksi dan mobil pribadi",
-        "A4. Perbesar kapasitas ruang drop-off sesuai volume kendaraan",
-        "A5. Pisahkan zona antarmoda secara tegas",
-        "A6. Sediakan tempat mangkal resmi untuk ojek online dan ojek pangkalan",
-        "A7. Tata alur sirkulasi kendaraan dengan pola yang terarah",
-        "A8. Integrasikan manajemen transit dalam satu sistem zonasi",
-        "A9. Kendalikan aktivitas moda pada jam sibuk",
-        "A10. Sediakan area parkir resmi yang teratur dan mudah diakses"
-    ],
-    "B. Penataan Sirkulasi Kendaraan dan Pengendalian Kemacetan": [
-        "B1. Susun sirkulasi kendaraan agar tidak bergantung pada satu koridor",
-        "B2. Hilangkan titik parkir liar melalui desain fisik dan pengawasan",
-        "B3. Tambahkan kapasitas sirkulasi untuk moda kecil dan ojol",
-        "B4. Atur perilaku lalu lintas melalui desain preventif",
-        "B5. Pisahkan jalur kendaraan dari area pejalan kaki"
-    ],
-    "C. Keamanan dan Keselamatan Ruang Publik": [
-        "C1. Sediakan titik penyeberangan aman dan terlindungi",
-        "C2. Kurangi titik konflik kendaraan–pejalan kaki melalui pemisahan fisik",
-        "C3. Sediakan penerangan merata di seluruh koridor",
-        "C4. Tingkatkan keamanan dengan CCTV, patroli, dan desain yang aktif"
-    ],
-    "D. Kenyamanan Ruang Publik dan Lingkungan": [
-        "D1. Sediakan area teduh dan pelindung cuaca pada jalur pejalan kaki",
-        "D2. Tambahkan ruang terbuka hijau dan vegetasi",
-        "D3. Lebarkan area pejalan kaki agar terasa lapang",
-        "D4. Sediakan tempat duduk di titik beristirahat strategis",
-        "D5. Bangun ruang tunggu yang luas, teduh, dan nyaman",
-        "D6. Tingkatkan kualitas estetika kawasan",
-        "D7. Kendalikan kebisingan melalui buffer fisik atau vegetasi"
-    ],
-    "E. Kebersihan dan Pemeliharaan Fasilitas": [
-        "E1. Tingkatkan standar kebersihan toilet, lantai, dan fasilitas dasar",
-        "E2. Sediakan sistem pengelolaan sampah yang memadai",
-        "E3. Lakukan pemeliharaan fasilitas secara berkala"
-    ],
-    "F. Aksesibilitas dan Konektivitas": [
-        "F1. Sediakan jalur akses yang dekat dan tidak melelahkan",
-        "F2. Bangun ramp dan fasilitas akses ramah difabel",
-        "F3. Pastikan eskalator dan lift berfungsi baik setiap saat",
-        "F4. Tingkatkan konektivitas antarmoda melalui jalur direct link",
-        "F5. Sediakan jalur pejalan kaki yang aman, rata, dan tidak licin",
-        "F6. Sediakan parkir sepeda yang aman dan memadai"
-    ],
-    "G. Aktivitas dan Fasilitas Pendukung": [
-        "G1. Sediakan fasilitas komersial dasar yang mudah dijangkau",
-        "G2. Sediakan fasilitas makan dan minum yang layak dan terjangkau",
-        "G3. Sediakan ruang istirahat dan fasilitas transit yang memadai",
-        "G4. Tata zona aktivitas agar tidak mengganggu sirkulasi utama",
-        "G5. Sediakan sistem informasi dan signage yang jelas dan konsisten"
-    ]
-}
-
-RI_DICT = {1:0.0,2:0.0,3:0.58,4:0.90,5:1.12,6:1.24,7:1.32,8:1.41,9:1.45,10:1.49}
+# Criteria and sub-criteria live in hierarchy.py (shared with the bulk importer)
+from hierarchy import CRITERIA, HIERARCHY
 
 # ------------------------------
 # Auth helpers (PBKDF2)
@@ -155,158 +74,33 @@ def verify_password(password, salt_hex, hash_hex):
     return dk.hex() == hash_hex
 
 # ------------------------------
-# AHP core functions
-# ------------------------------
-
-def build_matrix_from_pairs(items, pair_values):
-    n = len(items)
-    M = np.ones((n, n), dtype=float)
-    idx = {it: i for i, it in enumerate(items)}
-    for (a, b), val in pair_values.items():
-        if a not in idx or b not in idx:
-            continue
-        i = idx[a]; j = idx[b]
-        M[i, j] = float(val)
-        if float(val) != 0:
-            M[j, i] = 1.0 / float(val)
-    return M
-
-
-def geometric_mean_weights(mat):
-    n = mat.shape[0]
-    # handle potential zeros or negative values defensively
-    gm = np.prod(mat, axis=1) ** (1.0 / n)
-    w = gm / gm.sum()
-    return w
-
-
-def consistency_metrics(mat, weights):
-    n = mat.shape[0]
-    Aw = mat.dot(weights)
-    lambda_max = float(np.mean(Aw / weights))
-    CI = (lambda_max - n) / (n - 1) if n > 1 else 0.0
-    RI = RI_DICT.get(n, 1.49)
-    CR = CI / RI if RI != 0 else 0.0
-    return {"lambda_max": lambda_max, "CI": CI, "CR": CR}
-
-# ------------------------------
-# PDF generation (reportlab)
+# PDF reports (layout and PLATYPUS_VERSION in reports.py)
 # ------------------------------
-
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-
-
-def make_table(data, col_widths):
-    """
-    Membuat tabel ReportLab dengan text wrapping (tidak terpotong).
-    """
-    styles = getSampleStyleSheet()
-    styleN = styles["Normal"]
-
-    wrapped_data = []
-    for row in data:
-        wrapped_row = []
-        for cell in row:
-            if isinstance(cell, str):
-                wrapped_row.append(Paragraph(cell, styleN))
-            else:
-                wrapped_row.append(cell)
-        wrapped_data.append(wrapped_row)
-
-    table = Table(wrapped_data, colWidths=col_widths, repeatRows=1)
-    table.setStyle(TableStyle([
-        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
-        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-        ("VALIGN", (0, 0), (-1, -1), "TOP"),
-        ("FONT", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("LEFTPADDING", (0, 0), (-1, -1), 6),
-        ("RIGHTPADDING", (0, 0), (-1, -1), 6),
-        ("TOPPADDING", (0, 0), (-1, -1), 4),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
-    ]))
-    return table
-
-
-def generate_pdf_bytes(submission_row):
-    if canvas is None:
-        raise RuntimeError("reportlab not installed")
-
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=36,
-        leftMargin=36,
-        topMargin=36,
-        bottomMargin=36
-    )
-
-    styles = getSampleStyleSheet()
-    elements = []
-
-    elements.append(
-        Paragraph(
-            "<b>Laporan Hasil AHP – Penataan Ruang Publik</b>",
-            styles["Title"]
-        )
-    )
-    elements.append(Spacer(1, 12))
-
-    meta_text = (
-        f"<b>User / Pakar:</b> {submission_row.get('username','')}<br/>"
-        f"<b>Job Items:</b> {submission_row.get('job_items','')}<br/>"
-        f"<b>Waktu:</b> {submission_row.get('timestamp','')}"
-    )
-    elements.append(Paragraph(meta_text, styles["Normal"]))
-    elements.append(Spacer(1, 12))
-
-    # 1. Kriteria Utama
-    elements.append(Paragraph("<b>1. Bobot Kriteria Utama</b>", styles["Heading2"]))
-
-    main = submission_row["result"]["main"]
-    table_data = [["No", "Kriteria", "Bobot"]]
-    for i, (k, w) in enumerate(zip(main["keys"], main["weights"]), start=1):
-        table_data.append([str(i), k, f"{w:.4f}"])
-
-    elements.append(make_table(table_data, [30, 350, 80]))
-    elements.append(Spacer(1, 12))
-
-    # 2. Global Sub-Kriteria
-    elements.append(Paragraph("<b>2. Bobot Global Sub-Kriteria (Top 20)</b>", styles["Heading2"]))
-
-    global_df = pd.DataFrame(submission_row["result"]["global"])
-    global_df = global_df.sort_values("GlobalWeight", ascending=False).head(20)
-
-    table_data = [["No", "Sub-Kriteria", "Kriteria", "Bobot Global"]]
-    for i, row in enumerate(global_df.itertuples(), start=1):
-        table_data.append([
-            str(i),
-            row.SubKriteria,
-            row.Kriteria,
-            f"{row.GlobalWeight:.6f}"
-        ])
-
-    elements.append(make_table(table_data, [30, 220, 150, 80]))
-    elements.append(Spacer(1, 12))
-
-    # 3. Konsistensi
-    cons = main["cons"]
-    elements.append(Paragraph("<b>3. Ringkasan Konsistensi</b>", styles["Heading2"]))
-    elements.append(
-        Paragraph(
-            f"Kriteria Utama — CI: {cons.get('CI',0):.4f} | CR: {cons.get('CR',0):.4f}",
-            styles["Normal"]
-        )
-    )
-
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
+def pdf_cache_key(submission_row, judgment_key):
+    # generator, layout version and parameters first: the apps share the cache directory
+    return render_key("pdf", "platypus", PLATYPUS_VERSION, {"top": TOP_GLOBAL}, submission_row.get("id"), judgment_key,
+                      submission_row.get("username"), submission_row.get("timestamp"), submission_row.get("job_items"))
+
+def cached_pdf_bytes(submission_row, judgment_key):
+    """generate_pdf_bytes() through the disk LRU cache, keyed by submission id, content and template version."""
+    return artifacts.get_or_create(pdf_cache_key(submission_row, judgment_key), "pdf",
+                                   lambda: generate_pdf_bytes(submission_row))
+
+def expert_zip_items(rows):
+    """(file name, PDF cache key, report payload) per row, for the reports.zip_reports job."""
+    items = []
+    for r in rows:
+        report_row = expert_report_row(r)
+        items.append((f"laporan_pakar_{r.get('username')}_{r['id']}.pdf",
+                      pdf_cache_key(report_row, submission_key(r)), report_payload(report_row)))
+    return items
+
+def expert_report_row(r):
+    return {"id": r.get("id"), "username": r.get("username"), "timestamp": r.get("timestamp"),
+            "result": r.get("result_json") or {}, "job_items": r.get("job_items", "")}
 
 # ------------------------------
-# Supabase-backed DB operations (with job_items)
+# DB operations via storage backend (with job_items)
 # ------------------------------
 
 def register_user(username, password, is_admin=False, job_items=""):
@@ -326,20 +120,16 @@ def register_user(username, password, is_admin=False, job_items=""):
         "job_items": ji
     }
     try:
-        res = supabase.table("users").insert(payload).execute()
-        if hasattr(res, "error") and res.error:
-            return False, f"Registrasi gagal: {getattr(res.error, 'message', str(res.error))}"
+        storage.insert_user(payload)
         return True, "Registrasi berhasil. Silakan login."
     except Exception as e:
         return False, f"Registrasi gagal: {e}"
 
 
 def authenticate_user(username, password):
-    res = supabase.table("users").select("*").eq("username", username).execute()
-    data = getattr(res, "data", res) or []
-    if len(data) == 0:
+    user = storage.get_user_by_username(username)
+    if user is None:
         return False, "User tidak ditemukan."
-    user = data[0]
     try:
         if verify_password(password, user["pw_salt"], user["pw_hash"]):
             return True, {
@@ -361,54 +151,44 @@ def save_submission(user_id, main_pairs, sub_pairs, result):
         "sub_pairs": sub_pairs,
         "result_json": result
     }
-    res = supabase.table("submissions").insert(payload).execute()
-    return getattr(res, "data", res)
+    return storage.insert_submission(payload)
 
 
 def get_user_submissions(user_id):
-    res = supabase.table("submissions").select("*").eq("user_id", user_id).order("id", desc=True).execute()
-    return getattr(res, "data", []) or []
+    return storage.get_submissions_by_user(user_id)
 
 
 def delete_submission(submission_id):
-    res = supabase.table("submissions").delete().eq("id", submission_id).execute()
-    return getattr(res, "data", []) or []
+    deleted = storage.delete_submission(submission_id)
+    feed.forget([r["id"] for r in deleted])
+    return deleted
 
 
 def get_all_submissions_with_user():
-    users_res = supabase.table("users").select("*").order("username", desc=False).execute()
-    users = getattr(users_res, "data", []) or []
+    feed.refresh()
     all_rows = []
-    for u in users:
-        sid_res = supabase.table("submissions").select("*").eq("user_id", u["id"]).order("id", desc=True).limit(1).execute()
-        subs = getattr(sid_res, "data", []) or []
-        if subs:
-            s = subs[0]
-            all_rows.append({
-                "id": s["id"],
-                "username": u["username"],
-                "timestamp": s.get("timestamp"),
-                "result_json": s.get("result_json"),
-                "job_items": u.get("job_items", "")
-            })
+    for u, s in feed.latest_per_user():
+        all_rows.append({
+            "id": s["id"],
+            "username": u["username"],
+            "timestamp": s.get("timestamp"),
+            "result_json": s.get("result_json"),
+            "job_items": u.get("job_items", ""),
+            **{col: s.get(col) for col in SUMMARY_COLUMNS}
+        })
     all_rows = sorted(all_rows, key=lambda x: x["id"], reverse=True)
     return all_rows
 
 
 def get_latest_submission_by_user(user_id):
-    res = supabase.table("submissions").select("*").eq("user_id", user_id).order("id", desc=True).limit(1).execute()
-    data = getattr(res, "data", []) or []
-    return data[0] if data else None
+    return storage.get_latest_submission_by_user(user_id)
 
 
 def get_latest_submissions_per_user_list():
-    users_res = supabase.table("users").select("*").order("username", desc=False).execute()
-    users = getattr(users_res, "data", []) or []
+    feed.refresh()
     experts = []
-    for u in users:
-        sub = get_latest_submission_by_user(u["id"])
-        if sub is not None:
-            experts.append((u["username"], sub.get("result_json"), sub.get("main_pairs"), u.get("job_items", "")))
+    for u, sub in feed.latest_per_user():
+        experts.append((u["username"], sub.get("result_json"), sub.get("main_pairs"), u.get("job_items", "")))
     return experts
 
 # ------------------------------
@@ -477,73 +257,19 @@ else:
         "Hasil Akhir Penilaian"
     ])
 
-
-def _short_key(prefix, a, b):
-    h = hashlib.sha1((prefix + "::" + a + "|||" + b).encode("utf-8")).hexdigest()
-    return h[:12]
-
-
-def pairwise_inputs(items, key_prefix):
-    pairs = list(itertools.combinations(items, 2))
-    out = {}
-    for (a, b) in pairs:
-        col_l, col_mid, col_r, col_scale = st.columns([6, 1, 6, 2])
-        col_l.markdown(f"<div style='white-space:normal'>{a}</div>", unsafe_allow_html=True)
-        col_r.markdown(f"<div style='white-space:normal'>{b}</div>", unsafe_allow_html=True)
-        kshort = _short_key(key_prefix, a, b)
-        direction = col_mid.radio("", ["L", "R"], index=0, key=f"{kshort}_dir", horizontal=True, label_visibility="collapsed")
-        val = col_scale.selectbox("", list(range(1, 10)), index=1, key=f"{kshort}_scale", label_visibility="collapsed")
-        if direction == "L":
-            out[(a, b)] = float(val)
-        else:
-            out[(a, b)] = float(1.0 / val)
-    return out
-
 # Page: Isi Kuesioner
 if page == "Isi Kuesioner":
     st.header("Isi Kuesioner AHP — Penataan Ruang Publik")
     st.write("Isi perbandingan berpasangan menggunakan skala 1–9. (1 = sama penting, 9 = mutlak lebih penting).")
-    st.markdown("**1) Perbandingan Kriteria Utama (A–G)**")
-    main_pairs = pairwise_inputs(CRITERIA, "MAIN")
-
-    st.markdown("---")
-    st.markdown("**2) Sub-Kriteria per Grup**")
-    sub_pairs = {}
-    for group in CRITERIA:
-        st.markdown(f"##### {group}")
-        sp = pairwise_inputs(SUBCRITERIA[group], key_prefix=group[:12].replace(" ", "_"))
-        sub_pairs[group] = {f"{a} ||| {b}": v for (a, b), v in sp.items()}
-
-    if st.button("Simpan hasil ke database"):
-        main_mat = build_matrix_from_pairs(CRITERIA, main_pairs)
-        main_w = geometric_mean_weights(main_mat)
-        main_cons = consistency_metrics(main_mat, main_w)
-
-        local = {}
-        global_rows = []
-        for i, group in enumerate(CRITERIA):
-            pairdict = {tuple(k.split(" ||| ")): v for k, v in sub_pairs[group].items()}
-            mat = build_matrix_from_pairs(SUBCRITERIA[group], pairdict)
-            w = geometric_mean_weights(mat)
-            cons = consistency_metrics(mat, w)
-            local[group] = {"keys": SUBCRITERIA[group], "weights": list(map(float, w)), "cons": cons}
-            for sk, lw in zip(SUBCRITERIA[group], w):
-                global_rows.append({
-                    "Kriteria": group,
-                    "SubKriteria": sk,
-                    "LocalWeight": float(lw),
-                    "MainWeight": float(main_w[i]),
-                    "GlobalWeight": float(main_w[i] * lw)
-                })
-
-        result = {
-            "main": {"keys": CRITERIA, "weights": list(map(float, main_w)), "cons": main_cons, "mat": main_mat.tolist()},
-            "local": local,
-            "global": global_rows
-        }
+    saved, main_pairs, sub_pairs = render_questionnaire("Simpan hasil ke database", user["id"])
+    if saved:
         ts = datetime.now().isoformat()
         main_pairs_store = {f"{a} ||| {b}": v for (a, b), v in main_pairs.items()}
+        # unchanged answers hit the cache instead of recomputing
+        result = artifacts.get_or_create_json(judgment_key_from_pairs(main_pairs_store, sub_pairs), "result",
+                                              lambda: compute_result(HIERARCHY, main_pairs, sub_pairs))
         save_submission(user['id'], main_pairs_store, sub_pairs, result)
+        discard_draft(user['id'])
         st.success("Hasil berhasil disimpan ke database (Supabase).")
         st.rerun()
 
@@ -557,12 +283,8 @@ elif page == "My Submissions":
         for r in rows:
             sid = r.get("id")
             ts = r.get("timestamp")
-            res = r.get("result_json") if r.get("result_json") is not None else r.get("result")
-            if isinstance(res, str):
-                try:
-                    res = json.loads(res)
-                except Exception:
-                    res = {}
+            res = r.get("result_json") or {}
+            jkey = submission_key(r)
             st.subheader(f"Submission #{sid} — {ts}")
             if user.get("job_items"):
                 st.write("**Job Items / Keahlian:** " + str(user.get("job_items","")))
@@ -577,11 +299,12 @@ elif page == "My Submissions":
                     "Timestamp": ts,
                     "Job Items": user.get("job_items","")
                 }])
-                excel_out = to_excel_bytes({
+                xkey = render_key(jkey, "submission", user['username'], ts, user.get("job_items", ""))
+                excel_out = artifacts.get_or_create(xkey, "xlsx", lambda: to_excel_bytes({
                     "Meta": meta_df,
                     "Kriteria_Utama": df_main,
                     "Global_Weights": df_global
-                })
+                }))
                 st.download_button(f"Download Excel #{sid}", data=excel_out,
                                    file_name=f"submission_{sid}.xlsx",
                                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
@@ -595,7 +318,7 @@ elif page == "My Submissions":
                     "job_items": user.get("job_items", "")
                 }
                 try:
-                    pdf_bio = generate_pdf_bytes(submission_row)
+                    pdf_bio = cached_pdf_bytes(submission_row, jkey)
                     st.download_button(f"Download PDF #{sid}", data=pdf_bio,
                                        file_name=f"submission_{sid}.pdf", mime="application/pdf", key=f"pdf_{sid}")
                 except RuntimeError as e:
@@ -610,12 +333,8 @@ elif page == "Hasil Akhir Penilaian":
         st.stop()
     sid = latest.get("id")
     ts = latest.get("timestamp")
-    res = latest.get("result_json") if latest.get("result_json") is not None else latest.get("result")
-    if isinstance(res, str):
-        try:
-            res = json.loads(res)
-        except Exception:
-            res = {}
+    res = latest.get("result_json") or {}
+    jkey = submission_key(latest)
     if user.get("job_items"):
         st.write("**Job Items / Keahlian:** " + str(user.get("job_items","")))
     st.subheader("1. Bobot Kriteria Utama")
@@ -637,12 +356,9 @@ elif page == "Hasil Akhir Penilaian":
     st.table(df_global)
     st.subheader("Grafik Bobot Global (Top 20)")
     try:
-        import altair as alt
-        chart = alt.Chart(df_global.head(20)).mark_bar().encode(
-            x='GlobalWeight:Q',
-            y=alt.Y('SubKriteria:N', sort='-x')
-        ).properties(height=500)
-        st.altair_chart(chart, use_container_width=True)
+        st.vega_lite_chart(global_top_spec(("submission", jkey), res.get("global", [])), use_container_width=True)
+        st.subheader("Kontribusi Sub-Kriteria per Kriteria")
+        st.vega_lite_chart(group_contribution_spec(("submission", jkey), res.get("global", [])), use_container_width=True)
     except Exception:
         st.info("Altair tidak tersedia, grafik dilewati.")
 
@@ -656,17 +372,18 @@ elif page == "Hasil Akhir Penilaian":
         "job_items": user.get("job_items", "")
     }
     try:
-        pdf_bio = generate_pdf_bytes(submission_row)
+        pdf_bio = cached_pdf_bytes(submission_row, jkey)
         st.download_button("📄 Download Laporan PDF", data=pdf_bio,
                            file_name=f"hasil_ahp_{sid}.pdf", mime="application/pdf")
     except RuntimeError as e:
         st.warning(str(e))
 
-    excel_bio = to_excel_bytes({
+    xkey = render_key(jkey, "hasil", user['username'], ts, user.get("job_items", ""))
+    excel_bio = artifacts.get_or_create(xkey, "xlsx", lambda: to_excel_bytes({
         "Meta": pd.DataFrame([{"User": user['username'], "Timestamp": ts, "Job Items": user.get("job_items","")}]),
         "Kriteria_Utama": pd.DataFrame({"Kriteria": res['main']['keys'], "Bobot": res['main']['weights']}),
         "Global_Weights": pd.DataFrame(res.get("global", [])).sort_values("GlobalWeight", ascending=False)
-    })
+    }))
     st.download_button("📊 Download Excel Hasil", data=excel_bio,
                        file_name=f"hasil_ahp_{sid}.xlsx",
                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
@@ -674,71 +391,62 @@ elif page == "Hasil Akhir Penilaian":
 # Admin Panel
 elif page == "Admin Panel" and user["is_admin"]:
     st.header("📊 Admin Panel – Manajemen Submission Pakar")
+    if hasattr(storage, "metrics"):
+        with st.expander("Metrik backend (retry, coalescing, circuit breaker)"):
+            st.json(storage.metrics())
+            st.json({"artifact_cache": artifacts.stats()})
+    if st.button("🔄 Sinkron ulang penuh", key="feed_resync"):
+        feed.resync()
     all_rows = get_all_submissions_with_user()
+    st.caption(f"Data live: {len(all_rows)} pakar, submission terakhir #{feed.last_id}.")
     if not all_rows:
         st.info("Belum ada submission dari pakar.")
         st.stop()
 
+    only_inconsistent = st.checkbox("Hanya tampilkan submission dengan CR > 0.1", key="admin_cr_filter")
     summary_rows = []
     for r in all_rows:
         sid = r.get("id")
         username = r.get("username")
         ts = r.get("timestamp")
         job_items = r.get("job_items", "")
-        res = r.get("result_json") if r.get("result_json") is not None else r.get("result")
-        if isinstance(res, str):
-            try:
-                res = json.loads(res)
-            except Exception:
-                res = {}
-        main_weights = res.get("main", {}).get("weights", [])
-        cr_main = res.get("main", {}).get("cons", {}).get("CR", 0)
+        # summary columns written at save time; result_json is parsed only for rows not backfilled yet
+        summ = row_summary(r)
+        if only_inconsistent and not summ["inconsistent"]:
+            continue
+        main_weights = summ["main_weights"] or []
         summary_rows.append({
             "ID": sid,
             "User": username,
             "Job Items": job_items,
             "Timestamp": ts,
-            "CR Utama": cr_main,
+            "CR Utama": summ["cr_main"],
+            "CR Maks": summ["cr_max"],
             "Bobot Kriteria (truncated)": ", ".join(f"{w:.3f}" for w in (main_weights[:7] if len(main_weights) >= 7 else main_weights))
         })
     df_summary = pd.DataFrame(summary_rows)
     st.dataframe(df_summary, use_container_width=True)
 
     st.markdown("---")
-    st.subheader("🗑 Hapus Submission")
-    del_id = st.number_input("Masukkan ID submission yang ingin dihapus", min_value=1, step=1)
-    if st.button("Hapus Submission"):
-        try:
-            delete_submission(int(del_id))
-            st.success(f"Submission #{del_id} telah dihapus.")
-            st.rerun()
-        except Exception as e:
-            st.error(f"Gagal menghapus: {e}")
+    render_bulk_section(storage, [r["id"] for r in all_rows], feed=feed)
+
+    st.markdown("---")
+    render_import_section(storage)
+
+    st.markdown("---")
+    render_export_section(storage)
+
+    st.markdown("---")
+    render_stream_export_section(storage)
 
     st.markdown("---")
     st.subheader("📥 Download Semua Data (Excel)")
-    excel_sheets = {"Ringkasan_Admin": df_summary}
-    for r in all_rows:
-        sid = r.get("id")
-        res = r.get("result_json") if r.get("result_json") is not None else r.get("result")
-        job_items = r.get("job_items", "")
-        if isinstance(res, str):
-            try:
-                res = json.loads(res)
-            except Exception:
-                res = {}
-        df_main = pd.DataFrame({"Kriteria": res.get("main", {}).get("keys", []),
-                                "Bobot": res.get("main", {}).get("weights", [])})
-        df_global = pd.DataFrame(res.get("global", [])).sort_values("GlobalWeight", ascending=False)
-        meta_df = pd.DataFrame([{"User": r.get("username"), "Job Items": job_items, "Timestamp": r.get("timestamp")}])
-        excel_sheets[f"Meta_{sid}"] = meta_df
-        excel_sheets[f"Main_{sid}"] = df_main
-        excel_sheets[f"Global_{sid}"] = df_global
-
-    excel_all = to_excel_bytes(excel_sheets)
-    st.download_button("📊 Download Semua Data (Excel)", data=excel_all,
-                       file_name="all_submissions.xlsx",
-                       mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    long_format = st.checkbox("Format panjang (satu sheet per tabel, cocok untuk banyak pakar)", key="excel_long")
+    # built by a background job on request, then reused until the data or the options change
+    render_job_download("📊 Download Semua Data (Excel)", "xlsx", all_submissions_excel,
+                        lambda: (df_summary, all_rows, long_format), (feed.version, only_inconsistent, long_format),
+                        "all_submissions.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        key="all_data_excel")
 
     # =========================
     # Tambahan: Laporan Per-Pakar
@@ -748,18 +456,13 @@ elif page == "Admin Panel" and user["is_admin"]:
     st.write("Unduh laporan PDF / Excel untuk tiap pakar. Jika reportlab belum terpasang, PDF akan dinonaktifkan.")
 
     # list per-pakar dengan tombol download
-    pdf_bytes_list = []  # akan dipakai jika ingin zip semua
     for r in all_rows:
         sid = r.get("id")
         username = r.get("username")
         ts = r.get("timestamp")
         job_items = r.get("job_items", "")
-        res = r.get("result_json") if r.get("result_json") is not None else r.get("result")
-        if isinstance(res, str):
-            try:
-                res = json.loads(res)
-            except Exception:
-                res = {}
+        res = r.get("result_json") or {}
+        jkey = submission_key(r)
 
         st.markdown(f"**#{sid} — {username}**  _{ts}_  | Job Items: {job_items}")
         cols = st.columns([1,1,1,6])
@@ -769,36 +472,32 @@ elif page == "Admin Panel" and user["is_admin"]:
                                     "Bobot": res.get("main", {}).get("weights", [])})
             df_global = pd.DataFrame(res.get("global", [])).sort_values("GlobalWeight", ascending=False)
             meta_df = pd.DataFrame([{"User": username, "Job Items": job_items, "Timestamp": ts}])
-            excel_bio = to_excel_bytes({
+            xkey = render_key(jkey, "pakar", username, ts, job_items)
+            excel_bio = artifacts.get_or_create(xkey, "xlsx", lambda: to_excel_bytes({
                 "Meta": meta_df,
                 "Kriteria_Utama": df_main,
                 "Global_Weights": df_global
-            })
+            }))
             st.download_button(f"Excel #{sid}", data=excel_bio,
                                file_name=f"laporan_pakar_{username}_{sid}.xlsx",
                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                                key=f"exp_ex_{sid}")
 
         with cols[1]:
-            # PDF per pakar (jika tersedia)
-            submission_row = {
-                "id": sid,
-                "username": username,
-                "timestamp": ts,
-                "result": res,
-                "job_items": job_items
-            }
+            # PDF per pakar (jika tersedia): dibuat hanya saat diminta, atau oleh job ZIP di bawah;
+            # setelah itu dibaca dari cache
             if canvas is not None:
-                try:
-                    pdf_bio = generate_pdf_bytes(submission_row)
-                    # simpan bytes untuk zip agregasi
-                    pdf_bytes_list.append((f"laporan_pakar_{username}_{sid}.pdf", pdf_bio.getvalue()))
+                pdf_bio = artifacts.get(pdf_cache_key(expert_report_row(r), jkey), "pdf")
+                if pdf_bio is None and st.button(f"⚙️ Siapkan PDF #{sid}", key=f"exp_pdf_build_{sid}"):
+                    try:
+                        pdf_bio = cached_pdf_bytes(expert_report_row(r), jkey)
+                    except Exception as e:
+                        st.error(f"Gagal membuat PDF untuk {username} (#{sid}): {e}")
+                if pdf_bio is not None:
                     st.download_button(f"PDF #{sid}", data=pdf_bio,
                                        file_name=f"laporan_pakar_{username}_{sid}.pdf",
                                        mime="application/pdf",
                                        key=f"exp_pdf_{sid}")
-                except Exception as e:
-                    st.error(f"Gagal membuat PDF untuk {username} (#{sid}): {e}")
             else:
                 st.info("reportlab tidak terpasang — PDF tidak tersedia.")
 
@@ -810,20 +509,13 @@ elif page == "Admin Panel" and user["is_admin"]:
             except Exception:
                 st.write("Tidak ada data global.")
 
-    # tombol untuk mengunduh semua PDF pakar sebagai ZIP (jika ada)
-    if pdf_bytes_list:
-        zip_b = BytesIO()
-        with zipfile.ZipFile(zip_b, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-            for fname, data in pdf_bytes_list:
-                zf.writestr(fname, data)
-        zip_b.seek(0)
-        st.download_button("📦 Download Semua Laporan PDF (ZIP)", data=zip_b,
-                           file_name="laporan_semua_pakar_pdf.zip", mime="application/zip")
+    # tombol untuk mengunduh semua PDF pakar sebagai ZIP: dibuat paralel oleh background job
+    if canvas is not None:
+        render_job_download("📦 Download Semua Laporan PDF (ZIP)", "zip", zip_reports,
+                            lambda: (expert_zip_items(all_rows),), (PLATYPUS_VERSION, feed.version),
+                            "laporan_semua_pakar_pdf.zip", "application/zip", key="expert_pdf_zip")
     else:
-        if canvas is None:
-            st.info("PDF tidak tersedia karena 'reportlab' belum terpasang. Anda bisa mengunduh Excel masing-masing pakar.")
-        else:
-            st.info("Belum ada PDF yang berhasil dihasilkan untuk dikemas.")
+        st.info("PDF tidak tersedia karena 'reportlab' belum terpasang. Anda bisa mengunduh Excel masing-masing pakar.")
 
 # Laporan Final Gabungan Pakar (admin-only)
 elif page == "Laporan Final Gabungan Pakar" and user["is_admin"]:
@@ -834,90 +526,40 @@ elif page == "Laporan Final Gabungan Pakar" and user["is_admin"]:
         st.stop()
     st.success(f"Ditemukan {len(experts)} pakar (menggunakan submission terbaru tiap pakar).")
 
-    # 1) AIJ — aggregate pairwise matrices (main criteria)
-    all_main_matrices = []
-    expert_meta = []
-    for username, rjson, main_pairs_json, job_items in experts:
-        expert_meta.append({"username": username, "job_items": job_items})
-        mp = {}
-        try:
-            mp = main_pairs_json if isinstance(main_pairs_json, dict) else json.loads(main_pairs_json)
-        except Exception:
-            mp = {}
-        pair_values = {}
-        for k, v in (mp.items() if isinstance(mp, dict) else []):
-            try:
-                a, b = [s.strip() for s in k.split("|||")]
-                pair_values[(a, b)] = float(v)
-            except Exception:
-                continue
-        M = build_matrix_from_pairs(CRITERIA, pair_values)
-        all_main_matrices.append(M)
+    expert_meta = [{"username": username, "job_items": job_items} for username, _, _, job_items in experts]
+    # AIJ / AIP / combined local weights are maintained incrementally by the change feed
+    agg = feed.aggregate.result()
 
-    GM = np.exp(np.mean([np.log(m) for m in all_main_matrices], axis=0))
-    weights_aij = geometric_mean_weights(GM)
-    cons_aij = consistency_metrics(GM, weights_aij)
+    # 1) AIJ — aggregate pairwise matrices (main criteria)
+    weights_aij = agg["weights_aij"]
+    cons_aij = agg["cons_aij"]
     df_aij = pd.DataFrame({"Kriteria": CRITERIA, "Bobot_AI J": weights_aij})
     st.subheader("1) Bobot Gabungan Kriteria Utama (AIJ)")
     st.table(df_aij)
     st.write(f"CI = {cons_aij['CI']:.4f}, CR = {cons_aij['CR']:.4f}")
 
     # 2) AIP — aggregate individual priorities
-    all_w = []
-    for username, rjson, _, _ in experts:
-        try:
-            res = rjson if isinstance(rjson, dict) else json.loads(rjson)
-        except Exception:
-            res = {}
-        all_w.append(np.array(res.get("main", {}).get("weights", [])))
-    all_w = np.vstack(all_w)
-    w_aip = np.exp(np.mean(np.log(all_w), axis=0))
-    w_aip = w_aip / w_aip.sum()
+    w_aip = agg["weights_aip"]
     df_aip = pd.DataFrame({"Kriteria": CRITERIA, "Bobot_AIP": w_aip})
     st.subheader("2) Bobot Gabungan Kriteria Utama (AIP)")
     st.table(df_aip)
 
     # 3) Combine sub-criteria: geometric mean of local weights per group
-    local_combined = {}
-    global_rows = []
-    for group in CRITERIA:
-        collects = []
-        for username, rjson, _, _ in experts:
-            try:
-                res = rjson if isinstance(rjson, dict) else json.loads(rjson)
-            except Exception:
-                res = {}
-            lw = res.get("local", {}).get(group, {}).get("weights", [])
-            if lw:
-                collects.append(np.array(lw))
-        if not collects:
-            continue
-        collects = np.vstack(collects)
-        gm_loc = np.exp(np.mean(np.log(collects), axis=0))
-        gm_loc = gm_loc / gm_loc.sum()
-        local_combined[group] = gm_loc
-        main_idx = CRITERIA.index(group)
-        for sk, lw in zip(SUBCRITERIA[group], gm_loc):
-            gw = lw * weights_aij[main_idx]
-            global_rows.append({
-                "Kriteria": group,
-                "SubKriteria": sk,
-                "LocalWeight": float(lw),
-                "MainWeight": float(weights_aij[main_idx]),
-                "GlobalWeight": float(gw)
-            })
+    local_combined = agg["local_combined"]
+    global_rows = agg["global_rows"]
 
     df_global = pd.DataFrame(global_rows).sort_values("GlobalWeight", ascending=False)
     st.subheader("3) Bobot Global Gabungan Sub-Kriteria")
     st.table(df_global)
 
     try:
-        import altair as alt
-        chart = alt.Chart(df_global.head(20)).mark_bar().encode(
-            x='GlobalWeight:Q',
-            y=alt.Y('SubKriteria:N', sort='-x')
-        ).properties(height=500)
-        st.altair_chart(chart, use_container_width=True)
+        # specs are rebuilt only when the feed has seen a new submission
+        st.vega_lite_chart(global_top_spec(("aggregate", feed.version), global_rows), use_container_width=True)
+        st.subheader("Kontribusi Sub-Kriteria per Kriteria")
+        st.vega_lite_chart(group_contribution_spec(("aggregate", feed.version), global_rows), use_container_width=True)
+        st.subheader("Konsistensi (CR) per Pakar dan Blok Perbandingan")
+        st.vega_lite_chart(consistency_heatmap_spec(("aggregate", feed.version), [(username, res) for username, res, _, _ in experts]),
+                           use_container_width=True)
     except Exception:
         st.info("Altair tidak tersedia, grafik dilewati.")
 
@@ -960,6 +602,11 @@ elif page == "Laporan Final Gabungan Pakar" and user["is_admin"]:
     except RuntimeError as e:
         st.warning(str(e))
 
+    # one PDF with the group result and every expert's report (table of contents), built as a background job
+    render_job_download("📚 Download Buku Laporan Semua Pakar (PDF)", "pdf", book_pdf, lambda: (),
+                        (BOOK_VERSION, PLATYPUS_VERSION, feed.version), "buku_laporan_pakar.pdf", "application/pdf",
+                        key="report_book")
+
 # EOF
 
 
@@ -0,0 +1,278 @@
+# report_book.py
+# One PDF with the group result and every expert's report ("buku laporan").
+#
+# Layout: title, table of contents, the aggregate summary (AIJ / AIP main
+# weights, CR, top global weights), then one section per expert (latest
+# submission, ordered by username) with the same content as the per-expert PDF
+# of reports.generate_pdf_bytes. Sections are also PDF bookmarks.
+#
+# Submissions are streamed from storage: one pass computes the aggregate and
+# which submission is each expert's latest, then the sections are fetched a page
+# at a time and their flowables are generated only when platypus asks for the
+# next one, so memory holds one page of rows and a few flowables, not the book
+# (reportlab itself keeps the finished pages, a few KB each, until the file is written).
+# The table of contents needs the page numbers, so the document is laid out in
+# two passes (reportlab multiBuild); each pass streams the sections again.
+# Tables use the compiled template of reports.py.
+#
+# Streaming relies on how multiBuild treats its story (it takes story[:] once
+# per pass) and on its edit log (_multiBuildEdits); both are reportlab
+# internals. Every use is guarded, and when the book does not come out with
+# every section the streamed story produced, it is built again from a plain
+# story list (all flowables in memory, as reportlab expects by default).
+#
+# CLI: python report_book.py [--out FILE] [--chunk-size 200]
+
+import argparse
+import copy
+import itertools
+import sys
+import tempfile
+
+from aggregate import IncrementalAggregate
+from hierarchy import HIERARCHY
+from reports import TOP_GLOBAL, expert_flowables, make_table, template
+from spool import SPILL_BYTES
+from stream_export import iter_submissions
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import BaseDocTemplate, Frame, PageBreak, PageTemplate, Paragraph, Spacer
+    from reportlab.platypus.tableofcontents import TableOfContents
+except ImportError:
+    TableOfContents = None
+    BaseDocTemplate = Paragraph = object
+
+# bump whenever the book layout changes (reports.PLATYPUS_VERSION covers the expert sections)
+BOOK_VERSION = 1
+DEFAULT_CHUNK_SIZE = 200
+LOOKAHEAD = 16  # flowables kept ahead of the layout (keepWithNext looks forward)
+MARGIN = 36
+AGGREGATE_HEADING = "Hasil Gabungan Pakar"
+
+
+class _SectionHeading(Paragraph):
+    """Heading that becomes a table of contents entry and a PDF bookmark."""
+
+    def __init__(self, text, style, key, level=0):
+        super().__init__(text, style)
+        self.toc_entry = (level, text, key)
+
+
+class _UnsupportedStory(Exception):
+    pass
+
+
+class _Book(BaseDocTemplate):
+    def __init__(self, fileobj, streamed=True):
+        super().__init__(fileobj, pagesize=A4, leftMargin=MARGIN, rightMargin=MARGIN,
+                         topMargin=MARGIN, bottomMargin=MARGIN, title="Buku Laporan AHP")
+        frame = Frame(self.leftMargin, self.bottomMargin, self.width, self.height, id="body")
+        self.addPageTemplates([PageTemplate(id="page", frames=[frame], onPage=_page_number)])
+        self.streamed = streamed
+        self.sections = 0  # section headings laid out in the current pass
+
+    def beforeDocument(self):
+        self.sections = 0
+
+    def _forget_edits(self):
+        # multiBuild records attribute changes platypus makes to flowables (keepWithNext, _postponed)
+        # to undo them before the next pass. Every streamed pass lays out new flowables, so the records
+        # would only keep all flowables of the pass alive; those of the shared table of contents are kept.
+        # A plain story reuses its flowables and needs every record.
+        log = getattr(getattr(self, "_multiBuildEdits", None), "__self__", None)
+        indexing = getattr(self, "_indexingFlowables", None)
+        if self.streamed and isinstance(log, list) and indexing is not None:
+            log[:] = [e for e in log if len(e) > 1 and e[1] in indexing]
+
+    def afterFlowable(self, flowable):
+        entry = getattr(flowable, "toc_entry", None)
+        if entry is not None:
+            level, text, key = entry
+            self.sections += 1
+            self.canv.bookmarkPage(key)
+            self.canv.addOutlineEntry(text, key, level)
+            self.notify("TOCEntry", (level, text, self.page, key))
+            self._forget_edits()
+
+
+def _page_number(canv, doc):
+    canv.setFont("Helvetica", 8)
+    canv.drawRightString(A4[0] - MARGIN, MARGIN / 2, str(doc.page))
+
+
+class _LazyStory(list):
+    """Story list filled from an iterator as platypus consumes it."""
+
+    def __init__(self, flowables):
+        super().__init__()
+        self._source = iter(flowables)
+
+    def __len__(self):
+        # platypus checks len(story) before taking the next flowable
+        missing = LOOKAHEAD - list.__len__(self)
+        if missing > 0:
+            self.extend(itertools.islice(self._source, missing))
+        return list.__len__(self)
+
+
+class _Story:
+    """Story for multiBuild: scanned once for the TOC, copied (story[:]) once per pass.
+
+    Every copy is a new _LazyStory over a fresh stream of flowables from
+    flowables(); only the table of contents is shared between passes.
+    """
+
+    def __init__(self, toc, flowables):
+        self.toc = toc
+        self.flowables = flowables
+
+    def __iter__(self):
+        return iter([self.toc])
+
+    def __getitem__(self, index):
+        if index != slice(None):
+            raise _UnsupportedStory(f"story[{index!r}]")
+        return _LazyStory(self.flowables())
+
+
+def _styles():
+    tpl = template()
+    return {
+        "section": ParagraphStyle("BookSection", parent=tpl.headings["main"].style, fontSize=15, leading=19,
+                                  spaceAfter=8, keepWithNext=1),
+        "toc": [ParagraphStyle("TOC0", parent=tpl.normal, fontSize=10, leading=13, leftIndent=10, firstLineIndent=-10)],
+    }
+
+
+def scan(storage, chunk_size=DEFAULT_CHUNK_SIZE, hierarchy=HIERARCHY):
+    """One pass over the submissions: (aggregate result or None, {user_id: latest submission id})."""
+    agg = IncrementalAggregate(hierarchy)
+    for row in iter_submissions(storage, chunk_size):
+        agg.add(row["user_id"], row)
+    return agg.result(), {user_id: sid for user_id, (sid, _) in agg.members.items()}
+
+
+def iter_expert_rows(storage, experts, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Report rows of [(user row, submission id)], in that order, chunk_size submissions per request."""
+    for start in range(0, len(experts), chunk_size):
+        page = experts[start:start + chunk_size]
+        rows = {r["id"]: r for r in storage.get_submissions([sid for _, sid in page])}
+        for u, sid in page:
+            r = rows.get(sid)
+            if r is not None:
+                yield {"id": r["id"], "username": u["username"], "timestamp": str(r.get("timestamp") or ""),
+                       "result": r.get("result_json") or {}, "job_items": u.get("job_items", "")}
+
+
+def _expert_heading(username, submission_id):
+    return f"Pakar: {username}", f"pakar-{submission_id}"
+
+
+def aggregate_flowables(result, styles, hierarchy=HIERARCHY):
+    tpl = template()
+    elements = [_SectionHeading(AGGREGATE_HEADING, styles["section"], "agregat"),
+                Paragraph(f"Jumlah pakar: {result['n_experts']} (submission terbaru tiap pakar).", tpl.normal),
+                Spacer(1, 12),
+                copy.copy(tpl.headings["main"])]
+    aip = result["weights_aip"]
+    data = [["No", "Kriteria", "AIJ", "AIP"]]
+    for i, g in enumerate(hierarchy.criteria):
+        data.append([str(i + 1), g, f"{result['weights_aij'][i]:.4f}", f"{aip[i]:.4f}" if aip is not None else "-"])
+    elements.append(make_table(data, [30, 310, 60, 60], plain_cols=(0, 2, 3)))
+    cons = result["cons_aij"]
+    elements.append(Paragraph(f"AIJ — CI: {cons['CI']:.4f} | CR: {cons['CR']:.4f}", tpl.normal))
+    elements.append(Spacer(1, 12))
+
+    elements.append(copy.copy(tpl.headings["global"]))
+    data = [["No", "Sub-Kriteria", "Kriteria", "Bobot Global"]]
+    top = sorted(result["global_rows"], key=lambda r: r["GlobalWeight"], reverse=True)[:TOP_GLOBAL]
+    for i, r in enumerate(top, start=1):
+        data.append([str(i), r["SubKriteria"], r["Kriteria"], f"{r['GlobalWeight']:.6f}"])
+    elements.append(make_table(data, [30, 220, 150, 80], plain_cols=(0, 3)))
+    return elements
+
+
+def _expert_section(row, styles):
+    text, key = _expert_heading(row["username"], row["id"])
+    heading = _SectionHeading(text, styles["section"], key)
+    return [PageBreak(), heading] + expert_flowables(row)
+
+
+def write_book(storage, fileobj, progress=None, chunk_size=DEFAULT_CHUNK_SIZE, hierarchy=HIERARCHY):
+    """Write the book PDF to a binary file object; returns the number of expert sections.
+
+    progress(fraction, message) is called as the sections are laid out.
+    """
+    if TableOfContents is None:
+        raise RuntimeError("reportlab not installed. Install with `pip install reportlab` to enable PDF export.")
+    result, latest = scan(storage, chunk_size, hierarchy)
+    if result is None:
+        raise ValueError("Belum ada submission dari pakar.")
+    styles = _styles()
+    experts = [(u, latest[u["id"]]) for u in storage.list_users() if u["id"] in latest]  # username order
+    n = len(experts)
+    passes = [0]
+    headings = [0]  # section headings produced by the last pass
+
+    toc = TableOfContents()
+    toc.levelStyles = styles["toc"]
+    # the entries are known up front: laid out with placeholder page numbers, the table of contents
+    # already has its final size in the first pass, and the second pass only fills in the numbers
+    toc.addEntries([(0, AGGREGATE_HEADING, 0, "agregat")] +
+                   [(0, text, 0, key) for text, key in (_expert_heading(u["username"], sid) for u, sid in experts)])
+
+    def flowables():
+        passes[0] += 1
+        headings[0] = 1
+        tpl = template()
+        yield from [copy.copy(tpl.title), Spacer(1, 12), Paragraph("<b>Daftar Isi</b>", tpl.headings["main"].style),
+                    toc, PageBreak()]
+        yield from aggregate_flowables(result, styles, hierarchy)
+        for i, row in enumerate(iter_expert_rows(storage, experts, chunk_size), start=1):
+            headings[0] += 1
+            yield from _expert_section(row, styles)
+            if progress is not None:
+                # two passes expected (the table of contents needs the page numbers of the first)
+                progress(min((passes[0] - 1 + i / n) / 2, 0.99), f"Lintasan {passes[0]}: pakar {i}/{n}")
+
+    book = _Book(fileobj)
+    try:
+        book.multiBuild(_Story(toc, flowables))
+        complete = passes[0] > 0 and book.sections == headings[0]
+    except _UnsupportedStory:
+        complete = False
+    if not complete:
+        # this reportlab reads the story differently: build from a plain list instead
+        fileobj.seek(0)
+        fileobj.truncate()
+        passes[0] = 0
+        _Book(fileobj, streamed=False).multiBuild(list(flowables()))
+    return n
+
+
+def book_pdf(job):
+    """Background-job task (jobs.py): the book as a spooled file, read from the configured storage."""
+    from storage import create_storage
+
+    f = tempfile.SpooledTemporaryFile(max_size=SPILL_BYTES)
+    write_book(create_storage(), f, progress=job.progress)
+    f.seek(0)
+    return f
+
+
+def main():
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="PDF book: group result and every expert's report, with a table of contents.")
+    parser.add_argument("--out", default="buku_laporan_pakar.pdf")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+    with open(args.out, "wb") as f:
+        n = write_book(create_storage(), f, chunk_size=args.chunk_size)
+    print(f"Wrote {n} expert sections to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+# reports.py
+# PDF reports and the batch job that renders many of them in parallel.
+#
+# generate_pdf_bytes() is the per-expert report of rafka.py (platypus tables,
+# PLATYPUS_VERSION); generate_canvas_pdf_bytes() the one-page summary of
+# app_ahp / hadiahp (CANVAS_VERSION). The platypus template (styles, table
+# style, headings, header cells and hierarchy labels) is compiled once per
+# process by template(); a report only adds its numbers and header fields.
+# Number columns are drawn as plain table text.
+#
+# render_reports() sends each report to a process pool as a small payload
+# (header fields, main weights and CR, top-20 global rows; see report_payload)
+# and yields the PDF bytes as workers finish, so callers can write them into a
+# ZIP and update a progress bar while the rest are still rendering. Small
+# batches are rendered in-process, where starting workers would cost more.
+
+import copy
+import functools
+import os
+import threading
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from hierarchy import HIERARCHY
+from procpool import SpawnPool
+from spool import zip_stream
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.pdfgen import canvas
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+except ImportError:
+    SimpleDocTemplate = None
+    canvas = None
+    Paragraph = object
+
+# one layout version per generator; bump it whenever that layout changes and
+# cached PDFs of the old layout stop matching. Cache keys also name the
+# generator and its parameters: the apps share one cache directory.
+PLATYPUS_VERSION = 2  # generate_pdf_bytes / expert_flowables (also the report book's sections)
+CANVAS_VERSION = 1  # generate_canvas_pdf_bytes
+TOP_GLOBAL = 20
+MAIN_HEADER = ["No", "Kriteria", "Bobot"]
+GLOBAL_HEADER = ["No", "Sub-Kriteria", "Kriteria", "Bobot Global"]
+CELL_PADDING = 6
+POOL_MIN_REPORTS = 4  # below this, rendering in-process is faster than starting workers
+MAX_WORKERS = int(os.getenv("AHP_REPORT_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+
+
+class _LabelParagraph(Paragraph):
+    """Paragraph of a fixed label; keeps its line layout while it is re-wrapped at the same width."""
+
+    def wrap(self, availWidth, availHeight):
+        # line breaking depends only on the width
+        if getattr(self, "_wrapped_width", None) != availWidth:
+            self._wrapped_size = Paragraph.wrap(self, availWidth, availHeight)
+            self._wrapped_width = availWidth
+        return self._wrapped_size
+
+
+class _Template:
+    """Styles, table style and static flowables, compiled once per process (see template())."""
+
+    def __init__(self, hierarchy):
+        styles = getSampleStyleSheet()
+        self.normal = styles["Normal"]
+        self.table_style = TableStyle([
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+            ("FONT", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("LEFTPADDING", (0, 0), (-1, -1), CELL_PADDING),
+            ("RIGHTPADDING", (0, 0), (-1, -1), CELL_PADDING),
+            ("TOPPADDING", (0, 0), (-1, -1), 4),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
+        ])
+        self.title = Paragraph("<b>Laporan Hasil AHP – Penataan Ruang Publik</b>", styles["Title"])
+        self.headings = {name: Paragraph(text, styles["Heading2"]) for name, text in (
+            ("main", "<b>1. Bobot Kriteria Utama</b>"),
+            ("global", f"<b>2. Bobot Global Sub-Kriteria (Top {TOP_GLOBAL})</b>"),
+            ("cons", "<b>3. Ringkasan Konsistensi</b>"),
+        )}
+        # table header cells and hierarchy labels, parsed once and laid out once per column width
+        self.static_text = set(MAIN_HEADER + GLOBAL_HEADER) | set(hierarchy.criteria)
+        self.static_text.update(sk for g in hierarchy.criteria for sk in hierarchy.subcriteria[g])
+        self._labels = {}
+        self._lock = threading.Lock()
+
+    def label(self, text, width):
+        """Copy of the compiled paragraph of a static label for a column of the given width."""
+        key = (text, width)
+        para = self._labels.get(key)
+        if para is None:
+            para = _LabelParagraph(text, self.normal)
+            para.wrap(width - 2 * CELL_PADDING, 0)  # the width the table gives the cell
+            with self._lock:
+                para = self._labels.setdefault(key, para)
+        # a copy per report: drawing sets per-canvas state on the flowable; the layout is shared
+        return copy.copy(para)
+
+    def cell(self, value, width):
+        if not isinstance(value, str):
+            return value
+        if value in self.static_text:
+            return self.label(value, width)
+        return Paragraph(value, self.normal)
+
+
+@functools.lru_cache(maxsize=None)
+def template(hierarchy=HIERARCHY):
+    return _Template(hierarchy)
+
+
+def make_table(data, col_widths, plain_cols=()):
+    """
+    Membuat tabel ReportLab dengan text wrapping (tidak terpotong).
+    Kolom di plain_cols (angka) ditulis apa adanya tanpa Paragraph, kecuali baris judul.
+    """
+    tpl = template()
+    wrapped_data = []
+    for r, row in enumerate(data):
+        wrapped_data.append([cell if r and c in plain_cols else tpl.cell(cell, col_widths[c])
+                             for c, cell in enumerate(row)])
+
+    table = Table(wrapped_data, colWidths=col_widths, repeatRows=1)
+    table.setStyle(tpl.table_style)
+    return table
+
+
+def _top_global(rows, top=TOP_GLOBAL):
+    return sorted(rows, key=lambda r: r["GlobalWeight"], reverse=True)[:top]
+
+
+def expert_flowables(submission_row):
+    """Flowables of one expert's report after the title: header fields, main weights, top global weights, CR."""
+    tpl = template()
+    meta_text = (
+        f"<b>User / Pakar:</b> {submission_row.get('username','')}<br/>"
+        f"<b>Job Items:</b> {submission_row.get('job_items','')}<br/>"
+        f"<b>Waktu:</b> {submission_row.get('timestamp','')}"
+    )
+    elements = [Paragraph(meta_text, tpl.normal), Spacer(1, 12)]
+
+    # 1. Kriteria Utama
+    elements.append(copy.copy(tpl.headings["main"]))
+
+    main = submission_row["result"]["main"]
+    table_data = [MAIN_HEADER]
+    for i, (k, w) in enumerate(zip(main["keys"], main["weights"]), start=1):
+        table_data.append([str(i), k, f"{w:.4f}"])
+
+    elements.append(make_table(table_data, [30, 350, 80], plain_cols=(0, 2)))
+    elements.append(Spacer(1, 12))
+
+    # 2. Global Sub-Kriteria
+    elements.append(copy.copy(tpl.headings["global"]))
+
+    table_data = [GLOBAL_HEADER]
+    for i, row in enumerate(_top_global(submission_row["result"]["global"]), start=1):
+        table_data.append([
+            str(i),
+            row["SubKriteria"],
+            row["Kriteria"],
+            f"{row['GlobalWeight']:.6f}"
+        ])
+
+    elements.append(make_table(table_data, [30, 220, 150, 80], plain_cols=(0, 3)))
+    elements.append(Spacer(1, 12))
+
+    # 3. Konsistensi
+    cons = main["cons"]
+    elements.append(copy.copy(tpl.headings["cons"]))
+    elements.append(
+        Paragraph(
+            f"Kriteria Utama — CI: {cons.get('CI',0):.4f} | CR: {cons.get('CR',0):.4f}",
+            tpl.normal
+        )
+    )
+    return elements
+
+
+def generate_pdf_bytes(submission_row):
+    if SimpleDocTemplate is None:
+        raise RuntimeError("reportlab not installed. Install with `pip install reportlab` to enable PDF export.")
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=36,
+        leftMargin=36,
+        topMargin=36,
+        bottomMargin=36
+    )
+
+    elements = [copy.copy(template().title), Spacer(1, 12)]
+    elements.extend(expert_flowables(submission_row))
+
+    doc.build(elements)
+    buffer.seek(0)
+    return buffer
+
+
+def generate_canvas_pdf_bytes(submission_row, top=TOP_GLOBAL):
+    """One-page summary drawn directly on the canvas (app_ahp / hadiahp reports)."""
+    if canvas is None:
+        raise RuntimeError("reportlab not installed. Install with `pip install reportlab` to enable PDF export.")
+    bio = BytesIO()
+    c = canvas.Canvas(bio, pagesize=A4)
+    width, height = A4
+    margin = 18 * mm
+    x = margin
+    y = height - margin
+
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(x, y, "Laporan Hasil AHP — Penataan Ruang Publik")
+    y -= 8 * mm
+    c.setFont("Helvetica", 9)
+
+    # username + job_items + timestamp
+    username = submission_row.get("username", "")
+    job_items = submission_row.get("job_items", "")
+    if isinstance(job_items, list):
+        job_items = ", ".join(job_items)
+    c.drawString(x, y, f"User / Group: {username}")
+    y -= 5 * mm
+    if job_items:
+        c.drawString(x, y, f"Job Items: {job_items}")
+        y -= 6 * mm
+    c.drawString(x, y, f"Waktu: {submission_row.get('timestamp','')}")
+    y -= 8 * mm
+
+    res = submission_row.get("result", {}) or {}
+
+    main = res.get("main", {})
+    keys = main.get("keys", [])
+    weights = main.get("weights", [])
+    cons = main.get("cons", {})
+
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(x, y, "Bobot Kriteria Utama:")
+    y -= 6 * mm
+    c.setFont("Helvetica", 9)
+    for k, w in zip(keys, weights):
+        if y < margin + 30 * mm:
+            c.showPage()
+            y = height - margin
+        try:
+            c.drawString(x + 2 * mm, y, f"{k} — {w:.4f}")
+        except Exception:
+            c.drawString(x + 2 * mm, y, f"{k} — {w}")
+        y -= 5 * mm
+
+    y -= 4 * mm
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(x, y, "Bobot Global (Top):")
+    y -= 6 * mm
+    c.setFont("Helvetica", 9)
+
+    for row in _top_global(res.get("global", []), top):
+        if y < margin + 20 * mm:
+            c.showPage()
+            y = height - margin
+        text = f"{row.get('SubKriteria','')} ({row.get('Kriteria','')}) — {row.get('GlobalWeight',0):.6f}"
+        c.drawString(x + 2 * mm, y, text if len(text) < 120 else text[:117] + "...")
+        y -= 5 * mm
+
+    y -= 6 * mm
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(x, y, "Ringkasan Konsistensi (CI / CR):")
+    y -= 6 * mm
+    c.setFont("Helvetica", 9)
+    c.drawString(x + 2 * mm, y, f"Kriteria Utama — CI: {cons.get('CI',0):.4f} , CR: {cons.get('CR',0):.4f}")
+    y -= 6 * mm
+
+    local = res.get("local", {})
+    for grp, info in local.items():
+        grp_cons = info.get("cons", {})
+        if grp_cons.get("CR", 0) > 0.1:
+            if y < margin + 15 * mm:
+                c.showPage()
+                y = height - margin
+            c.drawString(x + 2 * mm, y, f"Perhatian: CR>0.1 pada {grp} (CR={grp_cons.get('CR'):.3f})")
+            y -= 5 * mm
+
+    c.showPage()
+    c.save()
+    bio.seek(0)
+    return bio
+
+
+def report_payload(submission_row):
+    """The part of a submission row generate_pdf_bytes prints, as plain picklable values."""
+    res = submission_row.get("result") or {}
+    main = res.get("main", {}) or {}
+    cons = main.get("cons", {}) or {}
+    return {
+        "id": submission_row.get("id"),
+        "username": submission_row.get("username", ""),
+        "job_items": submission_row.get("job_items", ""),
+        "timestamp": str(submission_row.get("timestamp", "")),
+        "result": {
+            "main": {"keys": list(main.get("keys", [])),
+                     "weights": [float(w) for w in main.get("weights", [])],
+                     "cons": {k: float(cons.get(k, 0)) for k in ("CI", "CR")}},
+            "global": [{"SubKriteria": r["SubKriteria"], "Kriteria": r["Kriteria"], "GlobalWeight": float(r["GlobalWeight"])}
+                       for r in _top_global(res.get("global", []))]
+        }
+    }
+
+
+def _render(payload):
+    return generate_pdf_bytes(payload).getvalue()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    # one pool per process, started on first use (procpool.SpawnPool: safe to start from a page)
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SpawnPool(MAX_WORKERS)
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def render_reports(payloads):
+    """Yield (key, pdf bytes) for {key: report_payload} as the reports finish.
+
+    A report that fails yields its exception instead of bytes. If the pool
+    breaks (a worker died), the remaining reports are rendered in-process.
+    """
+    pending = dict(payloads)
+    if len(pending) >= POOL_MIN_REPORTS and MAX_WORKERS > 1:
+        try:
+            futures = {_get_pool().submit(_render, p): key for key, p in pending.items()}
+            for fut in as_completed(futures):
+                key = futures[fut]
+                try:
+                    data = fut.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    data = e
+                pending.pop(key)
+                yield key, data
+        except BrokenProcessPool:
+            _reset_pool()
+    for key, payload in list(pending.items()):
+        try:
+            data = _render(payload)
+        except Exception as e:
+            data = e
+        pending.pop(key)
+        yield key, data
+
+
+ERRORS_FILE = "GAGAL.txt"
+
+
+def zip_reports(job, items):
+    """Background-job task (jobs.py): ZIP of (file name, cache key, report payload) items.
+
+    PDFs already in the artifact cache are reused; the rest are rendered by
+    render_reports() and cached as they finish. Reports that fail are listed
+    with their error in ERRORS_FILE inside the ZIP and reported as a job warning.
+    """
+    todo, failed, n = {}, [], len(items)
+
+    def files():
+        done = 0
+        for i, (name, key, payload) in enumerate(items):
+            data = job.cache.get(key, "pdf")
+            if data is None:
+                todo[i] = payload
+                continue
+            done += 1
+            job.progress(done / n, f"PDF {done}/{n}")
+            yield name, data
+        for i, data in render_reports(todo):
+            done += 1
+            job.progress(done / n, f"PDF {done}/{n}")
+            name, key, _ = items[i]
+            if isinstance(data, Exception):
+                failed.append(f"{name}: {type(data).__name__}: {data}")
+                continue
+            job.cache.put(key, "pdf", data)
+            yield name, data
+        if failed and len(failed) == n:
+            raise RuntimeError(f"Semua {n} PDF gagal dibuat; {failed[0]}")
+        if failed:
+            yield ERRORS_FILE, "\n".join(sorted(failed)) + "\n"
+            job.warn(f"{len(failed)} dari {n} PDF gagal dibuat, lihat {ERRORS_FILE} di dalam ZIP.")
+
+    return zip_stream(files())
@@ -0,0 +1,223 @@
+# resilience.py
+# Resilient wrapper around a Storage backend.
+#
+# - single-flight: identical reads issued while one is in flight share its result
+# - retry: transient errors are retried with jittered exponential backoff (reads only;
+#   writes are not idempotent and are attempted once)
+# - circuit breaker: after repeated transient failures the backend is skipped for a
+#   while and reads listed in STALE_READS are served from the last good value when
+#   one is available (never auth or draft reads: a stale password hash or a deleted
+#   draft must not come back). Any answer from the backend, an error response
+#   included, closes it again.
+#
+# Results are shared, not copied: coalesced callers get the leader's result, and
+# the last good value of a read is the object last returned. Callers treat rows as
+# read-only (build a new dict to change one). A stale value is deep-copied once
+# each time it is served, which only happens while the backend is down.
+# Every step is counted; metrics() returns a snapshot for the Admin Panel.
+
+import copy
+import random
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+READ_PREFIXES = ("get_", "list_")
+
+# reads whose last good value may be served while the backend is down
+STALE_READS = frozenset({
+    "list_users", "get_submission", "get_submissions", "get_submissions_by_user", "get_latest_submission_by_user",
+    "get_latest_submissions_per_user", "list_submissions", "list_submission_summaries", "get_aggregate",
+})
+
+# exception class names of transient transport errors (httpx / httpcore / sqlite)
+RETRYABLE_NAMES = {
+    "ConnectError", "ConnectTimeout", "ReadTimeout", "WriteTimeout", "PoolTimeout", "ReadError",
+    "WriteError", "RemoteProtocolError", "NetworkError", "TimeoutException", "FanOutTimeout",
+}
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def is_retryable(exc):
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    if type(exc).__name__ in RETRYABLE_NAMES:
+        return True
+    if type(exc).__name__ == "OperationalError" and "locked" in str(exc):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    try:
+        status = int(status)
+    except (TypeError, ValueError):
+        return False
+    return status == 429 or 500 <= status < 600
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # half-open: let this one trial call through, keep rejecting the others
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    @property
+    def closed(self):
+        return self.opened_at is None
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self):
+        """Record a failure; returns True when this failure opened the circuit."""
+        with self.lock:
+            self.failures += 1
+            if self.opened_at is not None:
+                # failed trial call in half-open state: stay open for another period
+                self.opened_at = time.monotonic()
+                return False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+
+class ResilientStorage:
+    """Wraps any Storage; method names starting with get_/list_ are treated as reads."""
+
+    def __init__(self, inner, retries=3, base_delay=0.2, max_delay=3.0,
+                 failure_threshold=5, reset_timeout=30.0, stale_entries=256):
+        self.inner = inner
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.stale_entries = stale_entries
+        self._flights = {}
+        self._last_good = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = defaultdict(int)
+        self._latency = defaultdict(float)
+
+    def __getattr__(self, name):
+        attr = getattr(self.inner, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+        if name.startswith(READ_PREFIXES):
+            return lambda *args, **kwargs: self._read(name, attr, args, kwargs)
+        return lambda *args, **kwargs: self._write(name, attr, args, kwargs)
+
+    # --- metrics ---
+    def _count(self, key, n=1):
+        with self._lock:
+            self._metrics[key] += n
+
+    def metrics(self):
+        with self._lock:
+            out = dict(self._metrics)
+            for name, total in self._latency.items():
+                calls = out.get(f"calls.{name}", 0)
+                out[f"avg_ms.{name}"] = round(1000 * total / calls, 2) if calls else 0.0
+        out["breaker_state"] = self.breaker.state
+        return out
+
+    # --- calls ---
+    def _call(self, name, fn, args, kwargs, retry):
+        if not self.breaker.allow():
+            self._count("breaker_rejected")
+            raise CircuitOpenError(f"backend unavailable (circuit open), {name} skipped")
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self._count("errors")
+                transient = is_retryable(e)
+                if not transient:
+                    self.breaker.success()  # the backend answered, with an error of the request itself
+                elif self.breaker.failure():
+                    self._count("breaker_opened")
+                if not (retry and transient and attempt < self.retries and self.breaker.closed):
+                    raise
+                attempt += 1
+                self._count("retries")
+                # full jitter: sleep U(0, min(max_delay, base * 2^attempt))
+                time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+                continue
+            with self._lock:
+                self._metrics[f"calls.{name}"] += 1
+                self._latency[name] += time.monotonic() - start
+            self.breaker.success()
+            return result
+
+    def _write(self, name, fn, args, kwargs):
+        return self._call(name, fn, args, kwargs, retry=False)
+
+    def _read(self, name, fn, args, kwargs):
+        key = (name, repr(args), repr(sorted(kwargs.items())))
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            self._count("coalesced")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = self._call(name, fn, args, kwargs, retry=True)
+            if name in STALE_READS:
+                with self._lock:
+                    self._last_good[key] = flight.result
+                    self._last_good.move_to_end(key)
+                    while len(self._last_good) > self.stale_entries:
+                        self._last_good.popitem(last=False)
+            return flight.result
+        except Exception as e:
+            with self._lock:
+                has_stale = key in self._last_good
+                stale = self._last_good.get(key)
+            if has_stale and (isinstance(e, CircuitOpenError) or is_retryable(e)):
+                # degraded backend: serve the last good value instead of failing the page
+                self._count("stale_served")
+                flight.result = copy.deepcopy(stale)
+                return flight.result
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
@@ -0,0 +1,56 @@
+# spool.py
+# Large downloads built in spooled temporary files.
+#
+# A SpooledTemporaryFile stays in memory while small and moves to disk once it
+# grows past SPILL_BYTES, so bundling many reports never holds the whole
+# archive (or a second copy of it) in RAM. SpooledStream exposes the finished
+# file as an io.RawIOBase, which st.download_button reads directly.
+
+import io
+import tempfile
+import zipfile
+
+SPILL_BYTES = 8 * 1024 * 1024
+
+
+class SpooledStream(io.RawIOBase):
+    """Read-only stream over a finished SpooledTemporaryFile (works on Python 3.10, which lacks readinto)."""
+
+    def __init__(self, spooled):
+        self._file = spooled
+        self._file.seek(0)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        return self._file.seek(pos, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def readinto(self, buffer):
+        data = self._file.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+
+def zip_stream(files, max_size=SPILL_BYTES, compression=zipfile.ZIP_DEFLATED):
+    """ZIP of (name, bytes) pairs, each written as soon as it is produced; returns a SpooledStream."""
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_size)
+    try:
+        with zipfile.ZipFile(spooled, mode="w", compression=compression) as zf:
+            for name, data in files:
+                zf.writestr(name, data)
+    except BaseException:
+        spooled.close()
+        raise
+    return SpooledStream(spooled)
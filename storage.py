@@ -0,0 +1,667 @@
+# storage.py
+# Storage backends for the AHP apps: users, submissions, aggregates and questionnaire drafts.
+#
+# Backend is selected with AHP_STORAGE ("supabase" or "sqlite") in Streamlit
+# secrets or the environment. The SQLite backend keeps everything in one local
+# file (AHP_SQLITE_PATH) so workshops can run offline on a laptop.
+
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+import streamlit as st
+
+import json_codec
+from fanout import DEFAULT_MAX_WORKERS, DEFAULT_TIMEOUT, fan_out_map
+from judgment_codec import decode_submission, encode_submission
+from resilience import ResilientStorage
+from summaries import SUMMARY_COLUMNS, row_summary, with_summary
+
+# JSON payload columns of the submissions table
+JSON_COLUMNS = ("main_pairs", "sub_pairs", "result_json", "cr_groups", "main_weights")
+# Columns needed for the admin summary (no result_json)
+SUMMARY_SELECT = "id, user_id, timestamp, " + ", ".join(SUMMARY_COLUMNS)
+
+
+def _config(name, default=None):
+    """Read a setting from st.secrets, falling back to the environment."""
+    try:
+        if name in st.secrets:
+            return st.secrets[name]
+    except Exception:
+        pass
+    return os.getenv(name, default)
+
+
+class Storage(ABC):
+    """Data access interface shared by all app entry points.
+
+    Rows are returned as plain dicts shaped like the Supabase tables, so page
+    code does not care which backend is active. Submission rows go through
+    judgment_codec.py: written as native JSON (compact format unless
+    compact=False) and returned as decoded Submission objects.
+
+    Every method is abstract, so a backend that misses one fails when it is
+    constructed instead of in the middle of a request.
+    """
+
+    compact = True
+
+    def _outgoing(self, payload):
+        return encode_submission(payload, compact=self.compact)
+
+    # --- users ---
+    @abstractmethod
+    def get_user(self, user_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_user_by_username(self, username):
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_users(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def insert_user(self, payload):
+        raise NotImplementedError
+
+    @abstractmethod
+    def insert_users(self, payloads):
+        """Insert many users in one request; returns the inserted rows."""
+        raise NotImplementedError
+
+    # --- submissions ---
+    @abstractmethod
+    def insert_submission(self, payload):
+        raise NotImplementedError
+
+    @abstractmethod
+    def insert_submissions(self, payloads):
+        """Insert many submissions in one request; returns the inserted rows."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_submission(self, submission_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_submissions_by_user(self, user_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_latest_submission_by_user(self, user_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_latest_submissions_per_user(self):
+        """Return [(user_row, submission_row), ...] ordered by username."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_submissions(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_submissions_after(self, after_id, limit=200):
+        """One page of submissions with id > after_id, ascending."""
+        raise NotImplementedError
+
+    def list_submissions_since(self, last_id, limit=500):
+        """Submissions with id > last_id in ascending id order (change feed), fetched limit rows per request."""
+        out = []
+        while True:
+            page = self.list_submissions_after(last_id, limit)
+            out.extend(page)
+            if len(page) < limit:
+                return out
+            last_id = page[-1]["id"]
+
+    @abstractmethod
+    def get_submission_count(self, max_id=None):
+        """Number of submissions (with id <= max_id when given)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_submissions(self, submission_ids):
+        """Submissions with the given ids, in one request."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_submission(self, submission_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_submissions(self, submission_ids):
+        """Delete several submissions in one request; returns the deleted rows."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def upsert_submissions(self, rows):
+        """Overwrite complete submission rows (matched by id) in one request."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_submissions(self, updates):
+        """Apply {submission_id: {column: value}} updates."""
+        raise NotImplementedError
+
+    # --- summary columns (see summaries.py) ---
+    @abstractmethod
+    def list_submission_summaries(self, min_cr=None):
+        """Summary columns of all submissions, optionally only rows with cr_max > min_cr.
+
+        Rows not backfilled yet (cr_max NULL) are always included; see summaries.row_summary.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_submissions_missing_summary(self, limit=200):
+        raise NotImplementedError
+
+    # --- aggregates ---
+    @abstractmethod
+    def save_aggregate(self, key, payload):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_aggregate(self, key):
+        raise NotImplementedError
+
+    # --- questionnaire drafts (one per user, see drafts.py) ---
+    @abstractmethod
+    def save_draft(self, user_id, payload):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_draft(self, user_id):
+        """The user's draft payload, or None."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_draft(self, user_id):
+        raise NotImplementedError
+
+
+# ------------------------------
+# Supabase backend
+# ------------------------------
+# PostgREST "column not in schema cache" / Postgres undefined_column
+MISSING_COLUMN_CODES = ("PGRST204", "42703")
+
+
+def _summary_column_error(exc):
+    """True for the error of a database without the summary columns (migrations/001)."""
+    code = getattr(exc, "code", None)
+    if code is None and exc.args and isinstance(exc.args[0], dict):
+        code = exc.args[0].get("code")
+    return str(code) in MISSING_COLUMN_CODES
+
+
+class SupabaseStorage(Storage):
+    def __init__(self, url=None, key=None, client=None, max_workers=None, timeout=None, compact=True):
+        # bounded concurrency / per-request timeout for fanned-out lookups
+        self.max_workers = int(max_workers or _config("AHP_FANOUT_WORKERS", DEFAULT_MAX_WORKERS))
+        self.timeout = float(timeout or _config("AHP_QUERY_TIMEOUT", DEFAULT_TIMEOUT))
+        if client is None:
+            url = url or _config("SUPABASE_URL")
+            key = key or _config("SUPABASE_KEY")
+            if not url or not key:
+                raise RuntimeError("Supabase credentials missing. Add SUPABASE_URL and SUPABASE_KEY.")
+            from supabase import create_client
+            client = create_client(url, key)
+        self.client = client
+        self.compact = compact
+        self.summary_columns = True
+
+    def _table(self, name):
+        return self.client.table(name)
+
+    @staticmethod
+    def _data(res):
+        return [decode_submission(row) for row in getattr(res, "data", None) or []]
+
+    def get_user(self, user_id):
+        data = self._data(self._table("users").select("*").eq("id", user_id).limit(1).execute())
+        return data[0] if data else None
+
+    def get_user_by_username(self, username):
+        data = self._data(self._table("users").select("*").eq("username", username).limit(1).execute())
+        return data[0] if data else None
+
+    def list_users(self):
+        return self._data(self._table("users").select("*").order("username", desc=False).execute())
+
+    def insert_user(self, payload):
+        return self._data(self._table("users").insert(payload).execute())
+
+    def insert_users(self, payloads):
+        return self._data(self._table("users").insert(list(payloads)).execute()) if payloads else []
+
+    def _insert_submissions(self, payloads):
+        if self.summary_columns:
+            try:
+                rows = [self._outgoing(with_summary(p)) for p in payloads]
+                return self._data(self._table("submissions").insert(rows).execute())
+            except Exception as e:
+                # database not migrated yet (migrations/001_submission_summary.sql): write without summaries
+                if not _summary_column_error(e):
+                    raise
+                self.summary_columns = False
+        return self._data(self._table("submissions").insert([self._outgoing(p) for p in payloads]).execute())
+
+    def insert_submission(self, payload):
+        return self._insert_submissions([payload])
+
+    def insert_submissions(self, payloads):
+        return self._insert_submissions(list(payloads)) if payloads else []
+
+    def get_submission(self, submission_id):
+        data = self._data(self._table("submissions").select("*").eq("id", submission_id).limit(1).execute())
+        return data[0] if data else None
+
+    def get_submissions_by_user(self, user_id):
+        return self._data(self._table("submissions").select("*").eq("user_id", user_id).order("id", desc=True).execute())
+
+    def get_latest_submission_by_user(self, user_id):
+        data = self._data(self._table("submissions").select("*").eq("user_id", user_id)
+                          .order("id", desc=True).limit(1).execute())
+        return data[0] if data else None
+
+    def get_latest_submissions_per_user(self):
+        # one small request per user, issued concurrently
+        users = self.list_users()
+        subs = fan_out_map(lambda u: self.get_latest_submission_by_user(u["id"]), users,
+                           max_workers=self.max_workers, timeout=self.timeout)
+        return [(u, sub) for u, sub in zip(users, subs) if sub is not None]
+
+    def list_submissions(self):
+        return self._data(self._table("submissions").select("*").order("id", desc=True).execute())
+
+    def list_submissions_after(self, after_id, limit=200):
+        return self._data(self._table("submissions").select("*").gt("id", after_id)
+                          .order("id").limit(limit).execute())
+
+    def get_submission_count(self, max_id=None):
+        q = self._table("submissions").select("id", count="exact")
+        if max_id is not None:
+            q = q.lte("id", max_id)
+        return q.limit(1).execute().count or 0
+
+    def get_submissions(self, submission_ids):
+        ids = list(submission_ids)
+        if not ids:
+            return []
+        return self._data(self._table("submissions").select("*").in_("id", ids).order("id").execute())
+
+    def delete_submission(self, submission_id):
+        return self._data(self._table("submissions").delete().eq("id", submission_id).execute())
+
+    def delete_submissions(self, submission_ids):
+        ids = list(submission_ids)
+        if not ids:
+            return []
+        return self._data(self._table("submissions").delete().in_("id", ids).execute())
+
+    def upsert_submissions(self, rows):
+        rows = [self._outgoing(r) for r in rows]
+        if not rows:
+            return []
+        if self.summary_columns:
+            try:
+                return self._data(self._table("submissions").upsert(rows, on_conflict="id").execute())
+            except Exception as e:
+                if not _summary_column_error(e):
+                    raise
+                self.summary_columns = False
+        rows = [{k: v for k, v in r.items() if k not in SUMMARY_COLUMNS} for r in rows]
+        return self._data(self._table("submissions").upsert(rows, on_conflict="id").execute())
+
+    def update_submissions(self, updates):
+        # PostgREST has no multi-row update with per-row values; send the updates concurrently
+        items = [(sid, self._outgoing(fields)) for sid, fields in updates.items()]
+        fan_out_map(lambda kv: self._table("submissions").update(kv[1]).eq("id", kv[0]).execute(), items,
+                    max_workers=self.max_workers, timeout=self.timeout)
+        return len(items)
+
+    def list_submission_summaries(self, min_cr=None):
+        if self.summary_columns:
+            q = self._table("submissions").select(SUMMARY_SELECT)
+            if min_cr is not None:
+                q = q.or_(f"cr_max.gt.{min_cr},cr_max.is.null")
+            try:
+                return self._data(q.order("id", desc=True).execute())
+            except Exception as e:
+                if not _summary_column_error(e):
+                    raise
+                self.summary_columns = False
+        # database not migrated yet: summaries computed from the full rows
+        rows = [dict({k: r.get(k) for k in ("id", "user_id", "timestamp")}, **row_summary(r))
+                for r in self.list_submissions()]
+        return [r for r in rows if min_cr is None or r["cr_max"] > min_cr]
+
+    def list_submissions_missing_summary(self, limit=200):
+        if not self.summary_columns:
+            return []  # nowhere to store them
+        try:
+            return self._data(self._table("submissions").select("id, result_json").is_("cr_max", "null")
+                              .order("id").limit(limit).execute())
+        except Exception as e:
+            if not _summary_column_error(e):
+                raise
+            self.summary_columns = False
+            return []
+
+    def save_aggregate(self, key, payload):
+        row = {"key": key, "payload": payload, "updated_at": datetime.now().isoformat()}
+        return self._data(self._table("aggregates").upsert(row).execute())
+
+    def get_aggregate(self, key):
+        data = self._data(self._table("aggregates").select("*").eq("key", key).limit(1).execute())
+        return data[0].get("payload") if data else None
+
+    def save_draft(self, user_id, payload):
+        row = {"user_id": user_id, "payload": payload, "updated_at": datetime.now().isoformat()}
+        return self._data(self._table("drafts").upsert(row).execute())
+
+    def get_draft(self, user_id):
+        data = self._data(self._table("drafts").select("*").eq("user_id", user_id).limit(1).execute())
+        return data[0].get("payload") if data else None
+
+    def delete_draft(self, user_id):
+        return self._data(self._table("drafts").delete().eq("user_id", user_id).execute())
+
+
+# ------------------------------
+# Embedded SQLite backend
+# ------------------------------
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    pw_salt TEXT NOT NULL,
+    pw_hash TEXT NOT NULL,
+    is_admin INTEGER NOT NULL DEFAULT 0,
+    job_items TEXT DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    timestamp TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')),
+    main_pairs TEXT,
+    sub_pairs TEXT,
+    result_json TEXT,
+    cr_main REAL,
+    cr_groups TEXT,
+    main_weights TEXT,
+    cr_max REAL,
+    inconsistent INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_user_id ON submissions (user_id, id DESC);
+CREATE TABLE IF NOT EXISTS aggregates (
+    key TEXT PRIMARY KEY,
+    payload TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS drafts (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    payload TEXT,
+    updated_at TEXT
+);
+"""
+
+SQLITE_SUMMARY_COLUMNS = [("cr_main", "REAL"), ("cr_groups", "TEXT"), ("main_weights", "TEXT"),
+                          ("cr_max", "REAL"), ("inconsistent", "INTEGER")]
+
+
+class SQLiteStorage(Storage):
+    """Local single-file backend (WAL mode, one connection per thread)."""
+
+    def __init__(self, path="ahp_local.db", compact=True):
+        self.path = path
+        self.compact = compact
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SQLITE_SCHEMA)
+        # files created before the summary columns existed
+        have = {r["name"] for r in conn.execute("PRAGMA table_info(submissions)")}
+        for col, decl in SQLITE_SUMMARY_COLUMNS:
+            if col not in have:
+                conn.execute(f"ALTER TABLE submissions ADD COLUMN {col} {decl}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_submissions_cr_max ON submissions (cr_max)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(row):
+        if row is None:
+            return None
+        out = dict(row)
+        for col in JSON_COLUMNS + ("payload",):
+            if col in out and out[col] is not None:
+                out[col] = json_codec.loads(out[col])
+        for col in ("is_admin", "inconsistent"):
+            if out.get(col) is not None:
+                out[col] = bool(out[col])
+        return decode_submission(out)
+
+    def _query(self, sql, params=()):
+        return [self._row(r) for r in self._conn().execute(sql, params).fetchall()]
+
+    def _query_one(self, sql, params=()):
+        return self._row(self._conn().execute(sql, params).fetchone())
+
+    @staticmethod
+    def _encode(payload):
+        payload = dict(payload)
+        for col in JSON_COLUMNS:
+            if col in payload:
+                payload[col] = json_codec.dumps(payload[col])
+        return payload
+
+    def _insert(self, table, payload):
+        return self._insert_many(table, [payload])
+
+    def _insert_many(self, table, payloads):
+        """Insert rows in one transaction; rows may have different column sets."""
+        conn = self._conn()
+        ids = []
+        conn.execute("BEGIN")
+        try:
+            for payload in map(self._encode, payloads):
+                cols = ", ".join(payload)
+                marks = ", ".join("?" for _ in payload)
+                cur = conn.execute(f"INSERT INTO {table} ({cols}) VALUES ({marks})", tuple(payload.values()))
+                ids.append(cur.lastrowid)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if not ids:
+            return []
+        marks = ", ".join("?" for _ in ids)
+        return self._query(f"SELECT * FROM {table} WHERE id IN ({marks}) ORDER BY id", ids)
+
+    def get_user(self, user_id):
+        return self._query_one("SELECT * FROM users WHERE id = ?", (user_id,))
+
+    def get_user_by_username(self, username):
+        return self._query_one("SELECT * FROM users WHERE username = ?", (username,))
+
+    def list_users(self):
+        return self._query("SELECT * FROM users ORDER BY username")
+
+    def insert_user(self, payload):
+        return self._insert("users", payload)
+
+    def insert_users(self, payloads):
+        return self._insert_many("users", payloads)
+
+    def insert_submission(self, payload):
+        return self._insert("submissions", self._outgoing(with_summary(payload)))
+
+    def insert_submissions(self, payloads):
+        return self._insert_many("submissions", [self._outgoing(with_summary(p)) for p in payloads])
+
+    def get_submission(self, submission_id):
+        return self._query_one("SELECT * FROM submissions WHERE id = ?", (submission_id,))
+
+    def get_submissions_by_user(self, user_id):
+        return self._query("SELECT * FROM submissions WHERE user_id = ? ORDER BY id DESC", (user_id,))
+
+    def get_latest_submission_by_user(self, user_id):
+        return self._query_one("SELECT * FROM submissions WHERE user_id = ? ORDER BY id DESC LIMIT 1", (user_id,))
+
+    def get_latest_submissions_per_user(self):
+        users = {u["id"]: u for u in self.list_users()}
+        subs = self._query(
+            "SELECT s.* FROM submissions s"
+            " JOIN (SELECT user_id, MAX(id) AS id FROM submissions GROUP BY user_id) m ON m.id = s.id"
+        )
+        out = [(users[s["user_id"]], s) for s in subs if s["user_id"] in users]
+        return sorted(out, key=lambda us: us[0]["username"])
+
+    def list_submissions(self):
+        return self._query("SELECT * FROM submissions ORDER BY id DESC")
+
+    def list_submissions_after(self, after_id, limit=200):
+        return self._query("SELECT * FROM submissions WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit))
+
+    def get_submission_count(self, max_id=None):
+        if max_id is None:
+            return self._conn().execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+        return self._conn().execute("SELECT COUNT(*) FROM submissions WHERE id <= ?", (max_id,)).fetchone()[0]
+
+    def get_submissions(self, submission_ids):
+        ids = list(submission_ids)
+        if not ids:
+            return []
+        marks = ", ".join("?" for _ in ids)
+        return self._query(f"SELECT * FROM submissions WHERE id IN ({marks}) ORDER BY id", ids)
+
+    def delete_submission(self, submission_id):
+        return self.delete_submissions([submission_id])
+
+    def delete_submissions(self, submission_ids):
+        ids = list(submission_ids)
+        if not ids:
+            return []
+        marks = ", ".join("?" for _ in ids)
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            rows = self._query(f"SELECT * FROM submissions WHERE id IN ({marks}) ORDER BY id", ids)
+            conn.execute(f"DELETE FROM submissions WHERE id IN ({marks})", ids)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def update_submissions(self, updates):
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            for sid, fields in updates.items():
+                fields = self._encode(self._outgoing(fields))
+                sets = ", ".join(f"{col} = ?" for col in fields)
+                conn.execute(f"UPDATE submissions SET {sets} WHERE id = ?", tuple(fields.values()) + (sid,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(updates)
+
+    def upsert_submissions(self, rows):
+        conn = self._conn()
+        ids = []
+        conn.execute("BEGIN")
+        try:
+            for row in rows:
+                fields = self._encode(self._outgoing(dict(row)))
+                cols = ", ".join(fields)
+                marks = ", ".join("?" for _ in fields)
+                sets = ", ".join(f"{col} = excluded.{col}" for col in fields if col != "id")
+                conflict = f"DO UPDATE SET {sets}" if sets else "DO NOTHING"
+                conn.execute(f"INSERT INTO submissions ({cols}) VALUES ({marks}) ON CONFLICT(id) {conflict}",
+                             tuple(fields.values()))
+                ids.append(fields["id"])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get_submissions(ids)
+
+    def list_submission_summaries(self, min_cr=None):
+        if min_cr is None:
+            return self._query(f"SELECT {SUMMARY_SELECT} FROM submissions ORDER BY id DESC")
+        return self._query(f"SELECT {SUMMARY_SELECT} FROM submissions WHERE cr_max > ? OR cr_max IS NULL"
+                           " ORDER BY id DESC", (min_cr,))
+
+    def list_submissions_missing_summary(self, limit=200):
+        return self._query("SELECT id, result_json FROM submissions WHERE cr_max IS NULL ORDER BY id LIMIT ?", (limit,))
+
+    def save_aggregate(self, key, payload):
+        self._conn().execute(
+            "INSERT INTO aggregates (key, payload, updated_at) VALUES (?, ?, ?)"
+            " ON CONFLICT(key) DO UPDATE SET payload = excluded.payload, updated_at = excluded.updated_at",
+            (key, json_codec.dumps(payload), datetime.now().isoformat())
+        )
+        return [{"key": key, "payload": payload}]
+
+    def get_aggregate(self, key):
+        row = self._query_one("SELECT payload FROM aggregates WHERE key = ?", (key,))
+        return row["payload"] if row else None
+
+    def save_draft(self, user_id, payload):
+        self._conn().execute(
+            "INSERT INTO drafts (user_id, payload, updated_at) VALUES (?, ?, ?)"
+            " ON CONFLICT(user_id) DO UPDATE SET payload = excluded.payload, updated_at = excluded.updated_at",
+            (user_id, json_codec.dumps(payload), datetime.now().isoformat())
+        )
+        return [{"user_id": user_id, "payload": payload}]
+
+    def get_draft(self, user_id):
+        row = self._query_one("SELECT payload FROM drafts WHERE user_id = ?", (user_id,))
+        return row["payload"] if row else None
+
+    def delete_draft(self, user_id):
+        self._conn().execute("DELETE FROM drafts WHERE user_id = ?", (user_id,))
+
+
+# ------------------------------
+# Backend selection
+# ------------------------------
+def create_storage(backend=None, resilient=None):
+    backend = (backend or _config("AHP_STORAGE", "supabase")).lower()
+    # AHP_COMPACT_JUDGMENTS=0 keeps writing the legacy label-keyed JSON (e.g. while
+    # older app deployments still read the same database)
+    compact = str(_config("AHP_COMPACT_JUDGMENTS", "on")).lower() not in ("0", "off", "false")
+    if backend == "sqlite":
+        inner = SQLiteStorage(_config("AHP_SQLITE_PATH", "ahp_local.db"), compact=compact)
+    elif backend == "supabase":
+        inner = SupabaseStorage(compact=compact)
+    else:
+        raise RuntimeError(f"Unknown AHP_STORAGE backend: {backend}")
+    if resilient is None:
+        resilient = str(_config("AHP_RESILIENCE", "on")).lower() not in ("0", "off", "false")
+    # request coalescing, retry with backoff and circuit breaker (resilience.py)
+    return ResilientStorage(inner) if resilient else inner
+
+
+@st.cache_resource
+def get_storage():
+    """Shared storage instance for the configured backend."""
+    return create_storage()
@@ -0,0 +1,232 @@
+# stream_export.py
+# CSV / NDJSON export of large datasets, streamed page by page.
+#
+# Datasets:
+#   submissions     one row per submission: meta, every pair ratio, CR per block
+#   global_weights  one row per (submission, sub-criterion): main, local and global weight
+#   aggregate       one row per sub-criterion of the group result (latest submission per expert)
+# Records are produced by generators that read the submissions in id order
+# through list_submissions_after(), and are encoded one line at a time, so
+# memory stays flat however many submissions there are (the aggregate keeps
+# one small contribution per expert).
+#
+# CLI: python stream_export.py DATASET [--format csv|ndjson] [--out FILE] [--chunk-size 500]
+# (writes to stdout without --out)
+
+import argparse
+import csv
+import io
+import sys
+import tempfile
+
+import json_codec
+from aggregate import IncrementalAggregate
+from hierarchy import HIERARCHY, MAIN_BLOCK, item_code
+from spool import SPILL_BYTES, SpooledStream
+
+FORMATS = {"csv": ("text/csv", ".csv"), "ndjson": ("application/x-ndjson", ".ndjson")}
+DEFAULT_CHUNK_SIZE = 500
+META_COLUMNS = ["submission_id", "user_id", "username", "job_items", "timestamp"]
+
+
+def iter_submissions(storage, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Every submission row in id order, one page of chunk_size rows in memory at a time."""
+    last_id = 0
+    while True:
+        rows = storage.list_submissions_after(last_id, limit=chunk_size)
+        if not rows:
+            return
+        yield from rows
+        last_id = rows[-1]["id"]
+
+
+def _users(storage):
+    """{user id: (username, job_items)}; job_items is a column of users, not of submissions."""
+    users = {}
+    for u in storage.list_users():
+        job_items = u.get("job_items") or ""
+        if isinstance(job_items, list):
+            job_items = ", ".join(job_items)
+        users[u["id"]] = (u["username"], job_items)
+    return users
+
+
+def _meta(row, users):
+    username, job_items = users.get(row.get("user_id"), ("", ""))
+    return {"submission_id": row["id"], "user_id": row.get("user_id"), "username": username,
+            "job_items": job_items, "timestamp": str(row.get("timestamp") or "")}
+
+
+def _block_name(block):
+    return block if block == MAIN_BLOCK else item_code(block)
+
+
+def submission_columns(hierarchy=HIERARCHY):
+    pairs = [c for block, _ in hierarchy.blocks for c in hierarchy.pair_columns(block)]
+    return META_COLUMNS + pairs + [f"cr_{_block_name(block)}" for block, _ in hierarchy.blocks]
+
+
+def submission_records(storage, chunk_size=DEFAULT_CHUNK_SIZE, hierarchy=HIERARCHY):
+    h = hierarchy
+    users = _users(storage)
+    pair_columns = [c for block, _ in h.blocks for c in h.pair_columns(block)]
+    for row in iter_submissions(storage, chunk_size):
+        record = _meta(row, users)
+        try:
+            j = row.judgments(h)
+            ratios = [float(r) for block, _ in h.blocks for r in j[block]]
+        except (ValueError, TypeError, AttributeError, KeyError):
+            ratios = [None] * len(pair_columns)  # incomplete or off-hierarchy judgments
+        record.update(zip(pair_columns, ratios))
+        res = row.get("result_json") or {}
+        parts = [res.get("main") or {}] + [(res.get("local") or {}).get(g) or {} for g in h.criteria]
+        for (block, _), part in zip(h.blocks, parts):
+            record[f"cr_{_block_name(block)}"] = (part.get("cons") or {}).get("CR")
+        yield record
+
+
+GLOBAL_WEIGHT_COLUMNS = META_COLUMNS + ["criterion", "subcriterion", "main_weight", "local_weight", "global_weight"]
+
+
+def global_weight_records(storage, chunk_size=DEFAULT_CHUNK_SIZE, hierarchy=HIERARCHY):
+    h = hierarchy
+    users = _users(storage)
+    for row in iter_submissions(storage, chunk_size):
+        weights = row.weight_arrays(h)
+        main_w = weights[0]
+        if main_w.shape != (len(h.criteria),):
+            continue
+        meta = _meta(row, users)
+        for gi, (g, local_w) in enumerate(zip(h.criteria, weights[1:])):
+            if local_w.shape != (len(h.subcriteria[g]),):
+                continue
+            for sk, lw in zip(h.subcriteria[g], local_w):
+                yield {**meta, "criterion": g, "subcriterion": sk, "main_weight": float(main_w[gi]),
+                       "local_weight": float(lw), "global_weight": float(main_w[gi] * lw)}
+
+
+AGGREGATE_COLUMNS = ["criterion", "subcriterion", "main_weight_aij", "main_weight_aip", "local_weight",
+                     "global_weight", "n_experts", "cr_main_aij"]
+
+
+def aggregate_records(storage, chunk_size=DEFAULT_CHUNK_SIZE, hierarchy=HIERARCHY):
+    """Group result over the latest submission of every expert (rows arrive in id order)."""
+    agg = IncrementalAggregate(hierarchy)
+    for row in iter_submissions(storage, chunk_size):
+        agg.add(row["user_id"], row)
+    result = agg.result()
+    if result is None:
+        return
+    aip = result["weights_aip"]
+    main_idx = {g: i for i, g in enumerate(hierarchy.criteria)}
+    for r in result["global_rows"]:
+        i = main_idx[r["Kriteria"]]
+        yield {"criterion": r["Kriteria"], "subcriterion": r["SubKriteria"], "main_weight_aij": r["MainWeight"],
+               "main_weight_aip": float(aip[i]) if aip is not None else None, "local_weight": r["LocalWeight"],
+               "global_weight": r["GlobalWeight"], "n_experts": result["n_experts"],
+               "cr_main_aij": result["cons_aij"]["CR"]}
+
+
+# name -> (label, columns(hierarchy), records(storage, chunk_size, hierarchy))
+DATASETS = {
+    "submissions": ("Submission (penilaian berpasangan)", submission_columns, submission_records),
+    "global_weights": ("Bobot global per pakar", lambda h: GLOBAL_WEIGHT_COLUMNS, global_weight_records),
+    "aggregate": ("Hasil agregat (gabungan pakar)", lambda h: AGGREGATE_COLUMNS, aggregate_records),
+}
+
+
+def iter_csv(records, columns):
+    """UTF-8 CSV: the header line, then one bytes chunk per record."""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    yield buf.getvalue().encode("utf-8")
+    for record in records:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerow(record)
+        yield buf.getvalue().encode("utf-8")
+
+
+def iter_ndjson(records):
+    for record in records:
+        yield json_codec.dumps_bytes(record) + b"\n"
+
+
+def iter_export(storage, dataset, fmt="csv", chunk_size=DEFAULT_CHUNK_SIZE, hierarchy=HIERARCHY):
+    """Encoded lines of a dataset, generated while the submissions are paged in."""
+    if dataset not in DATASETS:
+        raise ValueError(f"unknown dataset {dataset!r}, expected one of {sorted(DATASETS)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format {fmt!r}, expected one of {sorted(FORMATS)}")
+    _, columns, records = DATASETS[dataset]
+    records = records(storage, chunk_size, hierarchy)
+    if fmt == "csv":
+        return iter_csv(records, columns(hierarchy))
+    return iter_ndjson(records)
+
+
+def write_export(storage, dataset, fileobj, fmt="csv", chunk_size=DEFAULT_CHUNK_SIZE, hierarchy=HIERARCHY):
+    """Write a dataset to a binary file object; returns the number of lines written."""
+    n = 0
+    for line in iter_export(storage, dataset, fmt, chunk_size, hierarchy):
+        fileobj.write(line)
+        n += 1
+    return n
+
+
+def export_stream(storage, dataset, fmt="csv", chunk_size=DEFAULT_CHUNK_SIZE):
+    """(SpooledStream of the export, lines written), for a download button."""
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPILL_BYTES)
+    try:
+        n = write_export(storage, dataset, spooled, fmt, chunk_size)
+    except BaseException:
+        spooled.close()
+        raise
+    return SpooledStream(spooled), n
+
+
+def render_stream_export_section(storage):
+    import streamlit as st
+
+    st.subheader("📤 Ekspor CSV / NDJSON")
+    st.write("Untuk diolah di tools lain: data dibaca per halaman dan ditulis baris demi baris.")
+    dataset = st.selectbox("Data", list(DATASETS), format_func=lambda d: DATASETS[d][0], key="stream_dataset")
+    fmt = st.radio("Format", list(FORMATS), horizontal=True, key="stream_format")
+    if st.button("Buat file ekspor", key="btn_stream_export"):
+        old = st.session_state.pop("stream_export", None)
+        if old is not None:
+            old[2].close()
+        with st.spinner("Mengekspor..."):
+            stream, n = export_stream(storage, dataset, fmt)
+        st.session_state["stream_export"] = (dataset, fmt, stream, n)
+    if "stream_export" in st.session_state:
+        dataset, fmt, stream, n = st.session_state["stream_export"]
+        lines = n - 1 if fmt == "csv" else n
+        st.caption(f"{lines} baris diekspor.")
+        mime, ext = FORMATS[fmt]
+        st.download_button(f"📥 Download {DATASETS[dataset][0]} ({fmt})", data=stream,
+                           file_name=f"ahp_{dataset}{ext}", mime=mime, key="dl_stream_export")
+
+
+def main():
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="CSV / NDJSON export of submissions, weights and aggregate results.")
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("--out", help="output file (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+    storage = create_storage()
+    if args.out:
+        with open(args.out, "wb") as f:
+            n = write_export(storage, args.dataset, f, args.format, args.chunk_size)
+        print(f"Wrote {n} lines to {args.out}", file=sys.stderr)
+    else:
+        write_export(storage, args.dataset, sys.stdout.buffer, args.format, args.chunk_size)
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
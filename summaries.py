@@ -0,0 +1,82 @@
+# summaries.py
+# Denormalised summary columns of the submissions table.
+#
+# Every insert also writes cr_main, cr_groups (CR per criterion group, in
+# CRITERIA order), main_weights, cr_max and inconsistent (cr_max > 0.1), so the
+# Admin Panel can list and filter submissions without parsing result_json.
+#
+# Existing rows: python summaries.py backfill [--batch-size 200]
+
+import argparse
+
+import json_codec
+from hierarchy import CRITERIA
+
+CR_THRESHOLD = 0.1
+SUMMARY_COLUMNS = ("cr_main", "cr_groups", "main_weights", "cr_max", "inconsistent")
+
+
+def submission_summary(result):
+    """Summary column values for a result_json (dict or legacy JSON string)."""
+    if isinstance(result, str):
+        try:
+            result = json_codec.loads(result)
+        except Exception:
+            result = {}
+    result = result or {}
+    main = result.get("main", {}) or {}
+    local = result.get("local", {}) or {}
+    cr_main = float(main.get("cons", {}).get("CR", 0) or 0)
+    cr_groups = [float(local.get(g, {}).get("cons", {}).get("CR", 0) or 0) for g in CRITERIA]
+    cr_max = max([cr_main] + cr_groups)
+    return {
+        "cr_main": cr_main,
+        "cr_groups": cr_groups,
+        "main_weights": [float(w) for w in main.get("weights", [])],
+        "cr_max": cr_max,
+        "inconsistent": cr_max > CR_THRESHOLD
+    }
+
+
+def row_summary(row):
+    """Summary of a fetched row: stored columns, or computed from result_json for rows not backfilled yet."""
+    if row.get("cr_max") is not None:
+        return {col: row.get(col) for col in SUMMARY_COLUMNS}
+    return submission_summary(row.get("result_json") if row.get("result_json") is not None else row.get("result"))
+
+
+def with_summary(payload):
+    """Copy of a submission payload with the summary columns filled in."""
+    if "result_json" not in payload:
+        return payload
+    out = dict(payload)
+    out.update(submission_summary(payload["result_json"]))
+    return out
+
+
+def backfill_summaries(storage, batch_size=200, progress=None):
+    """Fill summary columns of rows written before they existed. Returns the row count."""
+    done = 0
+    while True:
+        rows = storage.list_submissions_missing_summary(limit=batch_size)
+        if not rows:
+            return done
+        storage.update_submissions({r["id"]: submission_summary(r.get("result_json")) for r in rows})
+        done += len(rows)
+        if progress is not None:
+            progress(done)
+
+
+def main():
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Submission summary columns.")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    n = backfill_summaries(create_storage(), batch_size=args.batch_size, progress=lambda d: print(f"{d} rows"))
+    print(f"Backfilled {n} submissions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import numpy as np
+import pytest
+
+from aggregate import IncrementalAggregate
+from ahp_batch import build_matrices, compute_results, geometric_mean_weights, pairs_payload
+from bulk_admin import delete_submissions, recompute_submissions
+from change_feed import SubmissionFeed
+from hierarchy import HIERARCHY, MAIN_BLOCK
+from storage import SQLiteStorage
+from test_ahp_batch import random_judgments
+
+
+def full_aggregate(rows, hierarchy=HIERARCHY):
+    """Group result recomputed from scratch over the given latest submissions."""
+    mats = np.stack([build_matrices(row.judgments(hierarchy)[MAIN_BLOCK][None], len(hierarchy.criteria),
+                                    hierarchy.pairs[MAIN_BLOCK])[0] for row in rows])
+    gm = np.exp(np.log(mats).mean(axis=0))
+    weights_aij = geometric_mean_weights(gm[None])[0]
+    main_w = np.array([row["result_json"]["main"]["weights"] for row in rows])
+    weights_aip = np.exp(np.log(main_w).mean(axis=0))
+    global_weights = []
+    for i, g in enumerate(hierarchy.criteria):
+        local = np.exp(np.log([row["result_json"]["local"][g]["weights"] for row in rows]).mean(axis=0))
+        global_weights += list(weights_aij[i] * local / local.sum())
+    return weights_aij, weights_aip / weights_aip.sum(), global_weights
+
+
+def assert_matches(result, rows):
+    weights_aij, weights_aip, global_weights = full_aggregate(rows)
+    assert result["n_experts"] == len(rows)
+    assert result["weights_aij"] == pytest.approx(weights_aij)
+    assert result["weights_aip"] == pytest.approx(weights_aip)
+    assert [r["GlobalWeight"] for r in result["global_rows"]] == pytest.approx(global_weights)
+
+
+def submission_payloads(user_ids, seed):
+    judgments = random_judgments(len(user_ids), seed=seed)
+    results = compute_results(HIERARCHY, judgments)
+    payloads = []
+    for k, uid in enumerate(user_ids):
+        main_pairs, sub_pairs = pairs_payload(HIERARCHY, judgments, k)
+        payloads.append({"user_id": uid, "main_pairs": main_pairs, "sub_pairs": sub_pairs, "result_json": results[k]})
+    return payloads
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "ahp.db"))
+    storage.insert_users([{"username": f"pakar{i}", "pw_salt": "00", "pw_hash": "00"} for i in range(4)])
+    return storage
+
+
+def latest_rows(storage):
+    return [s for _, s in storage.get_latest_submissions_per_user()]
+
+
+def test_add_remove_and_replace_match_full_recompute(storage):
+    uids = [u["id"] for u in storage.list_users()]
+    first = storage.insert_submissions(submission_payloads(uids, seed=1))
+    agg = IncrementalAggregate()
+    for row in first:
+        agg.add(row["user_id"], row)
+    assert_matches(agg.result(), first)
+
+    # a newer submission replaces the expert's contribution; an older one is ignored
+    newer = storage.insert_submissions(submission_payloads(uids[:2], seed=2))
+    for row in newer:
+        assert agg.add(row["user_id"], row)
+    assert not agg.add(first[0]["user_id"], first[0])
+    assert_matches(agg.result(), latest_rows(storage))
+
+    agg.remove(uids[3])
+    assert_matches(agg.result(), [r for r in latest_rows(storage) if r["user_id"] != uids[3]])
+    for uid in uids:
+        agg.remove(uid)
+    assert agg.result() is None
+
+
+def test_feed_follows_inserts_deletes_and_recomputes(storage):
+    uids = [u["id"] for u in storage.list_users()]
+    storage.insert_submissions(submission_payloads(uids, seed=3))
+    feed = SubmissionFeed(storage)
+    feed.refresh()
+    assert_matches(feed.aggregate.result(), latest_rows(storage))
+
+    newer = storage.insert_submissions(submission_payloads(uids[:2], seed=4))
+    assert feed.refresh() == 2
+    assert_matches(feed.aggregate.result(), latest_rows(storage))
+
+    # deleting an expert's latest submission falls back to the previous one
+    delete_submissions(storage, [newer[0]["id"]], feed=feed)
+    assert_matches(feed.aggregate.result(), latest_rows(storage))
+
+    # rewritten results (recompute) replace the cached contribution
+    storage.update_submissions({newer[1]["id"]: {"main_pairs": submission_payloads(uids[:1], seed=5)[0]["main_pairs"]}})
+    recompute_submissions(storage, [newer[1]["id"]], feed=feed)
+    assert_matches(feed.aggregate.result(), latest_rows(storage))
+    feed.refresh()
+    assert_matches(feed.aggregate.result(), latest_rows(storage))
+
+
+def test_feed_resyncs_after_a_delete_made_elsewhere(storage):
+    uids = [u["id"] for u in storage.list_users()]
+    rows = storage.insert_submissions(submission_payloads(uids, seed=6))
+    feed = SubmissionFeed(storage)
+    feed.refresh()
+    version = feed.version
+
+    storage.delete_submissions([rows[2]["id"]])  # another process: the feed is not told
+    feed.refresh()
+    assert feed.version > version
+    assert {r["id"] for _, r in feed.latest_per_user()} == {r["id"] for r in rows} - {rows[2]["id"]}
+    assert_matches(feed.aggregate.result(), latest_rows(storage))
+
+
+def test_feed_resyncs_after_a_late_commit_below_last_id(storage):
+    uids = [u["id"] for u in storage.list_users()]
+    payloads = submission_payloads(uids, seed=9)
+    for k, payload in enumerate(payloads):
+        payload["id"] = 10 * (k + 1)
+    storage.insert_submissions(payloads[:2] + payloads[3:])
+    feed = SubmissionFeed(storage)
+    feed.refresh()
+    assert feed.last_id == 40
+
+    storage.insert_submissions([payloads[2]])  # id 30 commits after id 40 was seen
+    feed.refresh()
+    assert {r["id"] for _, r in feed.latest_per_user()} == {10, 20, 30, 40}
+    assert_matches(feed.aggregate.result(), latest_rows(storage))
+
+def test_feed_summaries_follow_inserts_deletes_and_backfill(storage):
+    uids = [u["id"] for u in storage.list_users()]
+    first = storage.insert_submissions(submission_payloads(uids, seed=10))
+    storage.update_submissions({first[0]["id"]: {"cr_max": None}})  # saved before the summary columns
+    feed = SubmissionFeed(storage)
+    feed.refresh()
+    assert [r["id"] for r in feed.summaries()] == [r["id"] for r in reversed(first)]
+    assert storage.list_submissions_missing_summary() == []
+
+    second = storage.insert_submissions(submission_payloads(uids[:2], seed=11))
+    delete_submissions(storage, [first[1]["id"]], feed=feed)
+    feed.refresh()
+    rows = feed.summaries()
+    assert [r["id"] for r in rows] == [r["id"] for r in storage.list_submission_summaries()]
+    assert all(r["cr_max"] > 0.1 for r in feed.summaries(min_cr=0.1))
+    assert {r["id"] for r in second} <= {r["id"] for r in rows}
+
+def test_list_submissions_since_pages_through_all_rows(storage):
+    uids = [u["id"] for u in storage.list_users()]
+    rows = storage.insert_submissions(submission_payloads(uids, seed=7) + submission_payloads(uids, seed=8))
+    since = storage.list_submissions_since(rows[0]["id"], limit=3)
+    assert [r["id"] for r in since] == [r["id"] for r in rows[1:]]
+    assert storage.get_submission_count(rows[3]["id"]) == 4
@@ -0,0 +1,119 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from ahp_batch import compute_result, compute_results, judgments_from_pairs, pairs_payload
+from hierarchy import CRITERIA, HIERARCHY, MAIN_BLOCK, RI_DICT, SUBCRITERIA
+
+
+# the per-respondent computation the apps used before ahp_batch (matrix by matrix)
+def _matrix(items, pair_values):
+    idx = {it: i for i, it in enumerate(items)}
+    M = np.ones((len(items), len(items)))
+    for (a, b), v in pair_values.items():
+        M[idx[a], idx[b]] = v
+        M[idx[b], idx[a]] = 1.0 / v
+    return M
+
+
+def _weights(M):
+    gm = np.prod(M, axis=1) ** (1.0 / M.shape[0])
+    return gm / gm.sum()
+
+
+def _cons(M, w):
+    n = M.shape[0]
+    lambda_max = float(np.mean(M.dot(w) / w))
+    ci = (lambda_max - n) / (n - 1) if n > 1 else 0.0
+    ri = RI_DICT.get(n, 1.49)
+    return {"lambda_max": lambda_max, "CI": ci, "CR": ci / ri if ri != 0 else 0.0}
+
+
+def compute_ahp_result(main_pairs, sub_pairs):
+    main_mat = _matrix(CRITERIA, main_pairs)
+    main_w = _weights(main_mat)
+    local, global_rows = {}, []
+    for i, group in enumerate(CRITERIA):
+        mat = _matrix(SUBCRITERIA[group], {tuple(k.split(" ||| ")): v for k, v in sub_pairs[group].items()})
+        w = _weights(mat)
+        local[group] = {"keys": SUBCRITERIA[group], "weights": list(w), "cons": _cons(mat, w)}
+        for sk, lw in zip(SUBCRITERIA[group], w):
+            global_rows.append({"Kriteria": group, "SubKriteria": sk, "LocalWeight": lw,
+                                "MainWeight": main_w[i], "GlobalWeight": main_w[i] * lw})
+    return {"main": {"keys": CRITERIA, "weights": list(main_w), "cons": _cons(main_mat, main_w),
+                     "mat": main_mat.tolist()},
+            "local": local, "global": global_rows}
+
+
+def random_judgments(n, seed=0, hierarchy=HIERARCHY):
+    rng = np.random.default_rng(seed)
+    out = {}
+    for block, _ in hierarchy.blocks:
+        codes = rng.integers(1, 10, size=(n, len(hierarchy.pairs[block])))
+        out[block] = np.where(rng.random(codes.shape) < 0.5, codes, 1.0 / codes).astype(float)
+    return out
+
+
+def _assert_same_result(got, want):
+    assert got["main"]["keys"] == want["main"]["keys"]
+    assert got["main"]["weights"] == pytest.approx(want["main"]["weights"])
+    assert got["main"]["mat"] == pytest.approx(np.asarray(want["main"]["mat"]))
+    for k in ("lambda_max", "CI", "CR"):
+        assert got["main"]["cons"][k] == pytest.approx(want["main"]["cons"][k], abs=1e-9)
+    for group in CRITERIA:
+        assert got["local"][group]["keys"] == want["local"][group]["keys"]
+        assert got["local"][group]["weights"] == pytest.approx(want["local"][group]["weights"])
+        for k in ("lambda_max", "CI", "CR"):
+            assert got["local"][group]["cons"][k] == pytest.approx(want["local"][group]["cons"][k], abs=1e-9)
+    assert len(got["global"]) == len(want["global"])
+    for g, w in zip(got["global"], want["global"]):
+        assert (g["Kriteria"], g["SubKriteria"]) == (w["Kriteria"], w["SubKriteria"])
+        assert g["GlobalWeight"] == pytest.approx(w["GlobalWeight"])
+
+
+def test_compute_results_matches_per_respondent_computation():
+    judgments = random_judgments(5)
+    results = compute_results(HIERARCHY, judgments)
+    assert len(results) == 5
+    for k, result in enumerate(results):
+        main_pairs, sub_pairs = pairs_payload(HIERARCHY, judgments, k)
+        main = {tuple(key.split(" ||| ")): v for key, v in main_pairs.items()}
+        _assert_same_result(result, compute_ahp_result(main, sub_pairs))
+
+
+def test_consistent_judgments_have_zero_cr():
+    # a_ij = w_i / w_j for fixed weights: perfectly consistent
+    judgments = {}
+    for block, items in HIERARCHY.blocks:
+        w = np.arange(1, len(items) + 1, dtype=float)
+        judgments[block] = np.array([[w[i] / w[j] for i, j in HIERARCHY.pairs[block]]])
+    result = compute_results(HIERARCHY, judgments)[0]
+    assert result["main"]["cons"]["CR"] == pytest.approx(0, abs=1e-12)
+    w = np.arange(1, len(CRITERIA) + 1, dtype=float)
+    assert result["main"]["weights"] == pytest.approx(w / w.sum())
+
+
+def test_judgments_from_pairs_inverts_pairs_payload():
+    judgments = random_judgments(2, seed=1)
+    main_pairs, sub_pairs = pairs_payload(HIERARCHY, judgments, 1)
+    back = judgments_from_pairs(HIERARCHY, main_pairs, sub_pairs)
+    for block, _ in HIERARCHY.blocks:
+        assert back[block] == pytest.approx(judgments[block][1])
+
+
+def test_judgments_from_pairs_accepts_reversed_pairs_and_rejects_missing():
+    main_pairs, sub_pairs = pairs_payload(HIERARCHY, random_judgments(1, seed=2), 0)
+    (a, b), key = next(zip(itertools.combinations(CRITERIA, 2), main_pairs))
+    flipped = dict(main_pairs)
+    flipped[f"{b} ||| {a}"] = 1.0 / flipped.pop(key)
+    assert judgments_from_pairs(HIERARCHY, flipped, sub_pairs)[MAIN_BLOCK][0] == pytest.approx(main_pairs[key])
+    del flipped[f"{b} ||| {a}"]
+    with pytest.raises(ValueError):
+        judgments_from_pairs(HIERARCHY, flipped, sub_pairs)
+
+
+def test_compute_result_for_one_questionnaire():
+    main_pairs, sub_pairs = pairs_payload(HIERARCHY, random_judgments(1, seed=3), 0)
+    main = {tuple(key.split(" ||| ")): v for key, v in main_pairs.items()}
+    _assert_same_result(compute_result(HIERARCHY, main, sub_pairs), compute_ahp_result(main, sub_pairs))
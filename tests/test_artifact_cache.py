@@ -0,0 +1,52 @@
+import os
+import time
+
+from artifact_cache import TMP_GRACE, ArtifactCache
+
+
+def put_aged(cache, key, size, age):
+    cache.put(key, "bin", b"x" * size)
+    t = time.time() - age
+    os.utime(cache._path(key, "bin"), (t, t))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ArtifactCache(str(tmp_path), max_bytes=1000)
+    for i, key in enumerate(["aa1", "bb2", "cc3", "dd4"]):
+        put_aged(cache, key, 200, age=100 - i)
+    assert cache.get("aa1", "bin") is not None  # used now: becomes the most recent
+    cache.put("ee5", "bin", b"x" * 300)  # 1100 bytes > 1000: evict down to 800
+    assert [k for k in ["aa1", "bb2", "cc3", "dd4", "ee5"] if cache.contains(k, "bin")] == ["aa1", "dd4", "ee5"]
+    assert cache.stats()["bytes"] == 700
+
+
+def test_overwriting_an_entry_does_not_count_it_twice(tmp_path):
+    cache = ArtifactCache(str(tmp_path), max_bytes=1000)
+    put_aged(cache, "aa1", 300, age=10)
+    for _ in range(5):
+        cache.put("bb2", "bin", b"y" * 400)
+    assert cache.stats()["bytes"] == 700
+    assert cache.contains("aa1", "bin")
+
+
+def test_files_being_written_are_not_evicted(tmp_path):
+    cache = ArtifactCache(str(tmp_path), max_bytes=1000)
+    os.makedirs(tmp_path / "zz")
+    writing, stale = tmp_path / "zz" / "a.tmp", tmp_path / "zz" / "b.tmp"
+    writing.write_bytes(b"t" * 600)
+    stale.write_bytes(b"t" * 600)
+    old = time.time() - TMP_GRACE - 10
+    os.utime(stale, (old, old))
+    put_aged(cache, "aa1", 500, age=5)
+    cache.put("bb2", "bin", b"x" * 500)
+    assert writing.exists() and not stale.exists()
+
+
+def test_get_or_create_builds_once(tmp_path):
+    cache = ArtifactCache(str(tmp_path))
+    calls = []
+    build = lambda: calls.append(1) or b"data"  # noqa: E731
+    assert cache.get_or_create("k1", "pdf", build) == b"data"
+    assert cache.get_or_create("k1", "pdf", build) == b"data"
+    assert calls == [1]
+    assert cache.stats()["by_kind"]["pdf"] == {"hits": 1, "misses": 1}
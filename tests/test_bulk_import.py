@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bulk_import import parse_judgment, template_frame, validate_frame
+from hierarchy import HIERARCHY, MAIN_BLOCK
+
+
+@pytest.mark.parametrize("cell, ratio", [
+    ("3", 3.0), (5, 5.0), ("-3", 1 / 3), ("1/3", 1 / 3), ("0,333", 1 / 3), ("0.2", 0.2), ("1", 1.0), (" 9 ", 9.0),
+])
+def test_parse_judgment_accepts_the_saaty_scale(cell, ratio):
+    assert parse_judgment(cell) == pytest.approx(ratio)
+
+
+@pytest.mark.parametrize("cell", [None, np.nan, "", "0", "10", "-10", "2.5", "1/0", "abc"])
+def test_parse_judgment_rejects_other_values(cell):
+    assert parse_judgment(cell) is None
+
+
+def _sheet(rows):
+    """Sheet with every pair column set to 1, then the given per-row overrides."""
+    cols = list(template_frame().columns)
+    data = []
+    for overrides in rows:
+        row = {c: "1" for c in cols}
+        row.update(username="pakar", job_items="", timestamp="")
+        row.update(overrides)
+        data.append(row)
+    return pd.DataFrame(data, columns=cols)
+
+
+def test_validate_frame_valid_rows():
+    first = HIERARCHY.pair_columns(MAIN_BLOCK)[0]
+    df = _sheet([{"username": "a", first: "3", "timestamp": "2024-05-01 08:30"}, {"username": "b", first: "-5"}])
+    judgments, meta, errors = validate_frame(df)
+    assert errors == []
+    assert [m["username"] for m in meta] == ["a", "b"]
+    assert meta[0]["timestamp"] == "2024-05-01T08:30:00"
+    assert meta[1]["timestamp"]  # filled with the import time
+    assert judgments[MAIN_BLOCK].shape == (2, len(HIERARCHY.pairs[MAIN_BLOCK]))
+    assert judgments[MAIN_BLOCK][:, 0] == pytest.approx([3.0, 0.2])
+
+
+def test_validate_frame_reports_cell_errors_and_drops_the_row():
+    col = HIERARCHY.pair_columns(HIERARCHY.criteria[0])[2]
+    df = _sheet([{"username": "a"}, {"username": "b", col: "12"}, {"username": " "},
+                 {"username": "d", "timestamp": "kemarin"}])
+    judgments, meta, errors = validate_frame(df)
+    assert [m["username"] for m in meta] == ["a"]
+    assert judgments[MAIN_BLOCK].shape[0] == 1
+    assert errors == [f"Baris 3: nilai tidak valid di kolom {col} ('12')",
+                      "Baris 4: username kosong",
+                      "Baris 5: timestamp tidak valid ('kemarin')"]
+
+
+def test_validate_frame_missing_columns():
+    judgments, meta, errors = validate_frame(pd.DataFrame({"username": ["a"], "A-B": ["1"]}))
+    assert judgments is None and meta == []
+    assert errors[0].startswith("Kolom tidak ditemukan")
@@ -0,0 +1,103 @@
+import threading
+import time
+
+from drafts import DraftWriter, draft_codes, make_draft
+from hierarchy import HIERARCHY
+
+
+class RecordingStorage:
+    def __init__(self):
+        self.log = []
+        self.drafts = {}
+        self.saving = None  # Event a save waits on, to hold a write in flight
+
+    def save_draft(self, user_id, payload):
+        if self.saving is not None:
+            self.saving.wait(5)
+        self.log.append(("save", user_id, payload))
+        self.drafts[user_id] = payload
+
+    def get_draft(self, user_id):
+        return self.drafts.get(user_id)
+
+    def delete_draft(self, user_id):
+        self.log.append(("delete", user_id))
+        self.drafts.pop(user_id, None)
+
+
+def wait_for(cond, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.005)
+
+
+def test_first_change_is_written_at_once_later_ones_coalesce():
+    storage = RecordingStorage()
+    writer = DraftWriter(storage, interval=0.2)
+    writer.put(1, "a")
+    wait_for(lambda: len(storage.log) == 1)
+    for draft in ("b", "c", "d"):
+        writer.put(1, draft)
+    assert writer.load(1) == "d"  # the pending draft, before it is written
+    time.sleep(0.05)
+    assert len(storage.log) == 1
+    wait_for(lambda: len(storage.log) == 2)
+    assert storage.log == [("save", 1, "a"), ("save", 1, "d")]
+    assert writer.writes == 2
+
+
+def test_users_are_debounced_independently():
+    storage = RecordingStorage()
+    writer = DraftWriter(storage, interval=5)
+    writer.put(1, "a")
+    writer.put(2, "b")
+    wait_for(lambda: len(storage.log) == 2)
+    assert sorted(storage.log) == [("save", 1, "a"), ("save", 2, "b")]
+
+
+def test_discard_cancels_a_pending_write():
+    storage = RecordingStorage()
+    writer = DraftWriter(storage, interval=0.1)
+    writer.put(1, "a")
+    wait_for(lambda: len(storage.log) == 1)
+    writer.put(1, "b")  # pending until the interval ends
+    writer.discard(1)
+    time.sleep(0.2)
+    assert storage.log == [("save", 1, "a"), ("delete", 1)]
+    assert writer.load(1) is None
+
+
+def test_discard_waits_for_a_write_in_flight():
+    storage = RecordingStorage()
+    storage.saving = threading.Event()
+    writer = DraftWriter(storage, interval=0.1)
+    writer.put(1, "a")
+    time.sleep(0.05)  # the timer thread is now blocked inside save_draft
+    discard = threading.Thread(target=writer.discard, args=(1,))
+    discard.start()
+    time.sleep(0.05)
+    assert storage.log == []
+    storage.saving.set()
+    discard.join(2)
+    assert storage.log == [("save", 1, "a"), ("delete", 1)]
+    assert storage.get_draft(1) is None
+
+
+def test_flush_writes_pending_drafts():
+    storage = RecordingStorage()
+    writer = DraftWriter(storage, interval=60)
+    writer.put(1, "a")
+    wait_for(lambda: len(storage.log) == 1)
+    writer.put(1, "b")
+    writer.flush()
+    assert storage.log[-1] == ("save", 1, "b")
+
+
+def test_draft_codes_checks_the_hierarchy():
+    codes = [2] * HIERARCHY.n_pairs
+    assert draft_codes(make_draft(codes, step=3)) == (codes, 3)
+    assert draft_codes(dict(make_draft(codes), h="000000000000")) is None
+    assert draft_codes(make_draft(codes[:-1])) is None
+    assert draft_codes(make_draft([0] + codes[1:])) is None
+    assert draft_codes(None) is None
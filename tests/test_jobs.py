@@ -0,0 +1,44 @@
+import time
+
+import jobs
+from artifact_cache import ArtifactCache
+from jobs import JobQueue
+
+
+def add_job(queue, key, owner, status="running"):
+    now = time.time()
+    queue._conn().execute("INSERT INTO jobs (key, kind, status, owner, created_at, updated_at)"
+                          " VALUES (?, 'zip', ?, ?, ?, ?)", (key, status, owner, now, now))
+
+
+def test_starting_a_queue_fails_only_jobs_of_dead_owners(tmp_path):
+    db = str(tmp_path / "jobs.db")
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    first = JobQueue(db, cache)
+    add_job(first, "live", first.owner)
+    add_job(first, "orphan", "gone")
+    second = JobQueue(db, cache)  # another server on the same table
+    assert first.get("live")["status"] == "running"
+    assert second.get("orphan")["status"] == "failed"
+
+    # the first server stops renewing its lease
+    second._conn().execute("UPDATE job_owners SET heartbeat = ? WHERE owner = ?",
+                           (time.time() - jobs.LEASE_SECONDS - 1, first.owner))
+    assert second.fail_orphans() == 1
+    assert second.get("live")["status"] == "failed"
+
+
+def partial_task(job):
+    job.warn("1 dari 2 PDF gagal dibuat.")
+    return b"zip"
+
+
+def test_a_warning_keeps_the_job_done_and_is_stored(tmp_path):
+    db = str(tmp_path / "jobs.db")
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    queue = JobQueue(db, cache)
+    add_job(queue, "partial", queue.owner, status="queued")
+    jobs._run_job(db, cache.root, cache.max_bytes, "partial", "zip", partial_task, ())
+    job = queue.get("partial")
+    assert (job["status"], job["error"]) == ("done", "1 dari 2 PDF gagal dibuat.")
+    assert queue.result("partial", "zip") == b"zip"
@@ -0,0 +1,117 @@
+import copy
+import json
+
+import numpy as np
+import pytest
+
+import hierarchy
+import judgment_codec
+from ahp_batch import compute_results, pairs_payload
+from hierarchy import CRITERIA, HIERARCHY, SUBCRITERIA, compile_hierarchy, freeze, load_snapshots
+from judgment_codec import decode_submission, encode_submission
+from test_ahp_batch import random_judgments
+
+
+def payload(seed=0, h=HIERARCHY):
+    judgments = random_judgments(1, seed=seed, hierarchy=h)
+    main_pairs, sub_pairs = pairs_payload(h, judgments, 0)
+    return {"id": 7, "user_id": 1, "main_pairs": main_pairs, "sub_pairs": sub_pairs,
+            "result_json": compute_results(h, judgments)[0]}
+
+
+def test_round_trip_through_the_compact_format():
+    original = payload()
+    stored = encode_submission(original)
+    for col in judgment_codec.CODEC_COLUMNS:
+        assert judgment_codec.is_compact(stored[col])
+    assert len(json.dumps(stored)) < len(json.dumps(original)) / 3
+
+    row = decode_submission(json.loads(json.dumps(stored)))
+    assert row.stored_as == dict.fromkeys(judgment_codec.CODEC_COLUMNS, "compact")
+    assert not row.needs_migration()
+    assert row["main_pairs"] == pytest.approx(original["main_pairs"])
+    for g in CRITERIA:
+        assert row["sub_pairs"][g] == pytest.approx(original["sub_pairs"][g])
+    res, want = row["result_json"], original["result_json"]
+    assert res["main"]["weights"] == pytest.approx(want["main"]["weights"])
+    assert np.allclose(res["main"]["mat"], want["main"]["mat"])
+    assert res["main"]["cons"] == pytest.approx(want["main"]["cons"])
+    for g in CRITERIA:
+        assert res["local"][g]["weights"] == pytest.approx(want["local"][g]["weights"])
+    assert [r["GlobalWeight"] for r in res["global"]] == pytest.approx([r["GlobalWeight"] for r in want["global"]])
+
+
+def test_legacy_string_rows_are_read_and_flagged_for_migration():
+    original = payload(seed=1)
+    legacy = dict(original, main_pairs=json.dumps(original["main_pairs"]), sub_pairs=json.dumps(original["sub_pairs"]),
+                  result_json=None, result=json.dumps(original["result_json"]))
+    row = decode_submission(legacy)
+    assert row.stored_as == dict.fromkeys(judgment_codec.CODEC_COLUMNS, "string")
+    assert row.needs_migration(compact=False)
+    assert row["main_pairs"] == original["main_pairs"]
+    assert row["result_json"]["main"]["weights"] == original["result_json"]["main"]["weights"]
+
+    rewritten = decode_submission(encode_submission(row))
+    assert rewritten.stored_as == dict.fromkeys(judgment_codec.CODEC_COLUMNS, "compact")
+    assert rewritten["main_pairs"] == pytest.approx(original["main_pairs"])
+
+
+def test_label_keyed_rows_are_read_unchanged():
+    original = payload(seed=2)
+    row = decode_submission(copy.deepcopy(original))
+    assert row.stored_as == dict.fromkeys(judgment_codec.CODEC_COLUMNS, "labels")
+    assert row.needs_migration() and not row.needs_migration(compact=False)
+    assert row["sub_pairs"] == original["sub_pairs"]
+
+
+def test_off_scale_judgments_fall_back_to_labels_and_are_counted():
+    original = payload(seed=3)
+    key = next(iter(original["main_pairs"]))
+    original["main_pairs"][key] = 2.5
+    before = judgment_codec.FALLBACKS["main_pairs"]
+    stored = encode_submission(original)
+    assert stored["main_pairs"] == original["main_pairs"]
+    assert judgment_codec.is_compact(stored["sub_pairs"])
+    assert judgment_codec.FALLBACKS["main_pairs"] == before + 1
+
+
+def test_unknown_hierarchy_version_is_left_undecoded():
+    stored = encode_submission(payload(seed=4))
+    for col in judgment_codec.CODEC_COLUMNS:
+        stored[col] = dict(stored[col], h="000000000000")
+    row = decode_submission(stored)
+    assert row.stored_as == dict.fromkeys(judgment_codec.CODEC_COLUMNS, "unknown")
+    assert row["main_pairs"] == stored["main_pairs"]
+    assert not row.needs_migration()
+    # written back unchanged
+    assert encode_submission(row)["sub_pairs"] == stored["sub_pairs"]
+
+
+def test_rows_of_a_frozen_older_hierarchy_keep_their_labels(tmp_path, monkeypatch):
+    renamed = {g: [label + " (lama)" for label in SUBCRITERIA[g]] for g in CRITERIA}
+    old = compile_hierarchy(CRITERIA, renamed)
+    freeze(old, str(tmp_path))
+    snapshots = load_snapshots(str(tmp_path))
+    assert list(snapshots) == [old.version]
+    monkeypatch.setitem(hierarchy.HIERARCHIES, old.version, snapshots[old.version])
+    monkeypatch.setattr(hierarchy, "FROZEN", hierarchy.FROZEN | {old.version})
+
+    original = payload(seed=5, h=old)
+    row = decode_submission(encode_submission(original, hierarchy=old))
+    assert row.stored_as["sub_pairs"] == "compact"
+    for g in CRITERIA:
+        assert row["sub_pairs"][g] == pytest.approx(original["sub_pairs"][g])
+    assert row["result_json"]["local"][CRITERIA[0]]["keys"] == renamed[CRITERIA[0]]
+
+
+def test_unfrozen_hierarchy_is_written_label_keyed():
+    added = "H. Kriteria baru"
+    edited = compile_hierarchy(CRITERIA + [added], dict(SUBCRITERIA, **{added: ["H1. Satu", "H2. Dua"]}))
+    original = payload(seed=6, h=edited)
+    stored = encode_submission(original, hierarchy=edited)
+    assert stored["main_pairs"] == original["main_pairs"]
+
+
+def test_current_hierarchy_is_frozen():
+    # editing CRITERIA / SUBCRITERIA needs a new snapshot: python hierarchy.py freeze
+    assert HIERARCHY.version in load_snapshots()
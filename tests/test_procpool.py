@@ -0,0 +1,35 @@
+import sys
+import types
+
+import pytest
+
+import procpool
+from procpool import SpawnPool
+
+
+@pytest.fixture
+def page_main(tmp_path, monkeypatch):
+    """A Streamlit-like page as __main__: a script workers must never re-run."""
+    path = tmp_path / "page.py"
+    path.write_text("raise SystemExit('page re-imported in worker')\n")
+    page = types.ModuleType("__main__")
+    page.__file__ = str(path)
+    monkeypatch.setitem(sys.modules, "__main__", page)
+    return page
+
+
+def run_tasks():
+    with SpawnPool(2) as pool:
+        return [f.result() for f in [pool.submit(abs, -i) for i in range(4)]]
+
+
+def test_workers_start_without_the_page(page_main):
+    assert run_tasks() == [0, 1, 2, 3]
+    assert sys.modules["__main__"] is page_main
+
+
+def test_executor_without_the_spawn_hook_hides_the_page_around_submit(page_main, monkeypatch):
+    monkeypatch.delattr(SpawnPool, procpool._SPAWN_HOOK)
+    monkeypatch.setattr(procpool, "_HAS_SPAWN_HOOK", False)
+    assert run_tasks() == [0, 1, 2, 3]
+    assert sys.modules["__main__"] is page_main
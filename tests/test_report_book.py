@@ -0,0 +1,50 @@
+import io
+
+import pytest
+
+pytest.importorskip("reportlab")
+
+import report_book  # noqa: E402
+from storage import SQLiteStorage  # noqa: E402
+from test_aggregate import submission_payloads  # noqa: E402
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "ahp.db"))
+    users = storage.insert_users([{"username": f"pakar{i}", "pw_salt": "00", "pw_hash": "00"} for i in range(3)])
+    storage.insert_submissions(submission_payloads([u["id"] for u in users], seed=9))
+    return storage
+
+
+def build(storage):
+    out, steps = io.BytesIO(), []
+    n = report_book.write_book(storage, out, progress=lambda f, msg: steps.append(f), chunk_size=2)
+    return n, out.getvalue(), steps
+
+
+def assert_book(pdf):
+    assert pdf.startswith(b"%PDF")
+    assert b"Hasil Gabungan Pakar" in pdf  # bookmarks
+    for i in range(3):
+        assert f"Pakar: pakar{i}".encode() in pdf
+
+
+def test_book_has_a_section_per_expert(storage):
+    n, pdf, steps = build(storage)
+    assert n == 3
+    assert_book(pdf)
+    assert steps and steps == sorted(steps) and steps[-1] < 1
+
+
+def test_book_is_rebuilt_from_a_plain_story_when_streaming_is_not_supported(storage, monkeypatch):
+    # a reportlab that does not copy the story with story[:] would only see the table of contents
+    monkeypatch.setattr(report_book._Story, "__getitem__", lambda self, index: [self.toc])
+    n, pdf, _ = build(storage)
+    assert n == 3
+    assert_book(pdf)
+
+
+def test_book_without_submissions(tmp_path):
+    with pytest.raises(ValueError):
+        report_book.write_book(SQLiteStorage(str(tmp_path / "empty.db")), io.BytesIO())
@@ -0,0 +1,53 @@
+import zipfile
+
+import pytest
+
+pytest.importorskip("reportlab")
+
+import reports  # noqa: E402
+from artifact_cache import ArtifactCache  # noqa: E402
+from test_aggregate import submission_payloads  # noqa: E402
+
+
+class Job:
+    """Stand-in for jobs.JobContext outside a worker."""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.warnings = []
+
+    def progress(self, fraction, message=""):
+        pass
+
+    def warn(self, message):
+        self.warnings.append(message)
+
+
+def zip_items(results):
+    return [(f"laporan_{k}.pdf", f"key{k}", reports.report_payload({"id": k, "username": f"pakar{k}", "result": r}))
+            for k, r in enumerate(results)]
+
+
+def break_report(item):
+    item[2]["result"]["main"]["weights"] = None  # the weights table cannot be drawn
+
+
+def test_failed_reports_are_listed_in_the_zip_and_reported(tmp_path):
+    results = [p["result_json"] for p in submission_payloads([1, 2], seed=4)]
+    job = Job(ArtifactCache(str(tmp_path / "cache")))
+    items = zip_items(results + [results[0]])
+    break_report(items[2])
+    with zipfile.ZipFile(reports.zip_reports(job, items)) as zf:
+        names = zf.namelist()
+        errors = zf.read(reports.ERRORS_FILE).decode()
+    assert sorted(names) == sorted(["laporan_0.pdf", "laporan_1.pdf", reports.ERRORS_FILE])
+    assert errors.startswith("laporan_2.pdf: ")
+    assert job.warnings and "1 dari 3" in job.warnings[0]
+
+
+def test_job_fails_when_no_report_renders(tmp_path):
+    job = Job(ArtifactCache(str(tmp_path / "cache")))
+    items = zip_items([{}])
+    break_report(items[0])
+    with pytest.raises(RuntimeError):
+        reports.zip_reports(job, items)
@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+from resilience import ResilientStorage
+
+
+class FlakyStorage:
+    def __init__(self):
+        self.down = False
+        self.calls = 0
+        self.gate = None
+
+    def _rows(self):
+        self.calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.down:
+            raise ConnectionError("backend down")
+        return [{"id": 1, "result_json": {"main": {"weights": [0.5, 0.5]}}}]
+
+    def list_submissions(self):
+        return self._rows()
+
+    def get_draft(self, user_id):
+        return self._rows()[0]
+
+    def get_user_by_username(self, username):
+        return self._rows()[0]
+
+
+def test_coalesced_callers_share_one_backend_call():
+    inner = FlakyStorage()
+    inner.gate = threading.Event()
+    storage = ResilientStorage(inner, retries=0)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(storage.list_submissions())) for _ in range(4)]
+    for t in threads:
+        t.start()
+    while storage.metrics().get("coalesced", 0) < 3:
+        threading.Event().wait(0.01)
+    inner.gate.set()
+    for t in threads:
+        t.join()
+    assert inner.calls == 1
+    assert len(results) == 4 and all(r is results[0] for r in results)
+
+
+def test_stale_reads_are_copies_of_the_last_good_value():
+    inner = FlakyStorage()
+    storage = ResilientStorage(inner, retries=0)
+    first = storage.list_submissions()
+    inner.down = True
+    stale = storage.list_submissions()
+    assert stale == first and stale is not first
+    stale[0]["id"] = 43  # a page editing what it was served
+    assert storage.list_submissions()[0]["id"] == 1
+    assert first[0]["id"] == 1
+    assert storage.metrics()["stale_served"] == 2
+
+
+def test_error_response_to_a_half_open_trial_closes_the_breaker():
+    class Rejecting(FlakyStorage):
+        def list_users(self):
+            raise ValueError("bad request")  # answered by the backend: not a transport failure
+
+    inner = Rejecting()
+    storage = ResilientStorage(inner, retries=0, failure_threshold=1, reset_timeout=0.0)
+    inner.down = True
+    with pytest.raises(ConnectionError):
+        storage.list_submissions()
+    assert storage.breaker.state != "closed"
+    with pytest.raises(ValueError):
+        storage.list_users()  # the half-open trial
+    assert storage.breaker.state == "closed"
+
+
+@pytest.mark.parametrize("read", ["get_draft", "get_user_by_username"])
+def test_auth_and_draft_reads_are_never_served_stale(read):
+    inner = FlakyStorage()
+    storage = ResilientStorage(inner, retries=0)
+    getattr(storage, read)(1)
+    inner.down = True
+    with pytest.raises(ConnectionError):
+        getattr(storage, read)(1)
@@ -0,0 +1,101 @@
+import pytest
+
+from storage import SQLiteStorage, Storage
+
+
+def test_backend_missing_a_method_fails_at_construction():
+    class Partial(Storage):
+        def get_user(self, user_id):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_sqlite_submission_round_trip(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "ahp.db"))
+    user = storage.insert_user({"username": "pakar1", "pw_salt": "00", "pw_hash": "00"})[0]
+    row = storage.insert_submission({"user_id": user["id"], "main_pairs": {}, "sub_pairs": {}, "result_json": {}})[0]
+    assert storage.get_submission(row["id"])["user_id"] == user["id"]
+    assert [r["id"] for r in storage.delete_submissions([row["id"]])] == [row["id"]]
+    assert storage.get_submission(row["id"]) is None
+
+
+def test_sqlite_summary_filter_keeps_rows_without_summary(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "ahp.db"))
+    user = storage.insert_user({"username": "pakar1", "pw_salt": "00", "pw_hash": "00"})[0]
+    low, high, legacy = storage.insert_submissions([
+        {"user_id": user["id"], "result_json": {"main": {"cons": {"CR": 0.02}}}},
+        {"user_id": user["id"], "result_json": {"main": {"cons": {"CR": 0.3}}}},
+        {"user_id": user["id"], "result_json": {"main": {"cons": {"CR": 0.3}}}},
+    ])
+    storage.update_submissions({legacy["id"]: {"cr_max": None}})
+    ids = {r["id"] for r in storage.list_submission_summaries(min_cr=0.1)}
+    assert ids == {high["id"], legacy["id"]}
+
+
+class _APIError(Exception):
+    def __init__(self, error):
+        super().__init__(error)
+        self.code = error.get("code")
+
+
+class _Query:
+    """Minimal stand-in for a postgrest query builder on a table without the summary columns."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.columns = "*"
+
+    def select(self, columns):
+        self.columns = columns
+        return self
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        if "cr_max" in self.columns:
+            raise _APIError({"code": "42703", "message": "column submissions.cr_max does not exist"})
+        return type("Response", (), {"data": self.rows})()
+
+
+class _Client:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def table(self, name):
+        return _Query(self.rows)
+
+
+def test_supabase_summaries_without_migration_fall_back_to_full_rows():
+    from storage import SupabaseStorage
+
+    rows = [{"id": 2, "user_id": 1, "timestamp": "t2", "result_json": {"main": {"cons": {"CR": 0.5}}}},
+            {"id": 1, "user_id": 1, "timestamp": "t1", "result_json": {"main": {"cons": {"CR": 0.01}}}}]
+    storage = SupabaseStorage(client=_Client(rows))
+    assert [r["id"] for r in storage.list_submission_summaries(min_cr=0.1)] == [2]
+    assert storage.summary_columns is False
+    assert [r["cr_max"] for r in storage.list_submission_summaries()] == [0.5, 0.01]
+    assert storage.list_submissions_missing_summary() == []
+
+
+def test_summary_column_error_matches_error_codes_only():
+    from storage import _summary_column_error
+
+    assert _summary_column_error(_APIError({"code": "PGRST204", "message": "Could not find the 'cr_max' column"}))
+    assert not _summary_column_error(_APIError({"code": "23505", "message": "duplicate key, cr_max"}))
+    assert not _summary_column_error(RuntimeError("inconsistent main_weights"))
+
+
+def test_sqlite_upsert_overwrites_and_inserts_by_id(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "ahp.db"))
+    user = storage.insert_user({"username": "pakar1", "pw_salt": "00", "pw_hash": "00"})[0]
+    row = storage.insert_submission({"user_id": user["id"], "result_json": {"main": {"cons": {"CR": 0.02}}}})[0]
+    upserted = storage.upsert_submissions([
+        dict(row, result_json={"main": {"cons": {"CR": 0.3}}}),
+        {"id": 99, "user_id": user["id"], "timestamp": "2026-01-01T00:00:00", "result_json": {}},
+    ])
+    assert [r["id"] for r in upserted] == [row["id"], 99]
+    assert storage.get_submission(row["id"])["result_json"]["main"]["cons"]["CR"] == 0.3
+    assert storage.get_submission(99)["timestamp"] == "2026-01-01T00:00:00"
@@ -0,0 +1,23 @@
+import csv
+import io
+
+from storage import SQLiteStorage
+from stream_export import write_export
+from test_aggregate import submission_payloads
+
+
+def export_rows(storage, dataset):
+    out = io.BytesIO()
+    write_export(storage, dataset, out)
+    return list(csv.DictReader(io.StringIO(out.getvalue().decode("utf-8"))))
+
+
+def test_meta_columns_come_from_the_users_table(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "ahp.db"))
+    user = storage.insert_user({"username": "pakar1", "pw_salt": "00", "pw_hash": "00",
+                                "job_items": "Perencana, Arsitek"})[0]
+    storage.insert_submissions(submission_payloads([user["id"]], seed=3))
+    for dataset in ("submissions", "global_weights"):
+        rows = export_rows(storage, dataset)
+        assert rows
+        assert {(r["username"], r["job_items"]) for r in rows} == {("pakar1", "Perencana, Arsitek")}